@@ -15,6 +15,8 @@
 ║  🏆 QUIEN GANA: equipo con mayor real_value cuando el gap  ║
 ║                 entre los dos equipos es ≥ REAL_GAP_MIN    ║
 ║                                                              ║
+║  Ligas: ligas.py  (LIGAS=NBA,WNBA,NCAAB,NFL)                ║
+║                                                              ║
 ║  Requiere:                                                   ║
 ║    pip install requests google-genai                        ║
 ╚══════════════════════════════════════════════════════════════╝
@@ -23,79 +25,164 @@
 import os
 import re
 
-def _cargar_env():
-    env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
-    if not os.path.exists(env_path):
-        return
-    with open(env_path) as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#") or "=" not in line:
-                continue
-            key, _, value = line.partition("=")
-            key   = key.strip()
-            value = value.strip().strip('"').strip("'")
-            if key and key not in os.environ:
-                os.environ[key] = value
+import entorno   # .env antes de leer la configuración (aquí y en ligas)
 
-_cargar_env()
+import sys
 import json
+import time
+import random
+import argparse
+import contextlib
+import hashlib
+import threading
 import requests
 from datetime import datetime, date, timedelta
+from typing import Iterator
+from statistics import NormalDist
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from google import genai
-from google.genai import types
+import ligas
+import perfilado
+import simulacion
+import coalescencia
+from ligas import Liga
+from reintentos import ColaReintentos
+from lector_json import Campo, LectorJSON, esquema_gemini
+from requests.adapters import HTTPAdapter
 
 # ── Configuración ─────────────────────────────────────────────────────────────
 
 GAMMA_API      = "https://gamma-api.polymarket.com"
 CLOB_API       = "https://clob.polymarket.com"
-NBA_SERIES_ID  = 10345
 NEA_UMBRAL     = 5.0
 SCALP_UMBRAL   = 20.0   # NEA mínimo (absoluto) para calificar como scalping
 SCALP_REAL     = 40.0   # valor_real mínimo para scalping
 REAL_GAP_MIN   = 15.0   # diferencia mínima entre real_values para "quien gana"
+# Confianza Monte Carlo: con 0.8, SCALPING y QUIEN GANA exigen que el edge se
+# mantenga en el 80% de las simulaciones bootstrap del ensemble (0 = desactivado)
+CONFIANZA_EDGE = float(os.environ.get("CONFIANZA_EDGE", "0"))
+MC_SIMULACIONES = 2000
+# Modelo normal para Spread / Total O/U: margen local ~ N(μ, σ), total ~ N(T, σ_T).
+# Cada liga trae sus σ (ligas.py); éstas son las de la NBA por defecto.
+SIGMA_MARGEN   = ligas.LIGAS["NBA"].sigma_margen
+SIGMA_TOTAL    = ligas.LIGAS["NBA"].sigma_total
 GEMINI_MODEL   = "gemini-3-flash-preview"
 
+POLY_RPS       = float(os.environ.get("POLY_RPS", "0"))      # peticiones/s a Polymarket (0 = sin límite)
+POLY_POOL      = 32                                          # conexiones keep-alive por host
+GEMINI_WORKERS = int(os.environ.get("GEMINI_WORKERS", "4"))  # partidos analizados a la vez
+GEMINI_TIMEOUT = float(os.environ.get("GEMINI_TIMEOUT", "90"))  # segundos por llamada
+# Un único cliente genai por proceso (obtener_backend): keep-alive entre partidos
+# y runs; se comprueba cada GEMINI_SALUD_CADA s y se recrea si falla o cambia la config
+GEMINI_KEEPALIVE  = 120                                           # s de vida de una conexión ociosa
+GEMINI_SALUD_CADA = float(os.environ.get("GEMINI_SALUD_CADA", "300"))
+GEMINI_BASE_URL   = os.environ.get("GEMINI_BASE_URL", "")         # p. ej. endpoint local de pruebas
+# Reintentos con backoff (reintentos.py): intentos totales y espera inicial (s)
+CLOB_INTENTOS    = 3;  CLOB_BACKOFF    = 0.5
+RUN_INTENTOS     = 2;  RUN_BACKOFF     = 1.0   # cada run de Gemini de un partido
+PARTIDO_INTENTOS = 2;  PARTIDO_BACKOFF = 5.0   # partido entero si todos sus runs fallan
+
 HEADERS = {"User-Agent": "Mozilla/5.0"}
 SESSION = requests.Session()
 SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=POLY_POOL))
+
+
+class _LimitadorTasa:
+    """Token bucket compartido por todas las ligas y todos los hilos."""
+
+    def __init__(self, rps: float):
+        self.rps     = rps
+        self._lock   = threading.Lock()
+        self._fichas = rps
+        self._t      = time.monotonic()
+
+    def esperar(self) -> None:
+        if self.rps <= 0:
+            return
+        with self._lock:
+            ahora = time.monotonic()
+            self._fichas = min(self.rps, self._fichas + (ahora - self._t) * self.rps)
+            self._t = ahora
+            self._fichas -= 1
+            espera = -self._fichas / self.rps if self._fichas < 0 else 0.0
+        if espera:
+            time.sleep(espera)
+
+
+_LIMITADOR = _LimitadorTasa(POLY_RPS)
+
+# Single-flight + micro-caché (coalescencia.py): peticiones idénticas en vuelo
+# comparten una sola llamada al servicio
+TTL_EVENTOS     = 30   # segundos: lista de eventos de Gamma
+TTL_MIDPOINT    = 2    # segundos: midpoint del CLOB
+_VUELO_EVENTOS  = coalescencia.vuelo("gamma_eventos", TTL_EVENTOS)
+_VUELO_MIDPOINT = coalescencia.vuelo("clob_midpoint", TTL_MIDPOINT, cachear_none=True)
+_VUELO_PARTIDO  = coalescencia.vuelo("gemini_partido")
+_VUELO_RACHA    = coalescencia.vuelo("gemini_racha")
+
+
+def _get(url: str, **kwargs) -> requests.Response:
+    _LIMITADOR.esperar()
+    return SESSION.get(url, **kwargs)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 # MÓDULO 1 — POLYMARKET (Gamma + CLOB)
 # ══════════════════════════════════════════════════════════════════════════════
 
-def obtener_partidos_hoy() -> list[dict]:
-    hoy = date.today().strftime("%Y-%m-%d")
-    resp = SESSION.get(
-        f"{GAMMA_API}/events",
-        params={
-            "series_id": NBA_SERIES_ID, "tag_id": 100639,
-            "active": "true", "closed": "false",
-            "limit": 100, "order": "startTime", "ascending": "true",
-        }, timeout=15
-    )
-    resp.raise_for_status()
-    todos = resp.json()
-    return [e for e in todos if hoy in str(e.get("eventDate", ""))]
-
-
-def clasificar_mercado(pregunta: str) -> str | None:
-    p, pl = pregunta.strip(), pregunta.lower()
-    excluir = [
-        "points o/u", "rebounds o/u", "assists o/u", "steals o/u",
-        "blocks o/u", "turnovers o/u", "3-pointer", "field goal", "free throw",
-        "first quarter", "second quarter", "third quarter", "fourth quarter",
-        "first half", "second half", "halftime", "triple double", "double double",
-        "will there be", "lead at any", "margin of victory", "largest lead",
-    ]
-    if any(ex in pl for ex in excluir): return None
-    if p.startswith("Spread:"):                          return "📐 Spread"
-    if ": O/U" in p:                                     return "🎯 Total O/U"
-    if ("vs." in pl or " vs " in pl) and ":" not in p:  return "💰 Moneyline"
-    return None
+def obtener_eventos_liga(liga: Liga, fecha: date | None = None) -> list[dict]:
+    """Eventos de la fecha (hoy por defecto) de una liga, marcados con su código de liga."""
+    hoy = (fecha or date.today()).strftime("%Y-%m-%d")
+
+    def _pedir() -> list[dict]:
+        resp = _get(
+            f"{GAMMA_API}/events",
+            params={
+                "series_id": liga.series_id, "tag_id": liga.tag_id,
+                "active": "true", "closed": "false",
+                "limit": 100, "order": "startTime", "ascending": "true",
+            }, timeout=15
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    # La respuesta es compartida (vuelo + caché): se copia cada evento antes de marcarlo
+    eventos = _VUELO_EVENTOS.hacer((liga.series_id, liga.tag_id), _pedir)
+    return [{**e, "_liga": liga.codigo} for e in eventos
+            if hoy in str(e.get("eventDate", ""))]
+
+
+def obtener_partidos_hoy(ligas_activas: list[Liga] | None = None,
+                         fecha: date | None = None) -> list[dict]:
+    """
+    Partidos de la fecha (hoy por defecto) de todas las ligas activas,
+    consultadas en paralelo. Gamma sólo lista eventos abiertos: hoy y próximos días.
+    """
+    ligas_activas = ligas_activas if ligas_activas is not None else ligas.ligas_activas()
+    if not ligas_activas:
+        return []
+    partidos, errores = [], []
+    with ThreadPoolExecutor(max_workers=len(ligas_activas)) as pool:
+        futuros = {pool.submit(obtener_eventos_liga, l, fecha): l for l in ligas_activas}
+        for f in as_completed(futuros):
+            try:
+                partidos += f.result()
+            except Exception as e:
+                errores.append(e)
+                print(f"  ⚠️  {futuros[f].codigo}: {e}")
+    if errores and len(errores) == len(ligas_activas):
+        raise errores[0]
+    return sorted(partidos, key=lambda e: str(e.get("startTime", "")))
+
+
+def liga_de(item_o_evento: dict) -> Liga:
+    evento = item_o_evento.get("evento", item_o_evento)
+    return ligas.LIGAS[evento.get("_liga", "NBA")]
+
+
+def clasificar_mercado(pregunta: str, liga: Liga | None = None) -> str | None:
+    return (liga or ligas.LIGAS["NBA"]).clasificar_mercado(pregunta)
 
 
 def extraer_token_ids(m: dict) -> list[str]:
@@ -110,34 +197,57 @@ def extraer_outcomes(m: dict) -> list[str]:
     except: return []
 
 
-def precio_clob(token_id: str) -> tuple[str, float | None]:
-    try:
-        r = SESSION.get(f"{CLOB_API}/midpoint",
-                        params={"token_id": token_id}, timeout=8)
+def _midpoint(token_id: str) -> float | None:
+    """Midpoint del token; None si no hay libro. Lanza en errores de red/HTTP."""
+    def _pedir() -> float | None:
+        r = _get(f"{CLOB_API}/midpoint", params={"token_id": token_id}, timeout=8)
         r.raise_for_status()
         mid = r.json().get("mid")
-        return token_id, float(mid) if mid is not None else None
+        return float(mid) if mid is not None else None
+    return _VUELO_MIDPOINT.hacer(token_id, _pedir)
+
+
+def precio_clob(token_id: str) -> tuple[str, float | None]:
+    try:
+        return token_id, _midpoint(token_id)
     except Exception:
         return token_id, None
 
 
+# Funciones llamadas con cada lote de precios (alertas, historial, ...)
+_OYENTES_PRECIOS: list = []
+
+
+def registrar_oyente_precios(fn) -> None:
+    if fn not in _OYENTES_PRECIOS:
+        _OYENTES_PRECIOS.append(fn)
+
+
 def obtener_precios_paralelo(token_ids: list[str]) -> dict[str, float]:
-    resultado = {}
-    with ThreadPoolExecutor(max_workers=30) as pool:
-        futuros = {pool.submit(precio_clob, tid): tid for tid in token_ids}
-        for f in as_completed(futuros):
-            tid, precio = f.result()
-            if precio is not None:
-                resultado[tid] = precio
+    """Midpoints en paralelo; los tokens que fallan se reintentan con backoff."""
+    cola = ColaReintentos(max_workers=30, intentos=CLOB_INTENTOS, base=CLOB_BACKOFF, tope=4)
+    res  = cola.ejecutar({tid: (lambda t=tid: _midpoint(t)) for tid in token_ids})
+    resultado    = {tid: r["valor"] for tid, r in res.items() if r["valor"] is not None}
+    fallidos     = sum(1 for r in res.values() if not r["ok"])
+    recuperados  = sum(1 for r in res.values() if r["ok"] and r["intentos"] > 1)
+    if fallidos or recuperados:
+        print(f"  ↻ CLOB: {recuperados} token(s) recuperado(s) al reintentar, "
+              f"{fallidos} sin precio tras {CLOB_INTENTOS} intentos")
+    for oyente in _OYENTES_PRECIOS:
+        try:
+            oyente(resultado)
+        except Exception as e:
+            print(f"  ⚠️  Oyente de precios {getattr(oyente, '__name__', oyente)}: {e}")
     return resultado
 
 
 def construir_estructura(partidos: list[dict]) -> list[dict]:
     estructura = []
     for evento in partidos:
+        liga = liga_de(evento)
         candidatos = []
         for m in evento.get("markets", []):
-            tipo = clasificar_mercado(m.get("question", ""))
+            tipo = liga.clasificar_mercado(m.get("question", ""))
             if not tipo: continue
             token_ids = extraer_token_ids(m)
             if not token_ids: continue
@@ -154,21 +264,504 @@ def construir_estructura(partidos: list[dict]) -> list[dict]:
                 seleccionados[c["tipo"]] = c
             if len(seleccionados) == 3: break
         if seleccionados:
-            estructura.append({"evento": evento, "mercados": seleccionados})
+            item = {"evento": evento, "liga": liga, "mercados": seleccionados}
+            item["emparejamiento"] = emparejar_equipos(item)
+            estructura.append(item)
     return estructura
 
 
+def emparejar_equipos(item: dict) -> dict:
+    """
+    Asigna cada outcome del Moneyline a local / visitante comparando claves
+    canónicas (ligas.Liga.clave_equipo) con los equipos del título.
+
+    metodo:
+      exacto   — ambos outcomes coinciden literalmente con el título
+      alias    — coinciden a través del índice de alias
+      descarte — sólo uno coincide; el otro se asigna por eliminación
+      orden    — ninguno coincide; se asume el orden del título (visitante, local)
+      fallo    — no se puede asignar: el partido no se analiza
+    """
+    liga = item["liga"]
+    visit, local = liga.extraer_equipos(item["evento"].get("title", "?"))
+    res = {"local": local, "visitante": visit, "outcome_local": None,
+           "outcome_visitante": None, "metodo": "fallo", "aviso": None}
+    ml = item["mercados"].get("💰 Moneyline")
+    if not ml:
+        res["aviso"] = "sin mercado Moneyline"
+        return res
+
+    outcomes = ml["outcomes"]
+    k_local, k_visit = liga.clave_equipo(local), liga.clave_equipo(visit)
+    claves = {o: liga.clave_equipo(o) for o in outcomes}
+    o_local = next((o for o in outcomes if claves[o] == k_local), None)
+    o_visit = next((o for o in outcomes if claves[o] == k_visit and o != o_local), None)
+
+    otro = next((o for o in outcomes if o not in (o_local, o_visit)), None)
+
+    # Dos outcomes del mismo equipo ("Lakers" / "LA Lakers") no dejan nada que descartar
+    if len(outcomes) != 2 or k_local == k_visit or len(set(claves.values())) != 2 \
+            or (otro is None and not (o_local and o_visit)):
+        res["aviso"] = f"no se distinguen local/visitante en {outcomes}"
+    elif o_local and o_visit:
+        literal = {o_local.lower(), o_visit.lower()} == {local.lower(), visit.lower()}
+        res.update(outcome_local=o_local, outcome_visitante=o_visit,
+                   metodo="exacto" if literal else "alias")
+    elif o_local or o_visit:
+        res.update(outcome_local=o_local or otro, outcome_visitante=o_visit or otro,
+                   metodo="descarte",
+                   aviso=f"'{otro}' no coincide con '{visit if o_local else local}'")
+    else:
+        res.update(outcome_visitante=outcomes[0], outcome_local=outcomes[1], metodo="orden",
+                   aviso=f"{outcomes} no coinciden con '{visit}' / '{local}'")
+    return res
+
+
+def informe_emparejamiento(estructura: list[dict]) -> list[dict]:
+    """Imprime el resumen de emparejamiento y devuelve los partidos dudosos."""
+    conteo: dict[str, int] = {}
+    dudosos = []
+    for item in estructura:
+        emp = item["emparejamiento"]
+        conteo[emp["metodo"]] = conteo.get(emp["metodo"], 0) + 1
+        if emp["metodo"] in ("descarte", "orden", "fallo"):
+            dudosos.append({"partido": item["evento"].get("title", "?"),
+                            "liga": item["liga"].codigo,
+                            "metodo": emp["metodo"], "aviso": emp["aviso"]})
+    print("  🔎 Emparejamiento de equipos: "
+          + ", ".join(f"{n} {m}" for m, n in sorted(conteo.items())))
+    for d in dudosos:
+        print(f"     ⚠️  [{d['liga']}] {d['partido']}: {d['metodo']} — {d['aviso']}")
+    return dudosos
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # MÓDULO 2 — GEMINI
 # ══════════════════════════════════════════════════════════════════════════════
 
 GEMINI_RUNS = 5   # cuántas veces consultar Gemini por partido y promediar
 
+# Sub-consultas con TTL distinto:
+#   - equipo : racha últimos 5 partidos → cambia una vez al día, se comparte
+#              entre todos los partidos del slate (la clave incluye la fecha)
+#   - partido: cuotas Vegas, noticias y estrellas fuera → volátil, se re-muestrea
+#              GEMINI_RUNS veces y se guarda poco tiempo
+TTL_EQUIPO  = 24 * 3600   # segundos
+TTL_PARTIDO = 10 * 60     # segundos
 
-def _llamar_gemini_una_vez(client, equipo_local: str,
-                            equipo_visitante: str) -> dict | None:
-    """Una sola llamada a Gemini. Devuelve dict con los valores o None si falla."""
-    prompt = f"""Eres un analista experto de apuestas deportivas NBA.
+CAMPOS_PARTIDO = ["p_vegas", "n_local", "n_visitante",
+                  "estrellas_bajas_local", "estrellas_bajas_visitante"]
+
+
+class _CacheTTL:
+    """Caché en memoria thread-safe con expiración por entrada."""
+
+    def __init__(self, ttl: float):
+        self.ttl    = ttl
+        self._datos: dict = {}
+        self._lock  = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            expira, valor = entrada
+            if time.monotonic() >= expira:
+                del self._datos[clave]
+                return None
+            return valor
+
+    def set(self, clave, valor) -> None:
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+
+
+_CACHE_EQUIPOS  = _CacheTTL(TTL_EQUIPO)
+_CACHE_PARTIDOS = _CacheTTL(TTL_PARTIDO)
+
+
+# ── Backends de análisis ──────────────────────────────────────────────────────
+# GEMINI_BACKEND selecciona de dónde salen las respuestas:
+#   genai  : cliente real google-genai (requiere GEMINI_API_KEY)
+#   record : cliente real + guarda cada respuesta cruda en GEMINI_GRABACIONES
+#   replay : sin red — reproduce grabaciones o genera respuestas sintéticas
+#            deterministas, con latencia y tasa de fallos configurables
+
+GEMINI_BACKEND     = os.environ.get("GEMINI_BACKEND", "genai").lower()
+GEMINI_GRABACIONES = os.environ.get(
+    "GEMINI_GRABACIONES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "grabaciones_gemini"),
+)
+FAKE_LATENCIA = float(os.environ.get("GEMINI_FAKE_LATENCIA", "0"))   # segundos por respuesta
+FAKE_FALLOS   = float(os.environ.get("GEMINI_FAKE_FALLOS", "0"))     # probabilidad 0-1
+
+
+class BackendAnalisis:
+    """
+    Interfaz: devuelve los chunks de texto de la respuesta a un prompt.
+    `esquema` (response_schema) pide salida JSON estructurada si el backend la soporta.
+    """
+
+    nombre = "base"
+
+    def generar(self, prompt: str, esquema: dict | None = None) -> Iterator[str]:
+        raise NotImplementedError
+
+    def sano(self) -> bool:
+        """Health check: False → obtener_backend() crea uno nuevo."""
+        return True
+
+
+def _es_error_auth(e: Exception) -> bool:
+    """Clave inválida, revocada o sin permisos: el cliente no sirve y hay que recrearlo."""
+    codigo = getattr(e, "code", None)
+    return codigo in (401, 403) or (codigo == 400 and "API key" in str(e))
+
+
+class BackendGenai(BackendAnalisis):
+    """
+    Gemini real con Google Search, en streaming. El cliente (y su pool httpx
+    keep-alive) es seguro entre hilos: una instancia sirve a todos los workers.
+    """
+
+    nombre = "genai"
+
+    def __init__(self, api_key: str):
+        # Import diferido: google-genai arrastra un árbol de dependencias pesado
+        # y sólo hace falta en el primer análisis real, no al cargar el módulo.
+        import httpx
+        from google import genai
+        from google.genai import types
+        self.types  = types
+        self.client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(
+                timeout=int(GEMINI_TIMEOUT * 1000),
+                base_url=GEMINI_BASE_URL or None,
+                client_args={"limits": httpx.Limits(
+                    max_keepalive_connections=max(20, GEMINI_WORKERS * GEMINI_RUNS),
+                    keepalive_expiry=GEMINI_KEEPALIVE,
+                )},
+            ),
+        )
+        self.invalido  = False
+        self._revisado = time.monotonic()
+
+    def _stream(self, prompt: str, esquema: dict | None) -> Iterator[str]:
+        types = self.types
+        for chunk in self.client.models.generate_content_stream(
+            model=GEMINI_MODEL,
+            contents=[types.Content(role="user", parts=[types.Part.from_text(text=prompt)])],
+            config=types.GenerateContentConfig(
+                thinking_config=types.ThinkingConfig(thinking_budget=0),
+                tools=[types.Tool(googleSearch=types.GoogleSearch())],
+                response_mime_type="application/json" if esquema else None,
+                response_schema=esquema,
+            ),
+        ):
+            if chunk.text:
+                yield chunk.text
+
+    def generar(self, prompt: str, esquema: dict | None = None) -> Iterator[str]:
+        try:
+            yield from self._stream(prompt, esquema)
+        except Exception as e:
+            if _es_error_auth(e):
+                self.invalido = True
+            raise
+
+    def sano(self) -> bool:
+        """Metadatos del modelo como mucho cada GEMINI_SALUD_CADA s (barato, sin tokens)."""
+        if self.invalido:
+            return False
+        if time.monotonic() - self._revisado < GEMINI_SALUD_CADA:
+            return True
+        self._revisado = time.monotonic()
+        try:
+            self.client.models.get(model=GEMINI_MODEL)
+            return True
+        except Exception as e:
+            print(f"  ⚠️  Cliente Gemini no responde ({e}); se recrea")
+            return False
+
+
+def _ruta_grabacion(directorio: str, prompt: str) -> str:
+    clave = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:20]
+    return os.path.join(directorio, f"{clave}.jsonl")
+
+
+class BackendGrabador(BackendAnalisis):
+    """Envuelve otro backend y añade cada respuesta cruda (chunks) a disco."""
+
+    nombre = "record"
+
+    def __init__(self, interno: BackendAnalisis, directorio: str):
+        self.interno    = interno
+        self.directorio = directorio
+        self._lock      = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+
+    def generar(self, prompt: str, esquema: dict | None = None) -> Iterator[str]:
+        chunks = []
+        try:
+            for chunk in self.interno.generar(prompt, esquema):
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            # También si el lector cortó el stream al cerrar el objeto JSON
+            if chunks:
+                self._guardar(prompt, chunks)
+
+    def sano(self) -> bool:
+        return self.interno.sano()
+
+    def _guardar(self, prompt: str, chunks: list[str]) -> None:
+        linea = json.dumps({"prompt": prompt, "chunks": chunks,
+                            "ts": datetime.now().isoformat(timespec="seconds")},
+                           ensure_ascii=False)
+        with self._lock, open(_ruta_grabacion(self.directorio, prompt),
+                              "a", encoding="utf-8") as f:
+            f.write(linea + "\n")
+
+
+class BackendReplay(BackendAnalisis):
+    """
+    Backend local sin red. Si existe una grabación para el prompt la reproduce
+    (rotando entre las respuestas grabadas); si no, genera una respuesta
+    sintética determinista a partir del hash del prompt y del nº de llamada.
+    """
+
+    nombre = "replay"
+
+    def __init__(self, directorio: str | None = None, latencia: float = 0.0,
+                 tasa_fallos: float = 0.0, semilla: int = 0):
+        self.directorio  = directorio
+        self.latencia    = latencia
+        self.tasa_fallos = tasa_fallos
+        self.semilla     = semilla
+        self._llamadas: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _grabaciones(self, prompt: str) -> list[list[str]]:
+        if not self.directorio:
+            return []
+        ruta = _ruta_grabacion(self.directorio, prompt)
+        if not os.path.exists(ruta):
+            return []
+        with open(ruta, encoding="utf-8") as f:
+            return [json.loads(l)["chunks"] for l in f if l.strip()]
+
+    @staticmethod
+    def _sintetica(rng_base: random.Random, rng: random.Random) -> list[str]:
+        # Valores "verdaderos" fijos por prompt + ruido por run (para el ensemble)
+        p_vegas = rng_base.uniform(25, 75)
+        data = {
+            "p_vegas":                   round(min(99, max(1, p_vegas + rng.gauss(0, 3))), 1),
+            "n_local":                   round(rng_base.uniform(-40, 40) + rng.gauss(0, 8), 1),
+            "n_visitante":               round(rng_base.uniform(-40, 40) + rng.gauss(0, 8), 1),
+            "estrellas_bajas_local":     rng_base.choice([0, 0, 0, 1, 1, 2, 3]),
+            "estrellas_bajas_visitante": rng_base.choice([0, 0, 0, 1, 1, 2, 3]),
+            "racha":                     rng_base.choice([0, 20, 40, 60, 80, 100]),
+            "total_vegas":               round(rng_base.uniform(205, 240) + rng.gauss(0, 1), 1),
+            "resumen":                   "Respuesta sintética (backend replay).",
+        }
+        texto = json.dumps(data, ensure_ascii=False)
+        return [texto[i:i + 24] for i in range(0, len(texto), 24)]
+
+    def generar(self, prompt: str, esquema: dict | None = None) -> Iterator[str]:
+        with self._lock:
+            n = self._llamadas.get(prompt, 0)
+            self._llamadas[prompt] = n + 1
+        digest = int(hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12], 16)
+        rng    = random.Random(digest ^ (self.semilla * 1_000_003 + n))
+
+        if rng.random() < self.tasa_fallos:
+            time.sleep(self.latencia * rng.random())
+            raise RuntimeError("fallo simulado (backend replay)")
+
+        grabadas = self._grabaciones(prompt)
+        chunks = (grabadas[n % len(grabadas)] if grabadas
+                  else self._sintetica(random.Random(digest ^ self.semilla), rng))
+        pausa = self.latencia / max(1, len(chunks))
+        for chunk in chunks:
+            if pausa:
+                time.sleep(pausa)
+            yield chunk
+
+
+_BACKEND: BackendAnalisis | None = None
+_BACKEND_CONFIG: tuple | None = None
+_BACKEND_LOCK = threading.Lock()
+_BACKEND_STATS = {"creados": 0, "reutilizados": 0, "creado": None}
+
+
+def _crear_backend(api_key: str) -> BackendAnalisis:
+    if GEMINI_BACKEND == "replay":
+        return BackendReplay(GEMINI_GRABACIONES, FAKE_LATENCIA, FAKE_FALLOS)
+    if not api_key:
+        raise ValueError("Variable de entorno GEMINI_API_KEY no configurada")
+    if GEMINI_BACKEND == "record":
+        return BackendGrabador(BackendGenai(api_key), GEMINI_GRABACIONES)
+    if GEMINI_BACKEND == "genai":
+        return BackendGenai(api_key)
+    raise ValueError(f"GEMINI_BACKEND desconocido: {GEMINI_BACKEND!r} (genai | record | replay)")
+
+
+def obtener_backend() -> BackendAnalisis:
+    """
+    Backend configurado en GEMINI_BACKEND, uno por proceso y compartido por
+    todos los hilos. Se recrea si cambia la clave o la configuración, o si
+    falla el health check (clave revocada, pool roto).
+    """
+    global _BACKEND, _BACKEND_CONFIG
+    api_key = os.environ.get("GEMINI_API_KEY", "")
+    config  = (GEMINI_BACKEND, GEMINI_MODEL, GEMINI_TIMEOUT, GEMINI_BASE_URL,
+               GEMINI_GRABACIONES, FAKE_LATENCIA, FAKE_FALLOS,
+               hashlib.sha1(api_key.encode()).hexdigest() if GEMINI_BACKEND != "replay" else "")
+    with _BACKEND_LOCK:
+        actual = _BACKEND if _BACKEND_CONFIG == config else None
+    # sano() puede ir a la red (models.get): fuera del lock, para no frenar a
+    # los demás hilos mientras tanto
+    if actual is not None and actual.sano():
+        with _BACKEND_LOCK:
+            _BACKEND_STATS["reutilizados"] += 1
+        return actual
+    with _BACKEND_LOCK:
+        if _BACKEND is not None and _BACKEND is not actual and _BACKEND_CONFIG == config:
+            _BACKEND_STATS["reutilizados"] += 1      # otro hilo ya lo recreó
+            return _BACKEND
+        _BACKEND = _crear_backend(api_key)
+        _BACKEND_CONFIG = config
+        _BACKEND_STATS["creados"] += 1
+        _BACKEND_STATS["creado"] = datetime.now().isoformat(timespec="seconds")
+        return _BACKEND
+
+
+def estado_backend() -> dict:
+    """Para /status: backend activo y cuántas veces se creó / reutilizó."""
+    with _BACKEND_LOCK:
+        return {"backend": _BACKEND.nombre if _BACKEND else None, **_BACKEND_STATS}
+
+
+# Campos que se piden a Gemini: validan la respuesta mientras llega (lector_json)
+# y generan el response_schema de la salida estructurada.
+CAMPOS_RACHA = {"racha": Campo("number", 0, 100, descripcion="racha últimos 5 partidos")}
+CAMPOS_RUN = {
+    "p_vegas":                   Campo("number", 0, 100),
+    "n_local":                   Campo("number", -100, 100),
+    "n_visitante":               Campo("number", -100, 100),
+    "estrellas_bajas_local":     Campo("integer", 0, 5),
+    "estrellas_bajas_visitante": Campo("integer", 0, 5),
+    "total_vegas":               Campo("number", 0, nulo=True),
+    "resumen":                   Campo("string"),
+}
+ESQUEMA_RACHA = esquema_gemini(CAMPOS_RACHA, ("racha",))
+ESQUEMA_RUN   = esquema_gemini(CAMPOS_RUN, ("p_vegas",))
+
+
+def _generar_json(backend: BackendAnalisis, prompt: str, campos: dict[str, Campo],
+                  esquema: dict, requeridos: tuple[str, ...] = ()) -> dict:
+    """
+    Pide salida estructurada y valida el stream chunk a chunk; lanza
+    ErrorRespuesta (y corta el stream) en cuanto algo no cuadra. Con el objeto
+    ya completo se lee el resto sin procesarlo: un stream cortado cierra la
+    conexión y el siguiente partido tendría que repetir el handshake TLS.
+    """
+    lector = LectorJSON(campos, requeridos)
+    with contextlib.closing(backend.generar(prompt, esquema)) as stream:
+        for chunk in stream:
+            if lector.alimentar(chunk):
+                for _ in stream:
+                    pass
+                break
+    return lector.resultado()
+
+
+def _consultar_racha_equipo(backend: BackendAnalisis, equipo: str,
+                            liga: Liga, fecha: date | None = None) -> float | None:
+    """Sub-consulta por equipo: racha de los últimos 5 partidos (0-100)."""
+    prompt = f"""Eres un analista experto de estadísticas {liga.nombre}.
+Usando búsqueda web, encuentra los resultados de los últimos 5 partidos de {equipo} disputados antes de HOY.
+
+Responde EXACTAMENTE en este formato JSON (sin markdown, sin explicaciones):
+
+{{
+  "racha": <número 0-100, racha últimos 5 partidos: 5 victorias=100, 0 victorias=0>
+}}
+
+Responde SOLO el JSON."""
+
+    if fecha and fecha != date.today():
+        prompt = (f"FECHA DEL PARTIDO: {fecha.isoformat()} "
+                  f"(en este mensaje, HOY se refiere a esa fecha).\n\n{prompt}")
+
+    try:
+        data = _generar_json(backend, prompt, CAMPOS_RACHA, ESQUEMA_RACHA, ("racha",))
+        return float(data["racha"])
+    except Exception as e:
+        print(f"    ⚠️  Error Gemini (racha {equipo}): {e}")
+    return None
+
+
+def _clave_equipo(liga: Liga, equipo: str, fecha: date | None = None) -> tuple:
+    # La fecha pedida, no la de hoy: la racha antes del 3 de marzo no es la de hoy
+    return (liga.codigo, liga.clave_equipo(equipo), (fecha or date.today()).isoformat())
+
+
+def obtener_racha_equipo(backend: BackendAnalisis, equipo: str,
+                         liga: Liga = ligas.LIGAS["NBA"],
+                         fecha: date | None = None) -> float | None:
+    """Racha del equipo, calculada una vez por equipo y fecha y reutilizada en el slate."""
+    clave = _clave_equipo(liga, equipo, fecha)
+    racha = _CACHE_EQUIPOS.get(clave)
+    if racha is not None:
+        return racha
+
+    def consultar_y_cachear():
+        racha = _CACHE_EQUIPOS.get(clave)
+        if racha is None:
+            racha = _consultar_racha_equipo(backend, equipo, liga, fecha)
+            if racha is not None:
+                _CACHE_EQUIPOS.set(clave, racha)
+        return racha
+
+    return _VUELO_RACHA.hacer(clave, consultar_y_cachear)
+
+
+def precargar_rachas(equipos: list[tuple[Liga, str]], fecha: date | None = None,
+                     max_workers: int = 8) -> None:
+    """
+    Calcula en paralelo la racha de todos los equipos del slate (una vez por fecha).
+    equipos: pares (liga, equipo) — un único pool para todas las ligas.
+    """
+    pendientes = {_clave_equipo(l, e, fecha): (l, e) for l, e in equipos
+                  if _CACHE_EQUIPOS.get(_clave_equipo(l, e, fecha)) is None}
+    if not pendientes:
+        return
+    try:
+        backend = obtener_backend()
+    except Exception as e:
+        # Como un partido sin Gemini: el slate sigue, cada partido reintenta el
+        # backend por su cuenta y, si tampoco puede, usa la racha por defecto
+        print(f"  ⚠️  Backend Gemini no disponible ({e}): racha por defecto (50) "
+              f"para {len(pendientes)} equipo(s)")
+        return
+    cola = ColaReintentos(max_workers, intentos=RUN_INTENTOS, base=RUN_BACKOFF,
+                          es_fallo=lambda racha: racha is None)
+    res = cola.ejecutar({clave: (lambda l=l, e=e: obtener_racha_equipo(backend, e, l, fecha))
+                         for clave, (l, e) in pendientes.items()})
+    fallidos = [pendientes[c][1] for c, r in res.items() if not r["ok"]]
+    if fallidos:
+        print(f"  ⚠️  Racha por defecto (50) para: {', '.join(sorted(fallidos))}")
+
+
+def _llamar_gemini_una_vez(backend: BackendAnalisis, equipo_local: str,
+                           equipo_visitante: str, liga: Liga,
+                           fecha: date | None = None) -> dict | None:
+    """Una sola llamada a Gemini con los campos volátiles del partido.
+    Devuelve dict con los valores o None si falla."""
+    prompt = f"""Eres un analista experto de apuestas deportivas {liga.nombre} ({liga.deporte}).
 Necesito que analices el partido de HOY: {equipo_visitante} (visitante) @ {equipo_local} (local).
 
 Usando búsqueda web, encuentra y responde EXACTAMENTE en este formato JSON (sin markdown, sin explicaciones):
@@ -177,93 +770,140 @@ Usando búsqueda web, encuentra y responde EXACTAMENTE en este formato JSON (sin
   "p_vegas": <número 0-100, probabilidad implícita del equipo LOCAL según las casas de apuestas hoy>,
   "n_local": <número -100 a 100, factor noticias equipo local: lesiones clave (-), alineación completa (+)>,
   "n_visitante": <número -100 a 100, factor noticias equipo visitante>,
-  "r_local": <número 0-100, racha equipo local últimos 5 partidos: 5 victorias=100, 0 victorias=0>,
-  "r_visitante": <número 0-100, racha equipo visitante últimos 5 partidos>,
-  "estrellas_bajas_local": <entero 0-5, número de jugadores All-Star o >18 PPG ausentes HOY en el equipo local>,
-  "estrellas_bajas_visitante": <entero 0-5, número de jugadores All-Star o >18 PPG ausentes HOY en el equipo visitante>,
+  "estrellas_bajas_local": <entero 0-5, número de {liga.estrellas} ausentes HOY en el equipo local>,
+  "estrellas_bajas_visitante": <entero 0-5, número de {liga.estrellas} ausentes HOY en el equipo visitante>,
+  "total_vegas": <número, línea O/U de puntos totales del partido según las casas de apuestas hoy>,
   "resumen": "<2 oraciones: estado actual de ambos equipos, lesiones importantes y contexto del partido>"
 }}
 
 Busca específicamente:
-1. Odds actuales de casas como DraftKings, FanDuel o BetMGM para {equipo_local} vs {equipo_visitante}
-2. Lesiones o ausencias confirmadas para HOY — en especial jugadores All-Star o con >18 PPG de promedio
-3. Resultados de los últimos 5 partidos de cada equipo
+1. Odds actuales (moneyline y total O/U) de casas como DraftKings, FanDuel o BetMGM para {equipo_local} vs {equipo_visitante}
+2. Lesiones o ausencias confirmadas para HOY — en especial {liga.estrellas}
 
 Responde SOLO el JSON."""
 
+    if fecha and fecha != date.today():
+        prompt = (f"FECHA DEL PARTIDO: {fecha.isoformat()} "
+                  f"(en este mensaje, HOY se refiere a esa fecha).\n\n{prompt}")
+
     try:
-        respuesta_texto = ""
-        for chunk in client.models.generate_content_stream(
-            model=GEMINI_MODEL,
-            contents=[types.Content(role="user", parts=[types.Part.from_text(text=prompt)])],
-            config=types.GenerateContentConfig(
-                thinking_config=types.ThinkingConfig(thinking_budget=0),
-                tools=[types.Tool(googleSearch=types.GoogleSearch())],
-            ),
-        ):
-            if chunk.text:
-                respuesta_texto += chunk.text
-
-        respuesta_texto = re.sub(r"```json|```", "", respuesta_texto).strip()
-        match = re.search(r"\{.*\}", respuesta_texto, re.DOTALL)
-        if match:
-            data = json.loads(match.group())
-            return {
-                "p_vegas":                  float(data.get("p_vegas", 50)),
-                "n_local":                  float(data.get("n_local", 0)),
-                "n_visitante":              float(data.get("n_visitante", 0)),
-                "r_local":                  float(data.get("r_local", 50)),
-                "r_visitante":              float(data.get("r_visitante", 50)),
-                "estrellas_bajas_local":    int(data.get("estrellas_bajas_local", 0)),
-                "estrellas_bajas_visitante": int(data.get("estrellas_bajas_visitante", 0)),
-                "resumen":                  data.get("resumen", "Sin información disponible."),
-            }
+        data = _generar_json(backend, prompt, CAMPOS_RUN, ESQUEMA_RUN, ("p_vegas",))
+        return {
+            "p_vegas":                  float(data.get("p_vegas", 50)),
+            "n_local":                  float(data.get("n_local", 0)),
+            "n_visitante":              float(data.get("n_visitante", 0)),
+            "estrellas_bajas_local":    int(data.get("estrellas_bajas_local", 0)),
+            "estrellas_bajas_visitante": int(data.get("estrellas_bajas_visitante", 0)),
+            "total_vegas":              (float(data["total_vegas"])
+                                         if data.get("total_vegas") is not None else None),
+            "resumen":                  data.get("resumen", "Sin información disponible."),
+        }
     except Exception as e:
         print(f"    ⚠️  Error Gemini (run): {e}")
     return None
 
 
-def analizar_partido_con_gemini(equipo_local: str, equipo_visitante: str,
-                                 linea_ml_local: float) -> dict:
+def _analizar_campos_partido(backend: BackendAnalisis, equipo_local: str,
+                             equipo_visitante: str, liga: Liga,
+                             fecha: date | None = None) -> tuple[dict | None, bool]:
     """
-    Llama a Gemini GEMINI_RUNS veces y promedia los valores numéricos.
-    Esto reduce outliers causados por respuestas inconsistentes de la API.
+    Campos volátiles del partido: desde la caché (TTL_PARTIDO segundos) o
+    re-muestreados con Gemini. Dos análisis simultáneos del mismo partido
+    comparten una sola tanda de runs. Devuelve (promedio, desde_caché).
     """
-    api_key = os.environ.get("GEMINI_API_KEY", "")
-    if not api_key:
-        raise ValueError("Variable de entorno GEMINI_API_KEY no configurada")
-    client  = genai.Client(api_key=api_key)
-
-    resultados = []
-    for i in range(GEMINI_RUNS):
-        r = _llamar_gemini_una_vez(client, equipo_local, equipo_visitante)
-        if r:
-            resultados.append(r)
+    clave = (liga.codigo, liga.clave_equipo(equipo_local), liga.clave_equipo(equipo_visitante),
+             (fecha or date.today()).isoformat())
+    promedio = _CACHE_PARTIDOS.get(clave)
+    if promedio is not None:
+        print(f"      {equipo_visitante} @ {equipo_local}: campos del partido desde caché")
+        return promedio, True
+
+    def muestrear_y_cachear():
+        # Dentro del vuelo: quien llegue después de que termine ya ve la caché.
+        # Se vuelve a mirar por si otro vuelo la llenó tras nuestro get.
+        promedio = _CACHE_PARTIDOS.get(clave)
+        if promedio is None:
+            promedio = _muestrear_partido(backend, equipo_local, equipo_visitante, liga, fecha)
+            if promedio is not None:
+                _CACHE_PARTIDOS.set(clave, promedio)
+        return promedio
+
+    return _VUELO_PARTIDO.hacer(clave, muestrear_y_cachear), False
+
+
+def _muestrear_partido(backend: BackendAnalisis, equipo_local: str,
+                       equipo_visitante: str, liga: Liga,
+                       fecha: date | None = None) -> dict | None:
+    """
+    Re-muestrea GEMINI_RUNS veces sólo los campos volátiles del partido y los promedia.
+    Un run fallido vuelve a la cola con backoff mientras corren los siguientes.
+    """
+    cola = ColaReintentos(max_workers=1, intentos=RUN_INTENTOS, base=RUN_BACKOFF,
+                          es_fallo=lambda r: r is None)
+    runs = cola.ejecutar({
+        i: (lambda: _llamar_gemini_una_vez(backend, equipo_local, equipo_visitante, liga, fecha))
+        for i in range(GEMINI_RUNS)
+    })
+    resultados = [runs[i]["valor"] for i in range(GEMINI_RUNS) if runs[i]["ok"]]
 
     if not resultados:
-        return _valores_defecto(linea_ml_local)
+        return None
 
     # Promediar todos los valores numéricos entre los runs
-    campos = ["p_vegas", "n_local", "n_visitante", "r_local", "r_visitante",
-              "estrellas_bajas_local", "estrellas_bajas_visitante"]
-    promedio = {c: sum(r[c] for r in resultados) / len(resultados) for c in campos}
+    promedio = {c: sum(r[c] for r in resultados) / len(resultados) for c in CAMPOS_PARTIDO}
     # Redondear conteos de estrellas al entero más cercano
     promedio["estrellas_bajas_local"]     = round(promedio["estrellas_bajas_local"])
     promedio["estrellas_bajas_visitante"] = round(promedio["estrellas_bajas_visitante"])
     promedio["resumen"] = resultados[-1]["resumen"]   # resumen del último run
-
-    # Mostrar valores individuales si hubo más de un run (para detectar outliers)
+    # total_vegas es opcional: promedio de los runs que lo trajeron
+    totales = [r["total_vegas"] for r in resultados if r["total_vegas"] is not None]
+    promedio["total_vegas"] = sum(totales) / len(totales) if totales else None
+    # Valores de cada run, para las bandas de incertidumbre (simulacion.py)
+    promedio["muestras"] = {c: [r[c] for r in resultados] for c in CAMPOS_PARTIDO}
+    promedio["runs_ok"]  = len(resultados)
+
+    # Mostrar valores individuales si hubo más de un run (para detectar outliers).
+    # Un solo print por partido: los partidos se analizan en paralelo.
     if len(resultados) > 1:
-        for c in campos:
+        lineas = [f"      {equipo_visitante} @ {equipo_local}"]
+        for c in CAMPOS_PARTIDO:
             vals = [f"{r[c]:.0f}" for r in resultados]
             prom = promedio[c]
             desv = max(abs(r[c] - prom) for r in resultados)
             flag = "  ⚠️ outlier" if desv > 20 else ""
-            print(f"      {c:<14}: [{' | '.join(vals)}] → avg {prom:.1f}{flag}")
-
+            lineas.append(f"      {c:<14}: [{' | '.join(vals)}] → avg {prom:.1f}{flag}")
+        print("\n".join(lineas))
     return promedio
 
 
+def analizar_partido_con_gemini(equipo_local: str, equipo_visitante: str,
+                                 linea_ml_local: float,
+                                 liga: Liga = ligas.LIGAS["NBA"],
+                                 fecha: date | None = None) -> dict:
+    """
+    Combina las dos sub-consultas:
+      - campos del partido (Vegas, noticias, estrellas): GEMINI_RUNS runs promediados
+      - racha de cada equipo: una consulta por equipo y fecha, compartida en el slate
+
+    "estado": fresh (consultado ahora), cached (caché TTL_PARTIDO) o defaulted.
+    """
+    backend = obtener_backend()
+
+    partido, desde_cache = _analizar_campos_partido(backend, equipo_local, equipo_visitante,
+                                                    liga, fecha)
+    if partido is None:
+        return _valores_defecto(linea_ml_local)
+
+    r_local     = obtener_racha_equipo(backend, equipo_local, liga, fecha)
+    r_visitante = obtener_racha_equipo(backend, equipo_visitante, liga, fecha)
+    return {
+        **partido,
+        "r_local":     r_local     if r_local     is not None else 50.0,
+        "r_visitante": r_visitante if r_visitante is not None else 50.0,
+        "estado":      "cached" if desde_cache else "fresh",
+    }
+
+
 def _valores_defecto(linea_ml_local: float) -> dict:
     return {
         "p_vegas":                  linea_ml_local * 100,
@@ -273,7 +913,10 @@ def _valores_defecto(linea_ml_local: float) -> dict:
         "r_visitante":              50.0,
         "estrellas_bajas_local":    0,
         "estrellas_bajas_visitante": 0,
+        "total_vegas":              None,
         "resumen":                  "Análisis no disponible.",
+        "runs_ok":                  0,
+        "estado":                   "defaulted",
     }
 
 
@@ -291,12 +934,143 @@ def interpretar_nea(nea: float) -> tuple[str, str]:
     return "➖ PRECIO JUSTO", f"NEA={nea:+.1f}"
 
 
-def extraer_equipos(titulo: str) -> tuple[str, str]:
-    for sep in [" vs. ", " vs "]:
-        if sep in titulo:
-            partes = titulo.split(sep, 1)
-            return partes[0].strip(), partes[1].strip()
-    return titulo, titulo
+def _es_total(mercado: str) -> bool:
+    return mercado.endswith("Total O/U")      # con o sin emoji (registro_partido lo quita)
+
+
+def clasificar_nea(poly: float, real: float, real_conf: float | None = None,
+                   mercado: str = "") -> tuple[str, str]:
+    """
+    interpretar_nea con las condiciones extra de SCALPING: real ≥ SCALP_REAL y,
+    con CONFIANZA_EDGE, que el descuento se sostenga en el cuantil conservador
+    `real_conf` del valor real. Si no se cumplen, queda en COMPRAR.
+
+    El Total O/U no tiene proyección propia: su "valor real" sale de la línea
+    de Vegas (total_vegas), así que un NEA grande sólo dice que Vegas y
+    Polymarket ponen la línea en sitios distintos. Queda como LÍNEA, nunca
+    como SCALPING / COMPRAR / EVITAR.
+    """
+    nea = poly - real
+    if _es_total(mercado):
+        if abs(nea) >= NEA_UMBRAL:
+            return "📏 LÍNEA", f"Vegas y Polymarket difieren {abs(nea):.1f}pts (sin proyección propia)"
+        return "➖ PRECIO JUSTO", f"NEA={nea:+.1f}"
+    emoji, desc = interpretar_nea(nea)
+    if emoji != "🎰 SCALPING":
+        return emoji, desc
+    if real < SCALP_REAL:
+        return "🔥 COMPRAR", f"Precio {abs(nea):.1f}pts bajo valor real"
+    if real_conf is not None and (poly - real_conf > -SCALP_UMBRAL or real_conf < SCALP_REAL):
+        return "🔥 COMPRAR", (f"Precio {abs(nea):.1f}pts bajo valor real "
+                             f"(no se sostiene al {CONFIANZA_EDGE:.0%})")
+    return emoji, desc
+
+
+def parsear_spread(pregunta: str) -> tuple[str, float] | None:
+    """'Spread: Pistons (-5.5)' → ('Pistons', -5.5)."""
+    m = re.match(r"\s*Spread:\s*(.+?)\s*\(\s*([+-]?\d+(?:\.\d+)?)\s*\)", pregunta)
+    return (m.group(1), float(m.group(2))) if m else None
+
+
+def parsear_total(pregunta: str) -> float | None:
+    """'Thunder vs. Pistons: O/U 218.5' → 218.5."""
+    m = re.search(r"O/U\s*(\d+(?:\.\d+)?)", pregunta)
+    return float(m.group(1)) if m else None
+
+
+_NORMAL = NormalDist()
+
+
+def prob_cubre_spread(p_gana: float, linea: float, sigma: float = SIGMA_MARGEN) -> float:
+    """
+    P(equipo cubre `linea`) con margen ~ N(μ, sigma), donde μ sale de
+    su probabilidad de ganar: p_gana = Φ(μ/σ). linea -5.5 → ganar por ≥ 6.
+    El margen es continuo: con línea entera el push no tiene masa y las dos
+    caras suman 1.
+    """
+    p_gana = min(max(p_gana, 0.001), 0.999)
+    mu = sigma * _NORMAL.inv_cdf(p_gana)
+    return _NORMAL.cdf((mu + linea) / sigma)
+
+
+def prob_over(total_esperado: float, linea: float, sigma: float = SIGMA_TOTAL) -> float:
+    """P(total > linea) con total ~ N(total_esperado, sigma)."""
+    return 1 - _NORMAL.cdf((linea - total_esperado) / sigma)
+
+
+def puntuar_mercados(item: dict, analisis: dict, precios: dict,
+                     equipos_calc: list[dict]) -> list[dict]:
+    """
+    NEA para Spread y Total O/U con los precios ya obtenidos. La probabilidad
+    de ganar de cada equipo es su valor_real normalizado (mismo modelo que el
+    Moneyline); el total esperado es el total_vegas de Gemini. Las σ son las
+    de la liga del partido.
+
+    Ojo con el Total: total_vegas es la propia línea de Vegas, no una
+    proyección independiente. Su NEA mide la distancia entre las líneas de
+    Vegas y de Polymarket (clasificar_nea lo deja como LÍNEA).
+    """
+    liga    = item.get("liga") or ligas.LIGAS["NBA"]
+    clave   = liga.clave_equipo
+    p_gana  = {clave(ec["outcome"]): ec["valor_real"] / 100
+               for ec in equipos_calc} if len(equipos_calc) == 2 else {}
+    ev      = item["evento"]
+    calc    = []
+
+    spr = item["mercados"].get("📐 Spread")
+    spread = parsear_spread(spr["pregunta"]) if spr else None
+    if spread and clave(spread[0]) in p_gana:
+        equipo_linea, linea = spread
+        for outcome, tid in zip(spr["outcomes"], spr["token_ids"]):
+            precio = precios.get(tid)
+            if precio is None or clave(outcome) not in p_gana:
+                continue
+            linea_o = linea if clave(outcome) == clave(equipo_linea) else -linea
+            calc.append({"mercado": "📐 Spread", "token_id": tid,
+                         "outcome": f"{outcome} {linea_o:+g}",
+                         "prob": prob_cubre_spread(p_gana[clave(outcome)], linea_o,
+                                                   liga.sigma_margen),
+                         "precio": precio})
+
+    tot = item["mercados"].get("🎯 Total O/U")
+    linea_t = parsear_total(tot["pregunta"]) if tot else None
+    if linea_t is not None and analisis.get("total_vegas"):
+        p_over = prob_over(analisis["total_vegas"], linea_t, liga.sigma_total)
+        for outcome, tid in zip(tot["outcomes"], tot["token_ids"]):
+            precio = precios.get(tid)
+            if precio is None or outcome.lower() not in ("over", "under"):
+                continue
+            calc.append({"mercado": "🎯 Total O/U", "token_id": tid,
+                         "outcome": f"{outcome} {linea_t:g}",
+                         "prob": p_over if outcome.lower() == "over" else 1 - p_over,
+                         "precio": precio})
+
+    for c in calc:
+        c["p_poly_pct"] = c.pop("precio") * 100
+        c["valor_real"] = c.pop("prob") * 100
+        c["nea"]        = c["p_poly_pct"] - c["valor_real"]
+        c["es_local"]   = None
+        c["hora"]       = hora_et(ev.get("startTime", ""))
+        c["partido"]    = ev.get("title", "?")
+        c["liga"]       = liga.codigo
+    return calc
+
+
+def calcular_bandas(analisis: list[dict], log: bool = True) -> list[dict]:
+    """Bandas Monte Carlo de valor_real y gap para todo el slate en una pasada."""
+    cuantiles = simulacion.CUANTILES_BASE
+    if CONFIANZA_EDGE > 0:
+        cuantiles = (*cuantiles, round(1 - CONFIANZA_EDGE, 4))
+    t0  = time.perf_counter()
+    sim = simulacion.simular_slate(analisis, n_sim=MC_SIMULACIONES, cuantiles=cuantiles)
+    if log:
+        print(f"  🎲 Bandas Monte Carlo: {len(analisis)} partido(s) × {MC_SIMULACIONES} "
+              f"simulaciones en {(time.perf_counter() - t0) * 1000:.1f} ms")
+    return simulacion.bandas_por_partido(sim)
+
+
+def extraer_equipos(titulo: str, liga: Liga | None = None) -> tuple[str, str]:
+    return (liga or ligas.LIGAS["NBA"]).extraer_equipos(titulo)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -316,33 +1090,51 @@ def barra(valor: float, total: float = 100, largo: int = 20) -> str:
     return "█" * lleno + "░" * (largo - lleno)
 
 
-def imprimir_analisis(item: dict, analisis: dict,
-                      precios: dict) -> tuple[list[dict], dict | None]:
+def _cuantil_conservador(bandas: dict | None) -> float | None:
+    """Cuantil (1 - CONFIANZA_EDGE) de una banda, o None si no se exige confianza."""
+    if not bandas or CONFIANZA_EDGE <= 0:
+        return None
+    return bandas.get(round(1 - CONFIANZA_EDGE, 4))
+
+
+def imprimir_analisis(item: dict, analisis: dict, precios: dict,
+                      bandas: dict | None = None) -> tuple[list[dict], dict | None, list[dict]]:
     """
     Devuelve:
       - lista de oportunidades individuales (scalping / comprar / evitar)
       - dict con el pronóstico 'quien gana' si el gap entre real values ≥ REAL_GAP_MIN
+      - valores calculados de cada outcome (Moneyline, Spread y Total: valor_real, NEA, token, ...)
+
+    bandas: cuantiles Monte Carlo del partido (simulacion.bandas_por_partido).
     """
     ev     = item["evento"]
     titulo = ev.get("title", "?")
     hora   = hora_et(ev.get("startTime", ""))
     vol    = float(ev.get("volume", 0) or 0)
+    liga   = item.get("liga") or ligas.LIGAS["NBA"]
 
-    equipo_visit, equipo_local = extraer_equipos(titulo)
     oportunidades = []
     quien_gana    = None
 
     print(f"\n{'═'*68}")
-    print(f"  🏀  {titulo.upper()}")
+    print(f"  🏀  [{liga.codigo}] {titulo.upper()}")
     print(f"  ⏰  {hora}   |   Vol ${vol:,.0f}")
     print(f"{'═'*68}")
     print(f"  📰  {analisis['resumen']}")
+    if analisis.get("estado") == "defaulted":
+        print("  ⚠️  Sin datos de Gemini: valores por defecto (P_Vegas = precio CLOB)")
     print(f"{'─'*68}")
 
-    ml = item["mercados"].get("💰 Moneyline")
+    ml  = item["mercados"].get("💰 Moneyline")
+    emp = item.get("emparejamiento") or emparejar_equipos({**item, "liga": liga})
     if not ml:
         print("  ⚠️  Sin mercado Moneyline disponible")
-        return oportunidades, quien_gana
+        return oportunidades, quien_gana, []
+    if emp["metodo"] == "fallo":
+        print(f"  ⚠️  Equipos sin emparejar ({emp['aviso']}) — partido omitido")
+        return oportunidades, quien_gana, []
+    if emp["metodo"] in ("descarte", "orden"):
+        print(f"  ⚠️  Local/visitante asignado por {emp['metodo']}: {emp['aviso']}")
 
     # ── Pasada 1: calcular valores para todos los equipos ─────────────────────
     equipos_calc = []
@@ -353,7 +1145,7 @@ def imprimir_analisis(item: dict, analisis: dict,
             continue
 
         p_poly_pct = precio_poly * 100
-        es_local   = (outcome.lower() == equipo_local.lower())
+        es_local   = (outcome == emp["outcome_local"])
 
         v_factor = 5.0 if es_local else -5.0
 
@@ -385,6 +1177,7 @@ def imprimir_analisis(item: dict, analisis: dict,
         nea = p_poly_pct - valor_raw   # provisional, se recalcula tras normalizar
 
         equipos_calc.append({
+            "mercado":         "💰 Moneyline",
             "outcome":         outcome,
             "token_id":        token_id,
             "es_local":        es_local,
@@ -401,11 +1194,12 @@ def imprimir_analisis(item: dict, analisis: dict,
             "nea":             nea,
             "hora":            hora,
             "partido":         titulo,
+            "liga":            liga.codigo,
         })
 
     if not equipos_calc:
         print("  ⚠️  Sin precios disponibles")
-        return oportunidades, quien_gana
+        return oportunidades, quien_gana, equipos_calc
 
     # ── Fix 1: Normalizar valor_real a 100 (mercado binario) ──────────────────
     if len(equipos_calc) == 2:
@@ -414,13 +1208,15 @@ def imprimir_analisis(item: dict, analisis: dict,
             for ec in equipos_calc:
                 ec["valor_real"] = ec["valor_raw"] / total_vr * 100
                 ec["nea"] = ec["p_poly_pct"] - ec["valor_real"]
+        # Bandas Monte Carlo: sólo tienen sentido con valor_real normalizado
+        if bandas:
+            for ec in equipos_calc:
+                ec["vr_bandas"] = bandas["vr_local" if ec["es_local"] else "vr_visitante"]
 
     # ── Pasada 2: imprimir cada equipo ────────────────────────────────────────
     for ec in equipos_calc:
-        emoji, desc = interpretar_nea(ec["nea"])
-        # SCALPING requiere también real ≥ SCALP_REAL
-        if emoji == "🎰 SCALPING" and ec["valor_real"] < SCALP_REAL:
-            emoji, desc = "🔥 COMPRAR", f"Precio {abs(ec['nea']):.1f}pts bajo valor real"
+        emoji, desc = clasificar_nea(ec["p_poly_pct"], ec["valor_real"],
+                                     _cuantil_conservador(ec.get("vr_bandas")))
 
         rol  = "LOCAL   " if ec["es_local"] else "VISITANTE"
         icon = "🏠" if ec["es_local"] else "✈️ "
@@ -436,6 +1232,10 @@ def imprimir_analisis(item: dict, analisis: dict,
             print(f"     Estrellas fuera: {ec['estrellas_bajas']}{penalty_str}")
         print(f"     {'─'*50}")
         print(f"     Valor Real: {ec['valor_real']:.1f}¢")
+        if ec.get("vr_bandas"):
+            b = ec["vr_bandas"]
+            print(f"       IC90 real: [{b[0.05]:.1f} – {b[0.95]:.1f}]   "
+                  f"IC90 NEA: [{ec['p_poly_pct'] - b[0.95]:+.1f} – {ec['p_poly_pct'] - b[0.05]:+.1f}]")
         print(f"     NEA = {ec['p_poly_pct']:.1f} - {ec['valor_real']:.1f} = {ec['nea']:+.1f}")
         print(f"     {emoji}: {desc}")
 
@@ -451,11 +1251,16 @@ def imprimir_analisis(item: dict, analisis: dict,
     if len(equipos_calc) == 2:
         a, b  = equipos_calc[0], equipos_calc[1]
         gap   = abs(a["valor_real"] - b["valor_real"])
-        if gap >= REAL_GAP_MIN:
+        gap_conf = _cuantil_conservador(bandas["gap"] if bandas else None)
+        if gap >= REAL_GAP_MIN and gap_conf is not None and gap_conf < REAL_GAP_MIN:
+            print(f"\n  ⚠️  Gap {gap:.1f}¢ no se sostiene al {CONFIANZA_EDGE:.0%} "
+                  f"(cuantil {1 - CONFIANZA_EDGE:.2f} = {gap_conf:.1f}¢) → sin QUIEN GANA")
+        elif gap >= REAL_GAP_MIN:
             favorito  = a if a["valor_real"] > b["valor_real"] else b
             underdog  = b if a["valor_real"] > b["valor_real"] else a
             quien_gana = {
                 "partido":          titulo,
+                "liga":             liga.codigo,
                 "hora":             hora,
                 "favorito":         favorito["outcome"],
                 "favorito_real":    favorito["valor_real"],
@@ -466,99 +1271,246 @@ def imprimir_analisis(item: dict, analisis: dict,
                 "underdog_poly":    underdog["p_poly_pct"],
                 "underdog_nea":     underdog["nea"],
                 "gap":              gap,
+                "favorito_bandas":  favorito.get("vr_bandas"),
             }
 
-    # ── Spread y Total como referencia ────────────────────────────────────────
-    spr = item["mercados"].get("📐 Spread")
-    tot = item["mercados"].get("🎯 Total O/U")
-    print(f"\n  {'─'*66}")
-    print(f"  {'SPREAD':<32} {'TOTAL'}")
-    n_rows = max(
-        len(spr["outcomes"]) if spr else 0,
-        len(tot["outcomes"]) if tot else 0,
-    )
-    for row in range(n_rows):
-        spr_str = tot_str = ""
-        if spr and row < len(spr["outcomes"]):
-            o, tid = spr["outcomes"][row], spr["token_ids"][row]
-            p = precios.get(tid)
-            if p:
-                try:
-                    pts   = spr["pregunta"].split("(")[1].rstrip(")")
-                    pts_f = float(pts)
-                    fav   = spr["pregunta"].split(":")[1].split("(")[0].strip()
-                    pts_l = f"{pts_f:+.1f}" if o == fav else f"{-pts_f:+.1f}"
-                except: pts_l = ""
-                spr_str = f"  {o} {pts_l}  →  {round(p*100)}¢"
-        if tot and row < len(tot["outcomes"]):
-            o, tid = tot["outcomes"][row], tot["token_ids"][row]
-            p = precios.get(tid)
-            if p:
-                try:
-                    num    = tot["pregunta"].split("O/U")[1].strip()
-                    prefix = "O" if o.lower() == "over" else "U"
-                    tot_str = f"  {prefix} {num}  →  {round(p*100)}¢"
-                except: tot_str = f"  {o}  →  {round(p*100)}¢"
-        print(f"  {spr_str:<32} {tot_str}")
-
-    return oportunidades, quien_gana
+    # ── Spread y Total O/U: NEA con el modelo normal de margen / total ────────
+    mercados_calc = puntuar_mercados(item, analisis, precios, equipos_calc)
+    if item["mercados"].get("📐 Spread") or item["mercados"].get("🎯 Total O/U"):
+        print(f"\n  {'─'*66}")
+        print(f"  {'MERCADO':<16} {'OUTCOME':<22} {'POLY':>6} {'REAL':>6} {'NEA':>7}")
+    if not mercados_calc and (item["mercados"].get("📐 Spread")
+                              or item["mercados"].get("🎯 Total O/U")):
+        print("  ⚠️  Spread/Total sin datos suficientes para el modelo")
+    for mc in mercados_calc:
+        emoji, desc = clasificar_nea(mc["p_poly_pct"], mc["valor_real"], mercado=mc["mercado"])
+        print(f"  {mc['mercado']:<16} {mc['outcome']:<22} {mc['p_poly_pct']:5.1f}¢ "
+              f"{mc['valor_real']:5.1f}¢ {mc['nea']:+6.1f}  {emoji}")
+        if abs(mc["nea"]) >= NEA_UMBRAL:
+            accion = ("DISCREPANCIA DE LÍNEA — Vegas vs Polymarket, sin proyección propia"
+                      if emoji == "📏 LÍNEA" else
+                      "SCALPING — comprar y vender pre-partido"
+                      if emoji == "🎰 SCALPING" else
+                      "COMPRAR (precio bajo)"
+                      if mc["nea"] <= -NEA_UMBRAL else
+                      "EVITAR (precio alto)")
+            oportunidades.append({**mc, "accion": accion, "categoria": emoji})
+
+    return oportunidades, quien_gana, equipos_calc + mercados_calc
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 # MÓDULO 5 — GUARDAR RESULTADOS PARA LA CALCULADORA WEB
 # ══════════════════════════════════════════════════════════════════════════════
 
-def guardar_resultados(todos_quienes: list[dict]) -> None:
+def guardar_resultados(todos_quienes: list[dict], todos_equipos: list[dict],
+                       emparejamiento: list[dict] | None = None,
+                       partidos: list[dict] | None = None,
+                       fecha: date | None = None) -> None:
     """
     Serializa los favoritos de 'quien gana' en resultados.json.
     La calculadora web (app.py / index.html) lee este archivo.
+    'equipos' guarda cada outcome Moneyline con su token (refresco de precios / alertas).
+    'emparejamiento' lista los partidos con local/visitante dudoso (informe_emparejamiento).
+    'partidos' da el estado de los datos de cada partido: fresh / cached / defaulted.
     """
+    estado_partido = {p["partido"]: p["estado"] for p in partidos or []}
     candidatos = []
     for qg in todos_quienes:
         candidatos.append({
             "equipo":  qg["favorito"],
             "partido": qg["partido"],
+            "liga":    qg["liga"],
             "hora":    qg["hora"],
+            "estado":  estado_partido.get(qg["partido"]),
             "real":    round(qg["favorito_real"], 1),
             "poly":    round(qg["favorito_poly"], 1),
             "nea":     round(qg["favorito_nea"],  1),
             "gap":     round(qg["gap"],            1),
             "edge":    round(qg["favorito_real"] - qg["favorito_poly"], 1),
+            "real_ic": ([round(qg["favorito_bandas"][0.05], 1),
+                         round(qg["favorito_bandas"][0.95], 1)]
+                        if qg.get("favorito_bandas") else None),
         })
     candidatos.sort(key=lambda x: x["gap"], reverse=True)
 
-    data = {"fecha": str(date.today()), "candidatos": candidatos}
+    reales_partido: dict[str, list[float]] = {}
+    for ec in todos_equipos:
+        if ec["mercado"] == "💰 Moneyline":
+            reales_partido.setdefault(ec["partido"], []).append(ec["valor_real"])
+    equipos = []
+    for ec in todos_equipos:
+        reales = reales_partido.get(ec["partido"], [])
+        equipos.append({
+            "token_id": ec["token_id"],
+            "mercado":  ec["mercado"],
+            "equipo":   ec["outcome"],
+            "partido":  ec["partido"],
+            "liga":     ec["liga"],
+            "hora":     ec["hora"],
+            "es_local": ec["es_local"],
+            "real":     round(ec["valor_real"], 1),
+            "poly":     round(ec["p_poly_pct"], 1),
+            "nea":      round(ec["nea"], 1),
+            "gap":      (round(abs(reales[0] - reales[1]), 1)
+                         if len(reales) == 2 and ec["mercado"] == "💰 Moneyline" else None),
+        })
+
+    data = {"fecha": str(fecha or date.today()), "candidatos": candidatos, "equipos": equipos,
+            "partidos": partidos or [], "emparejamiento": emparejamiento or []}
     path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados.json")
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
     print(f"\n  💾 resultados.json guardado — {len(candidatos)} favorito(s) para la calculadora")
 
 
+def _sin_emoji(texto: str) -> str:
+    """'🎰 SCALPING' → 'SCALPING'; '💰 Moneyline' → 'Moneyline'."""
+    return texto.split(" ", 1)[-1].strip()
+
+
+def _ic(bandas: dict | None) -> list[float] | None:
+    return [round(bandas[0.05], 1), round(bandas[0.95], 1)] if bandas else None
+
+
+def _conf(bandas: dict | None) -> float | None:
+    conf = _cuantil_conservador(bandas)
+    return None if conf is None else round(conf, 1)
+
+
+def registro_partido(item: dict, analisis: dict, oportunidades: list[dict],
+                     quien_gana: dict | None, equipos: list[dict],
+                     fecha: date | None = None) -> dict:
+    """Un partido puntuado como dict serializable (una línea NDJSON de la CLI)."""
+    ev = item["evento"]
+    return {
+        "fecha":          str(fecha or date.today()),
+        "liga":           item["liga"].codigo,
+        "partido":        ev.get("title", "?"),
+        "hora":           hora_et(ev.get("startTime", "")),
+        "estado":         analisis.get("estado"),
+        "runs_ok":        analisis.get("runs_ok"),
+        "emparejamiento": item["emparejamiento"]["metodo"],
+        "nea_umbral":     NEA_UMBRAL,
+        "analisis": {c: analisis.get(c) for c in (
+            "p_vegas", "n_local", "n_visitante", "r_local", "r_visitante",
+            "estrellas_bajas_local", "estrellas_bajas_visitante", "total_vegas", "resumen")},
+        "mercados": [{
+            "mercado":  _sin_emoji(ec["mercado"]),
+            "outcome":  ec["outcome"],
+            "token_id": ec["token_id"],
+            "es_local": ec["es_local"],
+            "poly":     round(ec["p_poly_pct"], 1),
+            "real":     round(ec["valor_real"], 1),
+            "nea":      round(ec["nea"], 1),
+            "real_ic":  _ic(ec.get("vr_bandas")),
+            "real_conf": _conf(ec.get("vr_bandas")),
+        } for ec in equipos],
+        "oportunidades": [{
+            "mercado":   _sin_emoji(op["mercado"]),
+            "outcome":   op["outcome"],
+            "categoria": _sin_emoji(op["categoria"]),
+            "nea":       round(op["nea"], 1),
+        } for op in oportunidades],
+        "quien_gana": None if not quien_gana else {
+            "favorito":      quien_gana["favorito"],
+            "favorito_real": round(quien_gana["favorito_real"], 1),
+            "favorito_poly": round(quien_gana["favorito_poly"], 1),
+            "favorito_nea":  round(quien_gana["favorito_nea"], 1),
+            "underdog":      quien_gana["underdog"],
+            "gap":           round(quien_gana["gap"], 1),
+            "real_ic":       _ic(quien_gana.get("favorito_bandas")),
+        },
+    }
+
+
+def repreciar_registro(registro: dict, precios: dict[str, float]) -> dict | None:
+    """
+    registro_partido con precios nuevos del CLOB (token_id → precio 0-1): poly
+    y NEA de cada mercado, las oportunidades (entran / salen / cambian de
+    categoría con el NEA nuevo) y el poly/NEA del favorito. El valor real no
+    cambia, es del análisis. None si ningún precio del partido cambió.
+    """
+    mercados = []
+    for m in registro["mercados"]:
+        if m["token_id"] in precios:
+            poly = round(precios[m["token_id"]] * 100, 1)
+            m = {**m, "poly": poly, "nea": round(poly - m["real"], 1)}
+        mercados.append(m)
+    if mercados == registro["mercados"]:
+        return None
+
+    oportunidades = [{
+        "mercado":   m["mercado"],
+        "outcome":   m["outcome"],
+        "categoria": _sin_emoji(clasificar_nea(m["poly"], m["real"], m.get("real_conf"),
+                                               m["mercado"])[0]),
+        "nea":       m["nea"],
+    } for m in mercados if abs(m["nea"]) >= NEA_UMBRAL]
+
+    quien_gana = registro["quien_gana"]
+    if quien_gana:
+        fav = next((m for m in mercados if m["mercado"] == "Moneyline"
+                    and m["outcome"] == quien_gana["favorito"]), None)
+        if fav is not None:
+            quien_gana = {**quien_gana, "favorito_poly": fav["poly"], "favorito_nea": fav["nea"]}
+    return {**registro, "mercados": mercados, "oportunidades": oportunidades,
+            "quien_gana": quien_gana}
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # MAIN
 # ══════════════════════════════════════════════════════════════════════════════
 
-def main():
+def _p_local_clob(item: dict, precios: dict) -> float:
+    """Precio CLOB del outcome local del Moneyline (0.5 si no hay)."""
+    ml  = item["mercados"].get("💰 Moneyline")
+    emp = item["emparejamiento"]
+    if ml:
+        for outcome, tid in zip(ml["outcomes"], ml["token_ids"]):
+            if outcome == emp["outcome_local"] and tid in precios:
+                return precios[tid]
+    return 0.5
+
+
+def main(fecha: date | None = None, usar_gemini: bool = True, workers: int | None = None,
+         emitir=None, guardar: bool | None = None) -> list[dict]:
+    """
+    Análisis completo de una fecha (hoy por defecto). Devuelve un registro por
+    partido (registro_partido).
+
+    emitir(registro): cada partido se puntúa y se emite en cuanto termina su
+                      análisis, sin esperar al resto del slate (CLI NDJSON)
+    guardar         : escribe resultados.json; por defecto sólo si la fecha es hoy
+    """
+    fecha   = fecha or date.today()
+    workers = workers or GEMINI_WORKERS
+    guardar = (fecha == date.today()) if guardar is None else guardar
+
     print("\n" + "╔" + "═"*66 + "╗")
     print("║" + "  🏀  NBA EDGE ALPHA BOT  v3.5  —  Detector de Oportunidades".center(66) + "║")
     print("╚" + "═"*66 + "╝")
-    print(f"\n  Fecha: {date.today()}")
+    print(f"\n  Fecha: {fecha}")
     print(f"  Scalping : NEA ≤ -{SCALP_UMBRAL} y valor_real ≥ {SCALP_REAL}¢")
     print(f"  Quien gana: gap real_values ≥ {REAL_GAP_MIN}¢ entre los dos equipos\n")
 
     # ── 1. Obtener partidos ───────────────────────────────────────────────────
-    print("📡 [1/4] Cargando partidos desde Polymarket...")
+    vuelos_inicio = coalescencia.estadisticas()
+    activas = ligas.ligas_activas()
+    print(f"📡 [1/4] Cargando partidos desde Polymarket "
+          f"({', '.join(l.codigo for l in activas) or 'sin ligas'})...")
     try:
-        partidos = obtener_partidos_hoy()
+        partidos = obtener_partidos_hoy(activas, fecha)
     except Exception as e:
-        print(f"  ❌ Error: {e}"); return
+        print(f"  ❌ Error: {e}"); return []
 
     if not partidos:
-        print("  Sin partidos para hoy."); return
+        print(f"  Sin partidos para {fecha}."); return []
     print(f"  ✅ {len(partidos)} partido(s) encontrado(s)")
 
     estructura = construir_estructura(partidos)
     print(f"  📋 {len(estructura)} partido(s) con mercados válidos")
+    dudosos = informe_emparejamiento(estructura)
 
     # ── 2. Precios CLOB ───────────────────────────────────────────────────────
     print("\n💹 [2/4] Obteniendo precios CLOB...")
@@ -571,39 +1523,108 @@ def main():
     precios = obtener_precios_paralelo(all_tokens)
     print(f"  ✅ {len(precios)}/{len(all_tokens)} precios obtenidos")
 
+    analisis_por_partido = [_valores_defecto(_p_local_clob(item, precios)) for item in estructura]
+    intentos_partido     = [0 for _ in estructura]
+    puntuados: dict[int, tuple] = {}   # i → (oportunidades, quien_gana, equipos, registro)
+
+    def _puntuar(i: int, bandas_partido: dict | None) -> None:
+        ops, qg, equipos = imprimir_analisis(estructura[i], analisis_por_partido[i],
+                                             precios, bandas_partido)
+        reg = registro_partido(estructura[i], analisis_por_partido[i], ops, qg, equipos, fecha)
+        puntuados[i] = (ops, qg, equipos, reg)
+        if emitir:
+            emitir(reg)
+
     # ── 3. Análisis Gemini ────────────────────────────────────────────────────
-    print(f"\n🤖 [3/4] Analizando {len(estructura)} partido(s) con Gemini + Google Search...")
-    analisis_por_partido = {}
-    for item in estructura:
-        titulo = item["evento"].get("title", "?")
-        equipo_visit, equipo_local = extraer_equipos(titulo)
-        ml = item["mercados"].get("💰 Moneyline")
-        p_local_clob = 0.5
-        if ml:
-            for outcome, tid in zip(ml["outcomes"], ml["token_ids"]):
-                if outcome.lower() == equipo_local.lower() and tid in precios:
-                    p_local_clob = precios[tid]; break
-        print(f"  🔍 {titulo}  ({GEMINI_RUNS} runs → promedio)...")
-        analisis = analizar_partido_con_gemini(equipo_local, equipo_visit, p_local_clob)
-        analisis_por_partido[titulo] = analisis
-        print(f"     FINAL → Vegas={analisis['p_vegas']:.1f}  "
-              f"N_local={analisis['n_local']:+.1f}  "
-              f"N_visit={analisis['n_visitante']:+.1f}  "
-              f"R_local={analisis['r_local']:.1f}  "
-              f"R_visit={analisis['r_visitante']:.1f}  "
-              f"Stars_local={analisis['estrellas_bajas_local']}  "
-              f"Stars_visit={analisis['estrellas_bajas_visitante']}")
+    # Partidos sin local/visitante asignable no gastan llamadas a Gemini
+    analizables = [i for i, item in enumerate(estructura)
+                   if usar_gemini and item["emparejamiento"]["metodo"] != "fallo"]
+    if not usar_gemini:
+        print("\n🤖 [3/4] Gemini desactivado (--no-gemini): P_Vegas = precio CLOB")
+    else:
+        print(f"\n🤖 [3/4] Analizando {len(analizables)} partido(s) con Gemini + Google Search...")
+
+    def _nombre(liga: Liga, equipo: str) -> str:
+        return liga.canonico(equipo) or equipo
+
+    equipos_slate = [(item["liga"], _nombre(item["liga"], item["emparejamiento"][rol]))
+                     for item in (estructura[i] for i in analizables)
+                     for rol in ("visitante", "local")]
+    if equipos_slate:
+        print(f"  📈 Racha de {len(set(equipos_slate))} equipo(s) (1 consulta por equipo y día)...")
+        precargar_rachas(equipos_slate, fecha, max_workers=min(8, workers))
+
+    def _analizar(item: dict) -> dict:
+        liga, emp = item["liga"], item["emparejamiento"]
+        return analizar_partido_con_gemini(_nombre(liga, emp["local"]),
+                                           _nombre(liga, emp["visitante"]),
+                                           _p_local_clob(item, precios), liga, fecha)
+
+    def _titulo(i: int) -> str:
+        return f"[{estructura[i]['liga'].codigo}] {estructura[i]['evento'].get('title', '?')}"
+
+    def _reintentar(i, intento, espera, error):
+        motivo = "ningún run válido" if isinstance(error, str) else error
+        print(f"  ↻  {_titulo(i)}: {motivo}, reintento {intento + 1}/"
+              f"{PARTIDO_INTENTOS} en {espera:.1f}s")
+
+    def _terminado(i, res):
+        intentos_partido[i] = res["intentos"]
+        analisis = res["valor"]
+        if analisis is None:
+            print(f"  ⚠️  {_titulo(i)}: {res['error']} → valores por defecto")
+        else:
+            analisis_por_partido[i] = analisis
+            icono = "⚠️ " if analisis["estado"] == "defaulted" else "✔ "
+            print(f"  {icono} {_titulo(i)}  ({analisis['estado']}, {analisis['runs_ok']}/{GEMINI_RUNS} runs)\n"
+                  f"     FINAL → Vegas={analisis['p_vegas']:.1f}  "
+                  f"N_local={analisis['n_local']:+.1f}  "
+                  f"N_visit={analisis['n_visitante']:+.1f}  "
+                  f"R_local={analisis['r_local']:.1f}  "
+                  f"R_visit={analisis['r_visitante']:.1f}  "
+                  f"Stars_local={analisis['estrellas_bajas_local']}  "
+                  f"Stars_visit={analisis['estrellas_bajas_visitante']}")
+        # En streaming el partido se puntúa ya, con sus propias bandas
+        if emitir:
+            _puntuar(i, calcular_bandas([analisis_por_partido[i]], log=False)[0])
+
+    # Todos los partidos de todas las ligas comparten un pool de `workers`;
+    # un partido sin ningún run válido vuelve a la cola con backoff sin frenar al resto
+    if analizables:
+        print(f"  🔍 {GEMINI_RUNS} runs Vegas/noticias por partido → promedio "
+              f"({workers} partidos en paralelo)...")
+        cola = ColaReintentos(workers, intentos=PARTIDO_INTENTOS, base=PARTIDO_BACKOFF,
+                              es_fallo=lambda a: a["estado"] == "defaulted")
+        cola.ejecutar({i: (lambda item=estructura[i]: _analizar(item)) for i in analizables},
+                      al_terminar=_terminado, al_reintentar=_reintentar)
+
+    estados = [{
+        "partido":  item["evento"].get("title", "?"),
+        "liga":     item["liga"].codigo,
+        "hora":     hora_et(item["evento"].get("startTime", "")),
+        "estado":   analisis["estado"],
+        "runs_ok":  analisis["runs_ok"],
+        "intentos": intentos,
+    } for item, analisis, intentos in zip(estructura, analisis_por_partido, intentos_partido)]
+    conteo = {e: sum(1 for x in estados if x["estado"] == e) for e in ("fresh", "cached", "defaulted")}
+    print(f"  📦 Datos: {conteo['fresh']} fresh, {conteo['cached']} cached, "
+          f"{conteo['defaulted']} defaulted")
 
     # ── 4. Calcular NEA y mostrar análisis ────────────────────────────────────
     print(f"\n📊 [4/4] Calculando NBA Edge Alpha (NEA)...\n")
-    todas_ops    = []
-    todos_quienes = []
+    pendientes = [i for i in range(len(estructura)) if i not in puntuados]
+    if pendientes:
+        bandas = calcular_bandas([analisis_por_partido[i] for i in pendientes])
+        for i, bandas_partido in zip(pendientes, bandas):
+            _puntuar(i, bandas_partido)
 
-    for item in estructura:
-        titulo   = item["evento"].get("title", "?")
-        analisis = analisis_por_partido.get(titulo, _valores_defecto(0.5))
-        ops, qg  = imprimir_analisis(item, analisis, precios)
+    todas_ops     = []
+    todos_quienes = []
+    todos_equipos = []
+    for i in range(len(estructura)):
+        ops, qg, equipos, _ = puntuados[i]
         todas_ops.extend(ops)
+        todos_equipos.extend(equipos)
         if qg:
             todos_quienes.append(qg)
 
@@ -657,9 +1678,109 @@ def main():
     print(f"  ⚠️  Solo informativo. No constituye consejo financiero.")
     print(f"{'═'*68}")
 
+    ahorro = coalescencia.resumen(vuelos_inicio)
+    if ahorro:
+        print(f"  🔁 Llamadas externas (pedidas→reales): {ahorro}")
+
     # ── Guardar resultados para la calculadora web ───────────────────────────
-    guardar_resultados(todos_quienes)
+    if guardar:
+        guardar_resultados(todos_quienes, todos_equipos, dudosos, estados, fecha)
+    return [puntuados[i][3] for i in range(len(estructura))]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# CLI
+# ══════════════════════════════════════════════════════════════════════════════
+
+def fechas_cli(args: argparse.Namespace) -> list[date]:
+    """--date, o el rango --from/--to (ambos inclusive). Por defecto hoy."""
+    if args.date:
+        return [args.date]
+    desde = args.desde or date.today()
+    hasta = args.hasta or desde
+    return [desde + timedelta(days=d) for d in range((hasta - desde).days + 1)]
+
+
+def cli(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="NBA-AI.py",
+        description="NBA Edge Alpha: NEA por partido con precios de Polymarket y análisis Gemini.",
+    )
+    parser.add_argument("--date", type=date.fromisoformat, help="fecha YYYY-MM-DD (por defecto hoy)")
+    parser.add_argument("--from", dest="desde", type=date.fromisoformat, help="inicio del rango")
+    parser.add_argument("--to", dest="hasta", type=date.fromisoformat, help="fin del rango (inclusive)")
+    parser.add_argument("--format", choices=("table", "json", "ndjson"), default="table",
+                        help="table: texto para humanos; json: un documento al final; "
+                             "ndjson: una línea por partido en cuanto se puntúa")
+    parser.add_argument("--workers", type=int, default=GEMINI_WORKERS,
+                        help="partidos analizados a la vez en total; con json/ndjson y un "
+                             "rango se reparten entre las fechas que corren en paralelo "
+                             f"(por defecto {GEMINI_WORKERS})")
+    parser.add_argument("--no-gemini", action="store_true",
+                        help="sin Gemini: sólo precios CLOB (P_Vegas = precio del Moneyline)")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="con json/ndjson, descarta el texto de progreso (si no, va a stderr)")
+    parser.add_argument("--profile", nargs="?", const=perfilado.DIRECTORIO, metavar="DIR",
+                        help="muestrea las pilas de todos los hilos durante la ejecución y "
+                             f"guarda .folded (flamegraph) + .json en DIR ({perfilado.DIRECTORIO})")
+    args = parser.parse_args(argv)
+    if args.date and (args.desde or args.hasta):
+        parser.error("--date no se combina con --from/--to")
+    if args.desde and args.hasta and args.hasta < args.desde:
+        parser.error("--to es anterior a --from")
+    if args.workers < 1:
+        parser.error("--workers debe ser ≥ 1")
+
+    fechas   = fechas_cli(args)
+    opciones = {"usar_gemini": not args.no_gemini, "workers": args.workers}
+
+    if not args.profile:
+        return _ejecutar_cli(args, fechas, opciones)
+    with perfilado.Perfilador() as perfil:
+        codigo = _ejecutar_cli(args, fechas, opciones)
+    nombre = perfil.guardar(args.profile)
+    with contextlib.redirect_stdout(sys.stdout if args.format == "table" else sys.stderr):
+        perfil.imprimir()
+        print(f"     → {os.path.join(args.profile, nombre)}.folded / .json")
+    return codigo
+
+
+def _ejecutar_cli(args: argparse.Namespace, fechas: list[date], opciones: dict) -> int:
+    if args.format == "table":
+        # Texto para humanos: fecha a fecha para que no se mezcle la salida
+        for f in fechas:
+            main(f, **opciones)
+        return 0
+
+    # json / ndjson: stdout sólo lleva datos; el progreso va a stderr (o a ningún sitio)
+    salida    = sys.stdout
+    lock      = threading.Lock()
+    registros: list[dict] = []
+
+    def emitir(reg: dict) -> None:
+        with lock:
+            registros.append(reg)
+            if args.format == "ndjson":
+                salida.write(json.dumps(reg, ensure_ascii=False) + "\n")
+                salida.flush()
+
+    # --workers es el total: fechas en paralelo × partidos por fecha ≤ workers
+    paralelas = min(len(fechas), args.workers)
+    opciones  = {**opciones, "workers": max(1, args.workers // paralelas)}
+
+    progreso = open(os.devnull, "w") if args.quiet else sys.stderr
+    with contextlib.redirect_stdout(progreso):
+        with ThreadPoolExecutor(max_workers=paralelas) as pool:
+            list(pool.map(lambda f: main(f, emitir=emitir, **opciones), fechas))
+    if args.quiet:
+        progreso.close()
+
+    if args.format == "json":
+        json.dump({"fechas": [str(f) for f in fechas], "partidos": registros},
+                  salida, ensure_ascii=False, indent=2)
+        salida.write("\n")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(cli())
@@ -1,68 +1,78 @@
 """
-Polymarket — Partidos NBA del día
-- Gamma API: partidos y mercados del día
+Polymarket — Partidos del día (NBA por defecto; LIGAS=NBA,WNBA,... vía ligas.py)
+- Gamma API: partidos y mercados del día, una consulta por liga en paralelo
 - CLOB API:  precios reales en paralelo (ThreadPoolExecutor)
+
+CLI: --date / --from / --to, --format table|json|ndjson, --workers (ver --help).
+Un rango de fechas comparte una sola consulta a Gamma por liga y un único lote
+de precios; con ndjson cada partido se emite en cuanto llegan todos sus precios.
 """
 
-import requests
+import os
+import sys
 import json
+import argparse
+import threading
+import contextlib
+import requests
 from datetime import datetime, date, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+
+import ligas
+from ligas import Liga
 
 GAMMA_API     = "https://gamma-api.polymarket.com"
 CLOB_API      = "https://clob.polymarket.com"
-NBA_SERIES_ID = 10345
 HEADERS       = {"User-Agent": "Mozilla/5.0"}
 SESSION       = requests.Session()
 SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=20))
 
 
 # ── Gamma: partidos del día ───────────────────────────────────────────────────
 
-def obtener_partidos_hoy() -> list[dict]:
-    hoy = date.today().strftime("%Y-%m-%d")
-    print(f"📅 Fecha: {hoy}")
-    print("🔍 Gamma API: buscando partidos NBA...\n")
-
+def _eventos_liga(liga: Liga, dias: set[str]) -> tuple[list[dict], list[dict]]:
+    """(partidos de las fechas pedidas, todos los eventos) de una liga."""
     resp = SESSION.get(
         f"{GAMMA_API}/events",
         params={
-            "series_id": NBA_SERIES_ID, "tag_id": 100639,
+            "series_id": liga.series_id, "tag_id": liga.tag_id,
             "active": "true", "closed": "false",
             "limit": 50, "order": "startTime", "ascending": "true",
         }, timeout=15
     )
     resp.raise_for_status()
     todos = resp.json()
-    partidos = [e for e in todos if e.get("eventDate") == hoy]
+    for e in todos:
+        e["_liga"] = liga.codigo
+    return [e for e in todos if e.get("eventDate") in dias], todos
 
-    if not partidos:
-        fechas = sorted(set(e.get("eventDate", "?") for e in todos))
-        print(f"⚠️  Sin partidos para {hoy}. Próximas fechas: {fechas}")
-    return partidos
 
+def obtener_partidos_hoy(fechas: list[date] | None = None) -> list[dict]:
+    """Partidos de las fechas pedidas (hoy por defecto), una consulta por liga."""
+    dias = {f.strftime("%Y-%m-%d") for f in (fechas or [date.today()])}
+    activas = ligas.ligas_activas()
+    print(f"📅 Fecha: {', '.join(sorted(dias))}")
+    print(f"🔍 Gamma API: buscando partidos {', '.join(l.codigo for l in activas)}...\n")
+
+    partidos, todos = [], []
+    with ThreadPoolExecutor(max_workers=max(1, len(activas))) as pool:
+        for hoy_liga, todos_liga in pool.map(lambda l: _eventos_liga(l, dias), activas):
+            partidos += hoy_liga
+            todos    += todos_liga
+    partidos.sort(key=lambda e: str(e.get("startTime", "")))
 
-# ── Clasificación exacta según patrones de la API ────────────────────────────
+    if not partidos:
+        proximas = sorted(set(e.get("eventDate", "?") for e in todos))
+        print(f"⚠️  Sin partidos para {', '.join(sorted(dias))}. Próximas fechas: {proximas}")
+    return partidos
 
-def clasificar_mercado(pregunta: str) -> str | None:
-    p  = pregunta.strip()
-    pl = p.lower()
 
-    excluir = [
-        "points o/u", "rebounds o/u", "assists o/u", "steals o/u",
-        "blocks o/u", "turnovers o/u", "3-pointer", "field goal", "free throw",
-        "first quarter", "second quarter", "third quarter", "fourth quarter",
-        "first half", "second half", "halftime",
-        "triple double", "double double", "will there be",
-        "lead at any", "margin of victory", "largest lead",
-    ]
-    if any(ex in pl for ex in excluir):
-        return None
+# ── Clasificación exacta según patrones de la API (por liga, ver ligas.py) ───
 
-    if p.startswith("Spread:"):     return "📐 Spread"
-    if ": O/U" in p:                return "🎯 Total O/U"
-    if "vs." in pl and ":" not in p: return "💰 Moneyline"
-    return None
+def clasificar_mercado(pregunta: str, liga: Liga | None = None) -> str | None:
+    return (liga or ligas.LIGAS["NBA"]).clasificar_mercado(pregunta)
 
 
 # ── CLOB: precio individual ───────────────────────────────────────────────────
@@ -82,15 +92,21 @@ def precio_clob(token_id: str) -> tuple[str, float | None]:
         return token_id, None
 
 
-def obtener_precios_paralelo(token_ids: list[str]) -> dict[str, float]:
-    """Consulta todos los tokens en paralelo (máx 20 workers)."""
+def obtener_precios_paralelo(token_ids: list[str], workers: int = 20,
+                             al_precio=None) -> dict[str, float]:
+    """
+    Consulta todos los tokens en paralelo (20 workers por defecto).
+    al_precio(token_id, precio | None) se llama según va llegando cada uno.
+    """
     resultado = {}
-    with ThreadPoolExecutor(max_workers=20) as pool:
+    with ThreadPoolExecutor(max_workers=workers) as pool:
         futuros = {pool.submit(precio_clob, tid): tid for tid in token_ids}
         for futuro in as_completed(futuros):
             tid, precio = futuro.result()
             if precio is not None:
                 resultado[tid] = precio
+            if al_precio:
+                al_precio(tid, precio)
     return resultado
 
 
@@ -152,26 +168,114 @@ def parse_total_linea(pregunta: str, outcome: str) -> str:
         return outcome
 
 
+def registro_partido(item: dict, precios: dict) -> dict:
+    """Un partido con sus mercados y precios como dict serializable (NDJSON)."""
+    ev = item["evento"]
+    mercados = []
+    for tipo, m in item["mercados"].items():
+        for outcome, tid in zip(m["outcomes"], m["token_ids"]):
+            linea = (parse_spread_label(m["pregunta"], outcome) if tipo == "📐 Spread" else
+                     parse_total_linea(m["pregunta"], outcome) if tipo == "🎯 Total O/U" else None)
+            mercados.append({
+                "mercado":  tipo.split(" ", 1)[-1],
+                "pregunta": m["pregunta"],
+                "outcome":  outcome,
+                "linea":    linea,
+                "token_id": tid,
+                "precio":   precios.get(tid),
+            })
+    return {
+        "fecha":    ev.get("eventDate"),
+        "liga":     ev.get("_liga", "NBA"),
+        "partido":  ev.get("title", "?"),
+        "hora":     hora_et(ev.get("startTime", "")),
+        "volumen":  float(ev.get("volume", 0) or 0),
+        "liquidez": float(ev.get("liquidity", 0) or 0),
+        "mercados": mercados,
+    }
+
+
+def imprimir_partido(item: dict, precios: dict) -> None:
+    ev     = item["evento"]
+    titulo = ev.get("title", "?")
+    hora   = hora_et(ev.get("startTime", ""))
+    vol    = float(ev.get("volume", 0) or 0)
+    liq    = float(ev.get("liquidity", 0) or 0)
+
+    print(f"{'─'*64}")
+    print(f"  🏀  [{ev.get('_liga', 'NBA')}] {titulo}")
+    print(f"       ⏰ {ev.get('eventDate', '')} {hora}   |   Vol ${vol:,.0f}   |   Liq ${liq:,.0f}")
+    print()
+
+    ml_m  = item["mercados"].get("💰 Moneyline")
+    spr_m = item["mercados"].get("📐 Spread")
+    tot_m = item["mercados"].get("🎯 Total O/U")
+
+    # Construir filas (1 por outcome, normalmente 2)
+    n_rows = max(
+        len(ml_m["outcomes"])  if ml_m  else 0,
+        len(spr_m["outcomes"]) if spr_m else 0,
+        len(tot_m["outcomes"]) if tot_m else 0,
+    )
+
+    # Encabezado
+    print(f"       {'MONEYLINE':<22} {'SPREAD':<22} {'TOTAL'}")
+
+    for row in range(n_rows):
+        ml_str = spr_str = tot_str = ""
+
+        if ml_m and row < len(ml_m["outcomes"]):
+            outcome = ml_m["outcomes"][row]
+            tid     = ml_m["token_ids"][row]
+            precio  = precios.get(tid)
+            if precio is not None:
+                ml_str = f"{outcome} {centavos(precio)}"
+
+        if spr_m and row < len(spr_m["outcomes"]):
+            outcome = spr_m["outcomes"][row]
+            tid     = spr_m["token_ids"][row]
+            precio  = precios.get(tid)
+            if precio is not None:
+                pts = parse_spread_label(spr_m["pregunta"], outcome)
+                spr_str = f"{outcome} {pts} {centavos(precio)}"
+
+        if tot_m and row < len(tot_m["outcomes"]):
+            outcome = tot_m["outcomes"][row]
+            tid     = tot_m["token_ids"][row]
+            precio  = precios.get(tid)
+            if precio is not None:
+                lbl = parse_total_linea(tot_m["pregunta"], outcome)
+                tot_str = f"{lbl} {centavos(precio)}"
+
+        print(f"       {ml_str:<22} {spr_str:<22} {tot_str}")
+
+    print()
+
+
 # ── Main ──────────────────────────────────────────────────────────────────────
 
-def main():
+def main(fechas: list[date] | None = None, workers: int = 20, emitir=None) -> list[dict]:
+    """
+    Imprime los partidos de las fechas pedidas (hoy por defecto). Con `emitir`
+    cada partido se entrega como registro en cuanto tiene todos sus precios.
+    """
     print("\n" + "="*64)
-    print("  🏀  POLYMARKET — NBA HOY  (precios CLOB en tiempo real)")
+    print("  🏀  POLYMARKET — PARTIDOS  (precios CLOB en tiempo real)")
     print("="*64 + "\n")
 
-    partidos = obtener_partidos_hoy()
+    partidos = obtener_partidos_hoy(fechas)
     if not partidos:
-        return
+        return []
     print(f"  ✅ {len(partidos)} partido(s) encontrado(s)\n")
 
     # ── Seleccionar los 3 mercados principales por partido ────────────────────
-    ORDEN = {"💰 Moneyline": 0, "📐 Spread": 1, "🎯 Total O/U": 2}
     estructura = []
 
     for evento in partidos:
+        liga = ligas.LIGAS[evento.get("_liga", "NBA")]
         candidatos = []
         for m in evento.get("markets", []):
-            tipo = clasificar_mercado(m.get("question", ""))
+            tipo = clasificar_mercado(m.get("question", ""), liga)
             if not tipo:
                 continue
             token_ids = extraer_token_ids(m)
@@ -203,69 +307,100 @@ def main():
         for tid in m["token_ids"]
     })
 
+    # Partidos pendientes de cada token: un partido se emite al llegar su último precio
+    faltan   = [len({t for m in item["mercados"].values() for t in m["token_ids"]})
+                for item in estructura]
+    por_token: dict[str, list[int]] = {}
+    for i, item in enumerate(estructura):
+        for tid in {t for m in item["mercados"].values() for t in m["token_ids"]}:
+            por_token.setdefault(tid, []).append(i)
+    precios_parciales: dict[str, float] = {}
+    registros = [None] * len(estructura)
+
+    def _al_precio(tid: str, precio: float | None) -> None:
+        if precio is not None:
+            precios_parciales[tid] = precio
+        for i in por_token.get(tid, []):
+            faltan[i] -= 1
+            if faltan[i] == 0:
+                registros[i] = registro_partido(estructura[i], precios_parciales)
+                if emitir:
+                    emitir(registros[i])
+
+    # Partidos sin mercados no esperan a ningún precio
+    for i, n in enumerate(faltan):
+        if n == 0:
+            registros[i] = registro_partido(estructura[i], {})
+            if emitir:
+                emitir(registros[i])
+
     print(f"💹 CLOB API: consultando {len(all_tokens)} tokens en paralelo...\n")
-    precios = obtener_precios_paralelo(all_tokens)
+    precios = obtener_precios_paralelo(all_tokens, workers, _al_precio)
     print(f"   ✅ {len(precios)}/{len(all_tokens)} precios obtenidos\n")
 
     # ── Mostrar ───────────────────────────────────────────────────────────────
     for item in estructura:
-        ev     = item["evento"]
-        titulo = ev.get("title", "?")
-        hora   = hora_et(ev.get("startTime", ""))
-        vol    = float(ev.get("volume", 0) or 0)
-        liq    = float(ev.get("liquidity", 0) or 0)
-
-        print(f"{'─'*64}")
-        print(f"  🏀  {titulo}")
-        print(f"       ⏰ {hora}   |   Vol ${vol:,.0f}   |   Liq ${liq:,.0f}")
-        print()
-
-        ml_m  = item["mercados"].get("💰 Moneyline")
-        spr_m = item["mercados"].get("📐 Spread")
-        tot_m = item["mercados"].get("🎯 Total O/U")
-
-        # Construir filas (1 por outcome, normalmente 2)
-        n_rows = max(
-            len(ml_m["outcomes"])  if ml_m  else 0,
-            len(spr_m["outcomes"]) if spr_m else 0,
-            len(tot_m["outcomes"]) if tot_m else 0,
-        )
-
-        # Encabezado
-        print(f"       {'MONEYLINE':<22} {'SPREAD':<22} {'TOTAL'}")
-
-        for row in range(n_rows):
-            ml_str = spr_str = tot_str = ""
-
-            if ml_m and row < len(ml_m["outcomes"]):
-                outcome = ml_m["outcomes"][row]
-                tid     = ml_m["token_ids"][row]
-                precio  = precios.get(tid)
-                if precio is not None:
-                    ml_str = f"{outcome} {centavos(precio)}"
-
-            if spr_m and row < len(spr_m["outcomes"]):
-                outcome = spr_m["outcomes"][row]
-                tid     = spr_m["token_ids"][row]
-                precio  = precios.get(tid)
-                if precio is not None:
-                    pts = parse_spread_label(spr_m["pregunta"], outcome)
-                    spr_str = f"{outcome} {pts} {centavos(precio)}"
-
-            if tot_m and row < len(tot_m["outcomes"]):
-                outcome = tot_m["outcomes"][row]
-                tid     = tot_m["token_ids"][row]
-                precio  = precios.get(tid)
-                if precio is not None:
-                    lbl = parse_total_linea(tot_m["pregunta"], outcome)
-                    tot_str = f"{lbl} {centavos(precio)}"
-
-            print(f"       {ml_str:<22} {spr_str:<22} {tot_str}")
-
-        print()
+        imprimir_partido(item, precios)
 
     print("="*64 + "\n")
+    return registros
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+
+def cli(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="NBA-POLY.py", description="Partidos del día en Polymarket con precios CLOB.")
+    parser.add_argument("--date", type=date.fromisoformat, help="fecha YYYY-MM-DD (por defecto hoy)")
+    parser.add_argument("--from", dest="desde", type=date.fromisoformat, help="inicio del rango")
+    parser.add_argument("--to", dest="hasta", type=date.fromisoformat, help="fin del rango (inclusive)")
+    parser.add_argument("--format", choices=("table", "json", "ndjson"), default="table",
+                        help="table: texto para humanos; json: un documento al final; "
+                             "ndjson: una línea por partido en cuanto tiene precios")
+    parser.add_argument("--workers", type=int, default=20, help="consultas CLOB en paralelo")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="con json/ndjson, descarta el texto de progreso (si no, va a stderr)")
+    args = parser.parse_args(argv)
+    if args.date and (args.desde or args.hasta):
+        parser.error("--date no se combina con --from/--to")
+    if args.desde and args.hasta and args.hasta < args.desde:
+        parser.error("--to es anterior a --from")
+    if args.workers < 1:
+        parser.error("--workers debe ser ≥ 1")
+
+    if args.date:
+        fechas = [args.date]
+    else:
+        desde  = args.desde or date.today()
+        hasta  = args.hasta or desde
+        fechas = [desde + timedelta(days=d) for d in range((hasta - desde).days + 1)]
+
+    if args.format == "table":
+        main(fechas, args.workers)
+        return 0
+
+    # json / ndjson: stdout sólo lleva datos; el progreso va a stderr (o a ningún sitio)
+    salida = sys.stdout
+    lock   = threading.Lock()
+
+    def emitir(reg: dict) -> None:
+        if args.format == "ndjson":
+            with lock:
+                salida.write(json.dumps(reg, ensure_ascii=False) + "\n")
+                salida.flush()
+
+    progreso = open(os.devnull, "w") if args.quiet else sys.stderr
+    with contextlib.redirect_stdout(progreso):
+        registros = main(fechas, args.workers, emitir)
+    if args.quiet:
+        progreso.close()
+
+    if args.format == "json":
+        json.dump({"fechas": [str(f) for f in fechas], "partidos": registros},
+                  salida, ensure_ascii=False, indent=2)
+        salida.write("\n")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(cli())
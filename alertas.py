@@ -0,0 +1,308 @@
+"""
+Motor de alertas de precio: reglas de umbral evaluadas tras cada refresco de precios.
+
+Reglas:
+  nea        : NEA cruza hacia abajo -umbral   (entra en zona SCALPING)
+  gap        : gap entre real_values del partido cruza hacia arriba el mínimo
+  movimiento : el precio se mueve ≥ N¢ dentro de una ventana de M minutos
+
+Coste por tick independiente del nº de reglas: los umbrales se guardan ordenados
+y un cruce se detecta con bisect entre el valor anterior y el nuevo (O(log R)
++ alertas disparadas). Las reglas de movimiento se agrupan por ventana; cada
+ventana mantiene por token deques monótonos de mín/máx (O(1) amortizado).
+
+Debounce: una misma (regla, token) no se repite antes de `debounce` segundos.
+Las alertas se entregan a sinks intercambiables (SSE vía estado, webhook, archivo).
+
+Memoria: el último precio / valor_real / gap visto y el último disparo de cada
+regla viven en un objeto `memoria` (MemoriaLocal por defecto). Con varios
+workers de gunicorn se pasa el estado compartido: cada worker ve sólo sus
+propios refrescos, pero el valor anterior de un cruce y el debounce son los de
+todo el servicio, así cada cruce dispara una sola vez y no una por worker.
+"""
+
+import json
+import time
+import queue
+import bisect
+import threading
+import urllib.request
+from collections import deque
+
+
+# ── Sinks ─────────────────────────────────────────────────────────────────────
+
+class SinkArchivo:
+    """Añade cada alerta como una línea JSON."""
+
+    def __init__(self, path: str):
+        self.path  = path
+        self._lock = threading.Lock()
+
+    def enviar(self, alerta: dict) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(alerta, ensure_ascii=False) + "\n")
+
+
+class SinkWebhook:
+    """POST JSON a una URL desde un hilo propio: nunca bloquea el tick."""
+
+    def __init__(self, url: str, timeout: float = 5):
+        self.url     = url
+        self.timeout = timeout
+        self._cola: queue.Queue = queue.Queue(maxsize=1000)
+        threading.Thread(target=self._bucle, daemon=True).start()
+
+    def enviar(self, alerta: dict) -> None:
+        try:
+            self._cola.put_nowait(alerta)
+        except queue.Full:
+            print(f"  ⚠️  Webhook saturado, alerta descartada: {alerta['mensaje']}")
+
+    def _bucle(self):
+        while True:
+            alerta = self._cola.get()
+            req = urllib.request.Request(
+                self.url, data=json.dumps(alerta).encode("utf-8"),
+                headers={"Content-Type": "application/json"}, method="POST",
+            )
+            try:
+                urllib.request.urlopen(req, timeout=self.timeout).close()
+            except Exception as e:
+                print(f"  ⚠️  Webhook {self.url}: {e}")
+
+
+class SinkEstado:
+    """Publica en el estado compartido; /alertas/stream lo sirve por SSE."""
+
+    def __init__(self, estado):
+        self.estado = estado
+
+    def enviar(self, alerta: dict) -> None:
+        self.estado.agregar_alerta(alerta)
+
+
+# ── Memoria ───────────────────────────────────────────────────────────────────
+
+class MemoriaLocal:
+    """Últimos valores y disparos del propio proceso (un solo worker)."""
+
+    def __init__(self):
+        self._lock     = threading.Lock()
+        self._ultimos: dict[str, tuple[float, float]] = {}   # clave → (ts, valor)
+        self._disparos: dict[str, float] = {}                # regla|clave → ts
+
+    def intercambiar_ultimos(self, valores: dict[str, float],
+                             ts: float) -> dict[str, tuple[float, float]]:
+        """Guarda los valores nuevos; devuelve (ts, valor) anteriores de los que había."""
+        with self._lock:
+            previos = {k: self._ultimos[k] for k in valores if k in self._ultimos}
+            for k, v in valores.items():
+                self._ultimos[k] = (ts, v)
+            return previos
+
+    def reclamar_alerta(self, clave: str, ts: float, debounce: float) -> bool:
+        """True (y marca el disparo) si `clave` no disparó en los últimos `debounce` s."""
+        with self._lock:
+            ultima = self._disparos.get(clave)
+            if ultima is not None and ts - ultima < debounce:
+                return False
+            self._disparos[clave] = ts
+            return True
+
+
+# ── Ventanas de movimiento ────────────────────────────────────────────────────
+
+class _Ventana:
+    """Mín/máx deslizante de un token en los últimos `segundos` (deques monótonos)."""
+
+    __slots__ = ("segundos", "mins", "maxs")
+
+    def __init__(self, segundos: float):
+        self.segundos = segundos
+        self.mins: deque = deque()
+        self.maxs: deque = deque()
+
+    @property
+    def ultimo(self) -> float:
+        """ts de la última muestra (siempre queda al final de ambas deques)."""
+        return self.mins[-1][0] if self.mins else float("-inf")
+
+    def agregar(self, ts: float, precio: float) -> tuple[float, float]:
+        while self.mins and self.mins[-1][1] >= precio:
+            self.mins.pop()
+        while self.maxs and self.maxs[-1][1] <= precio:
+            self.maxs.pop()
+        self.mins.append((ts, precio))
+        self.maxs.append((ts, precio))
+        limite = ts - self.segundos
+        while self.mins[0][0] < limite:
+            self.mins.popleft()
+        while self.maxs[0][0] < limite:
+            self.maxs.popleft()
+        return self.mins[0][1], self.maxs[0][1]
+
+
+# ── Motor ─────────────────────────────────────────────────────────────────────
+
+class MotorAlertas:
+
+    def __init__(self, sinks: list | None = None, debounce: float = 300, memoria=None):
+        self.sinks    = sinks or []
+        self.debounce = debounce
+        self.memoria  = memoria or MemoriaLocal()
+        self._lock    = threading.Lock()
+        self._nea: list[float] = []                  # umbrales ordenados (descuento ¢)
+        self._gap: list[float] = []                  # mínimos ordenados (¢)
+        self._mov: dict[float, list[float]] = {}     # ventana (s) → centavos ordenados
+        self._ctx: dict[str, dict] = {}              # token → equipo, partido, valor_real, gap
+        self._precio: dict[str, float] = {}          # token → último precio visto aquí (¢)
+        self._ventanas: dict[tuple, _Ventana] = {}   # (token, ventana) → mín/máx
+        self._seq = 0
+
+    # ── Reglas ────────────────────────────────────────────────────────────────
+
+    def agregar_regla_nea(self, umbral: float) -> None:
+        with self._lock:
+            bisect.insort(self._nea, float(umbral))
+
+    def agregar_regla_gap(self, minimo: float) -> None:
+        with self._lock:
+            bisect.insort(self._gap, float(minimo))
+
+    def agregar_regla_movimiento(self, centavos: float, minutos: float) -> None:
+        with self._lock:
+            bisect.insort(self._mov.setdefault(float(minutos) * 60, []), float(centavos))
+
+    def agregar_reglas(self, reglas: list[dict]) -> None:
+        """[{"tipo": "nea", "umbral": 20}, {"tipo": "movimiento", "centavos": 5, "minutos": 10}, ...]"""
+        for r in reglas:
+            if r["tipo"] == "nea":
+                self.agregar_regla_nea(r["umbral"])
+            elif r["tipo"] == "gap":
+                self.agregar_regla_gap(r["minimo"])
+            elif r["tipo"] == "movimiento":
+                self.agregar_regla_movimiento(r["centavos"], r["minutos"])
+            else:
+                raise ValueError(f"Tipo de regla desconocido: {r['tipo']!r}")
+
+    # ── Entradas ──────────────────────────────────────────────────────────────
+
+    def actualizar_contexto(self, token_id: str, equipo: str, partido: str,
+                            valor_real: float, gap: float | None = None) -> list[dict]:
+        """Nuevo valor_real / gap tras un análisis. Evalúa cruces de NEA y gap."""
+        ts = time.time()
+        valores = {f"real|{token_id}": valor_real}
+        if gap is not None:
+            valores[f"gap|{partido}"] = gap       # uno por partido: los dos tokens lo comparten
+        previos = self.memoria.intercambiar_ultimos(valores, ts)
+        with self._lock:
+            self._ctx[token_id] = {"equipo": equipo, "partido": partido,
+                                   "valor_real": valor_real, "gap": gap}
+            alertas = []
+            gap_antes = previos.get(f"gap|{partido}")
+            if gap_antes is not None:
+                for m in self._cruces(self._gap, gap_antes[1], gap):
+                    alertas += self._disparar(
+                        ts, f"gap≥{m:g}", partido, token_id,
+                        f"{partido}: gap real {gap_antes[1]:.1f}¢ → {gap:.1f}¢ (≥ {m:g}¢)", gap)
+            real_antes = previos.get(f"real|{token_id}")
+            precio     = self._precio.get(token_id)
+            if real_antes is not None and precio is not None:
+                alertas += self._evaluar_nea(ts, token_id,
+                                             real_antes[1] - precio, valor_real - precio)
+        self._entregar(alertas)
+        return alertas
+
+    def tick(self, token_id: str, precio: float, ts: float | None = None) -> list[dict]:
+        """Nuevo precio (0-1) de un token."""
+        return self.procesar_precios({token_id: precio}, ts)
+
+    def procesar_precios(self, precios: dict[str, float],
+                         ts: float | None = None) -> list[dict]:
+        """Oyente de obtener_precios_paralelo: evalúa un lote de precios (0-1)."""
+        ts       = ts if ts is not None else time.time()
+        centavos = {token_id: precio * 100 for token_id, precio in precios.items()}
+        previos  = self.memoria.intercambiar_ultimos(
+            {f"precio|{t}": c for t, c in centavos.items()}, ts)
+        alertas = []
+        with self._lock:
+            for token_id, precio in centavos.items():
+                alertas += self._tick(ts, token_id, precio, previos.get(f"precio|{token_id}"))
+        self._entregar(alertas)
+        return alertas
+
+    # ── Internos (con self._lock tomado) ──────────────────────────────────────
+
+    def _tick(self, ts: float, token_id: str, precio: float,
+              previo: tuple[float, float] | None) -> list[dict]:
+        # previo: último (ts, precio) del servicio, quizá visto por otro worker
+        self._precio[token_id] = precio
+        alertas = []
+        ctx = self._ctx.get(token_id)
+        if ctx and previo is not None:
+            alertas += self._evaluar_nea(ts, token_id,
+                                         ctx["valor_real"] - previo[1],
+                                         ctx["valor_real"] - precio)
+        for segundos, centavos in self._mov.items():
+            ventana = self._ventanas.get((token_id, segundos))
+            if ventana is None:
+                ventana = self._ventanas[(token_id, segundos)] = _Ventana(segundos)
+            if previo is not None and previo[0] > ventana.ultimo:
+                ventana.agregar(*previo)         # refresco de otro worker desde el último nuestro
+            minimo, maximo = ventana.agregar(ts, precio)
+            movimiento = max(precio - minimo, maximo - precio)
+            for n in centavos[:bisect.bisect_right(centavos, movimiento)]:
+                sentido = "sube" if precio - minimo >= maximo - precio else "baja"
+                alertas += self._disparar(
+                    ts, f"mov≥{n:g}¢/{segundos / 60:g}m", token_id, token_id,
+                    f"{self._nombre(token_id)} {sentido} {movimiento:.1f}¢ en "
+                    f"{segundos / 60:g} min (ahora {precio:.1f}¢)", movimiento)
+        return alertas
+
+    @staticmethod
+    def _cruces(umbrales: list[float], antes: float, despues: float) -> list[float]:
+        """Umbrales u con antes < u ≤ despues (cruce ascendente)."""
+        if despues <= antes:
+            return []
+        return umbrales[bisect.bisect_right(umbrales, antes):bisect.bisect_right(umbrales, despues)]
+
+    def _evaluar_nea(self, ts: float, token_id: str,
+                     desc_antes: float, desc_despues: float) -> list[dict]:
+        # descuento = valor_real - precio = -NEA; NEA ≤ -u  ⇔  descuento ≥ u
+        alertas = []
+        for u in self._cruces(self._nea, desc_antes, desc_despues):
+            alertas += self._disparar(
+                ts, f"nea≤-{u:g}", token_id, token_id,
+                f"{self._nombre(token_id)} entra en SCALPING: NEA {-desc_despues:+.1f} "
+                f"(≤ -{u:g})", -desc_despues)
+        return alertas
+
+    def _nombre(self, token_id: str) -> str:
+        ctx = self._ctx.get(token_id)
+        return f"{ctx['equipo']} ({ctx['partido']})" if ctx else token_id
+
+    def _disparar(self, ts: float, regla: str, clave: str, token_id: str,
+                  mensaje: str, valor: float) -> list[dict]:
+        if not self.memoria.reclamar_alerta(f"{regla}|{clave}", ts, self.debounce):
+            return []
+        self._seq += 1
+        ctx = self._ctx.get(token_id, {})
+        return [{
+            "seq":      self._seq,
+            "ts":       ts,
+            "regla":    regla,
+            "token_id": token_id,
+            "equipo":   ctx.get("equipo"),
+            "partido":  ctx.get("partido"),
+            "valor":    round(valor, 2),
+            "mensaje":  mensaje,
+        }]
+
+    def _entregar(self, alertas: list[dict]) -> None:
+        for alerta in alertas:
+            for sink in self.sinks:
+                try:
+                    sink.enviar(alerta)
+                except Exception as e:
+                    print(f"  ⚠️  Sink {type(sink).__name__}: {e}")
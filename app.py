@@ -1,37 +1,65 @@
 """
 NBA Edge Alpha Bot — Web Dashboard
 Ejecuta el análisis en background y hace streaming del output al browser via SSE.
+
+Desarrollo : python app.py                       (estado en memoria, 1 proceso)
+Producción : gunicorn -c gunicorn.conf.py app:app (gevent, estado en SQLite)
 """
 
 import os
 import sys
 import json
 import time
+import atexit
+import hashlib
 import threading
 import importlib.util
-from flask import Flask, render_template, Response, jsonify
+from collections import OrderedDict
+from flask import Flask, render_template, Response, jsonify, request, send_from_directory
+
+import entorno   # .env antes que estado / alertas lean su configuración
+import coalescencia
+from estado import crear_estado, RUN_LATIDO
+from notificador import Notificador
 
 app = Flask(__name__)
 
 # ── Cargar NBA-AI como módulo (el nombre tiene guión, no se puede importar directo)
-_spec = importlib.util.spec_from_file_location(
-    "nba_ai", os.path.join(os.path.dirname(__file__), "NBA-AI.py")
-)
-nba_ai = importlib.util.module_from_spec(_spec)
-_spec.loader.exec_module(nba_ai)
-
-# ── Estado global del análisis ────────────────────────────────────────────────
-_state: dict = {
-    "running":   False,
-    "completed": False,
-    "output":    [],
-    "error":     None,
-}
-_lock = threading.Lock()
+# Se carga en el primer /run, no al importar app.py: así el healthcheck "/"
+# responde en cuanto Flask arranca, sin esperar a requests/google-genai/etc.
+_nba_ai = None
+_nba_ai_lock = threading.Lock()
+
+
+def _modulo_analisis():
+    global _nba_ai, _motor
+    with _nba_ai_lock:
+        if _nba_ai is None:
+            spec = importlib.util.spec_from_file_location(
+                "nba_ai", os.path.join(os.path.dirname(__file__), "NBA-AI.py")
+            )
+            modulo = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(modulo)
+            _motor = _crear_motor_alertas(modulo)
+            modulo.registrar_oyente_precios(_alertas_precios)
+            modulo.registrar_oyente_precios(_registrar_historial)
+            modulo.registrar_oyente_precios(_actualizar_slate)
+            _nba_ai = modulo
+    return _nba_ai
+
+
+# ── Estado del análisis (memoria o SQLite compartido entre workers) ──────────
+ESTADO = crear_estado()
+
+# Un sondeo por proceso para todos los streams SSE abiertos (lambda: sigue a
+# ESTADO aunque se reasigne)
+_VERSION_RUN    = Notificador(lambda: ESTADO.version(), 0.15)
+_VERSION_SLATE  = Notificador(lambda: ESTADO.slate_version(), 1.0)
+_VERSION_ALERTA = Notificador(lambda: ESTADO.ultima_alerta(), 1.0)
 
 
 class _Capture:
-    """Redirige stdout al buffer compartido y también lo muestra en terminal."""
+    """Redirige stdout al estado compartido y también lo muestra en terminal."""
 
     def __init__(self, original):
         self.original = original
@@ -40,8 +68,7 @@ class _Capture:
         self.original.write(text)
         stripped = text.rstrip("\n")
         if stripped:
-            with _lock:
-                _state["output"].append(stripped)
+            ESTADO.agregar_linea(stripped)
 
     def flush(self):
         self.original.flush()
@@ -50,21 +77,188 @@ class _Capture:
         return False
 
 
-def _run_analysis():
+# ── Alertas de precio ─────────────────────────────────────────────────────────
+ALERTAS_WEBHOOK  = os.environ.get("ALERTAS_WEBHOOK", "")
+ALERTAS_ARCHIVO  = os.environ.get("ALERTAS_ARCHIVO", "")
+ALERTAS_REGLAS   = os.environ.get("ALERTAS_REGLAS", "")     # JSON; vacío = reglas por defecto
+REFRESH_SEGUNDOS = int(os.environ.get("REFRESH_SEGUNDOS", "0"))   # 0 = sin refresco automático
+
+_motor = None   # se crea junto con el módulo de análisis
+_contexto_version = None         # versión de resultados.json cargada en el motor
+_contexto_lock = threading.Lock()
+
+
+def _crear_motor_alertas(nba):
+    """
+    Motor de alertas del worker; se alimenta con cada obtener_precios_paralelo.
+    Último precio/valor y debounce viven en ESTADO: con varios workers cada
+    cruce dispara una sola vez aunque lo vean todos.
+    """
+    import alertas
+    sinks = [alertas.SinkEstado(ESTADO)]
+    if ALERTAS_WEBHOOK:
+        sinks.append(alertas.SinkWebhook(ALERTAS_WEBHOOK))
+    if ALERTAS_ARCHIVO:
+        sinks.append(alertas.SinkArchivo(ALERTAS_ARCHIVO))
+    motor = alertas.MotorAlertas(sinks, memoria=ESTADO)
+    motor.agregar_reglas(json.loads(ALERTAS_REGLAS) if ALERTAS_REGLAS else [
+        {"tipo": "nea",        "umbral": nba.SCALP_UMBRAL},
+        {"tipo": "gap",        "minimo": nba.REAL_GAP_MIN},
+        {"tipo": "movimiento", "centavos": 5, "minutos": 10},
+    ])
+    return motor
+
+
+def _equipos_resultados() -> list[dict]:
+    try:
+        with open(RESULTADOS_PATH, encoding="utf-8") as f:
+            return json.load(f).get("equipos", [])
+    except (FileNotFoundError, ValueError):
+        return []
+
+
+def _sincronizar_contexto_alertas(motor) -> None:
+    """
+    Pasa al motor el valor_real / gap de cada token si resultados.json cambió
+    desde la última carga. El análisis puede haber corrido en otro worker: se
+    comprueba en cada lote de precios, no sólo al terminar un /run propio, y
+    los cruces de gap de un análisis nuevo se evalúan en ese tick.
+    """
+    global _contexto_version
+    with _contexto_lock:
+        version = _version_resultados()
+        if version is None or version == _contexto_version:
+            return
+        _contexto_version = version
+        for eq in _equipos_resultados():
+            # El Total O/U no tiene valor real propio (ver clasificar_nea): sin alertas NEA
+            if eq.get("mercado", "").endswith("Total O/U"):
+                continue
+            motor.actualizar_contexto(eq["token_id"], eq["equipo"], eq["partido"],
+                                      eq["real"], eq.get("gap"))
+
+
+def _alertas_precios(precios: dict) -> None:
+    """Oyente de precios: contexto al día y luego un tick por token."""
+    _sincronizar_contexto_alertas(_motor)
+    _motor.procesar_precios(precios)
+
+
+def refrescar_precios() -> int:
+    """Re-consulta los precios CLOB del último slate (dispara oyentes: alertas, slate, ...)."""
+    _, partidos, _ = ESTADO.slate()
+    tokens = list({eq["token_id"] for eq in _equipos_resultados()}
+                  | {m["token_id"] for p in partidos for m in p["mercados"]})
+    if not tokens:
+        return 0
+    return len(_modulo_analisis().obtener_precios_paralelo(tokens))
+
+
+def _bucle_refresco():
+    # Con varios workers de gunicorn sólo refresca el que obtiene el lock
+    import fcntl
+    lock = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".refresco.lock"), "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return
+    while True:
+        time.sleep(REFRESH_SEGUNDOS)
+        try:
+            refrescar_precios()
+        except Exception as exc:
+            print(f"  ⚠️  Refresco de precios: {exc}")
+
+
+if REFRESH_SEGUNDOS > 0:
+    threading.Thread(target=_bucle_refresco, daemon=True).start()
+
+
+# ── Historial de precios ──────────────────────────────────────────────────────
+HISTORIAL_PATH         = os.path.join(os.path.dirname(os.path.abspath(__file__)), "historial.npz")
+HISTORIAL_GUARDAR_CADA = 300   # segundos entre volcados a disco (y siempre al salir)
+
+_historial = None
+_historial_lock = threading.Lock()
+_historial_guardado = 0.0
+
+
+def _obtener_historial():
+    global _historial
+    with _historial_lock:
+        if _historial is None:
+            import historial
+            _historial = historial.Historial()
+            _historial.cargar(HISTORIAL_PATH)
+            atexit.register(_guardar_historial)
+    return _historial
+
+
+def _guardar_historial():
+    global _historial_guardado
+    if _historial is not None and _historial.ultima_ingesta is not None:
+        _historial.guardar(HISTORIAL_PATH)
+        _historial_guardado = time.time()
+
+
+def _registrar_historial(precios: dict) -> None:
+    """Oyente de precios: añade el lote al historial y lo vuelca cada tanto."""
+    _obtener_historial().agregar_precios(precios)
+    if time.time() - _historial_guardado > HISTORIAL_GUARDAR_CADA:
+        _guardar_historial()
+
+
+# ── Slate versionado (/api/slate) ────────────────────────────────────────────
+
+def _tarjeta(registro: dict) -> dict:
+    """Registro de main() → tarjeta del slate, con id estable por partido."""
+    return {"id": f"{registro['fecha']}|{registro['liga']}|{registro['partido']}", **registro}
+
+
+def _actualizar_slate(precios: dict) -> None:
+    """Oyente de precios: repricea las tarjetas en una transacción; sólo cambian las afectadas."""
+    ESTADO.parchear_slate(lambda tarjeta: _nba_ai.repreciar_registro(tarjeta, precios))
+
+
+def _latir(fin: threading.Event):
+    """Renueva el lock de /run mientras el análisis siga vivo en este worker."""
+    while not fin.wait(RUN_LATIDO):
+        try:
+            ESTADO.latido()
+        except Exception:
+            pass   # el siguiente latido lo reintenta; sin latidos caduca en RUN_TIMEOUT
+
+
+def _run_analysis(perfilar: bool = False):
     old_out = sys.stdout
     sys.stdout = _Capture(old_out)
+    fin = threading.Event()
+    threading.Thread(target=_latir, args=(fin,), daemon=True).start()
     try:
-        nba_ai.main()
-        with _lock:
-            _state["completed"] = True
+        if perfilar:
+            import perfilado
+            with perfilado.Perfilador() as perfil:
+                registros = _modulo_analisis().main()
+            # El perfil es un extra: si no se puede escribir, el análisis sigue siendo válido
+            try:
+                nombre = perfil.guardar(perfilado.DIRECTORIO)
+                perfil.imprimir()
+                print(f"     → /api/perfiles/{nombre}.folded  ·  /api/perfiles/{nombre}.json")
+            except Exception as exc:
+                print(f"  ⚠️  Perfil no guardado: {exc}")
+        else:
+            registros = _modulo_analisis().main()
+        if registros:
+            ESTADO.publicar_slate([_tarjeta(r) for r in registros], completo=True)
+        _sincronizar_contexto_alertas(_motor)
+        ESTADO.finalizar(completed=True)
     except Exception as exc:
-        with _lock:
-            _state["error"] = str(exc)
-            _state["output"].append(f"❌ ERROR: {exc}")
+        ESTADO.agregar_linea(f"❌ ERROR: {exc}")
+        ESTADO.finalizar(completed=False, error=str(exc))
     finally:
+        fin.set()
         sys.stdout = old_out
-        with _lock:
-            _state["running"] = False
 
 
 # ── Rutas ─────────────────────────────────────────────────────────────────────
@@ -76,39 +270,32 @@ def index():
 
 @app.route("/run", methods=["POST"])
 def run():
-    with _lock:
-        if _state["running"]:
-            return jsonify({"error": "Ya hay un análisis en curso"}), 409
-        _state["running"]   = True
-        _state["completed"] = False
-        _state["output"]    = []
-        _state["error"]     = None
+    """?profile=1 muestrea todos los hilos del análisis (ver /api/perfiles)."""
+    if not ESTADO.iniciar():
+        return jsonify({"error": "Ya hay un análisis en curso"}), 409
 
-    threading.Thread(target=_run_analysis, daemon=True).start()
-    return jsonify({"status": "started"})
+    perfilar = request.args.get("profile", "") not in ("", "0", "false")
+    threading.Thread(target=_run_analysis, args=(perfilar,), daemon=True).start()
+    return jsonify({"status": "started", "profile": perfilar})
 
 
 @app.route("/stream")
 def stream():
     """Server-Sent Events: envía cada línea nueva al cliente en tiempo real."""
     def generate():
-        sent = 0
+        sent, visto = 0, None
         while True:
-            with _lock:
-                new_lines = _state["output"][sent:]
-                running   = _state["running"]
-                completed = _state["completed"]
+            visto  = _VERSION_RUN.esperar(visto)   # despierta sólo si hay algo nuevo
+            estado = ESTADO.resumen()
 
-            for line in new_lines:
+            for line in ESTADO.lineas(sent):
                 yield f"data: {json.dumps({'line': line})}\n\n"
                 sent += 1
 
-            if not running:
-                yield f"data: {json.dumps({'done': True, 'completed': completed})}\n\n"
+            if not estado["running"]:
+                yield f"data: {json.dumps({'done': True, 'completed': estado['completed']})}\n\n"
                 return
 
-            time.sleep(0.15)
-
     return Response(
         generate(),
         mimetype="text/event-stream",
@@ -116,24 +303,236 @@ def stream():
     )
 
 
+RESULTADOS_PATH = os.path.join(os.path.dirname(__file__), "resultados.json")
+
+
 @app.route("/resultados")
 def resultados():
-    path = os.path.join(os.path.dirname(__file__), "resultados.json")
+    path = RESULTADOS_PATH
     if not os.path.exists(path):
         return jsonify({"error": "Sin resultados. Ejecuta el análisis primero."}), 404
     with open(path, encoding="utf-8") as f:
-        return jsonify(json.load(f))
+        resp = jsonify(json.load(f))
+    # La calculadora la vuelve a pedir tras cada análisis: 304 si no cambió
+    resp.set_etag(_version_resultados() or "")
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
+
+
+def _version_resultados() -> str | None:
+    """Identifica la versión de resultados.json (cambia con cada análisis)."""
+    try:
+        st = os.stat(RESULTADOS_PATH)
+    except FileNotFoundError:
+        return None
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+# Caché de respuestas de /api/portfolio ya serializadas, acotada en bytes y no
+# en entradas: una con 100k escenarios pesa varios MB, una con uno, unos cientos
+PORTAFOLIO_CACHE_MB = float(os.environ.get("PORTAFOLIO_CACHE_MB", "32"))
+_portafolio_cache: OrderedDict[tuple, bytes] = OrderedDict()
+_portafolio_bytes = 0
+_portafolio_lock  = threading.Lock()
+
+
+def _portafolio_json(version: str, params: tuple, escenario: int | None) -> bytes:
+    global _portafolio_bytes
+    clave = (version, params, escenario)
+    with _portafolio_lock:
+        cuerpo = _portafolio_cache.get(clave)
+        if cuerpo is not None:
+            _portafolio_cache.move_to_end(clave)
+            return cuerpo
+
+    import portafolio   # NumPy se importa aquí, no al arrancar
+    with open(RESULTADOS_PATH, encoding="utf-8") as f:
+        candidatos = json.load(f).get("candidatos", [])
+    resultado = portafolio.calcular(candidatos, params, escenario)
+    cuerpo = json.dumps({"version": version, **resultado},
+                        ensure_ascii=False, separators=(",", ":")).encode()
+
+    limite = PORTAFOLIO_CACHE_MB * 1024 * 1024
+    with _portafolio_lock:
+        if clave not in _portafolio_cache and len(cuerpo) <= limite:
+            _portafolio_cache[clave] = cuerpo
+            _portafolio_bytes += len(cuerpo)
+            while _portafolio_bytes > limite:
+                _, viejo = _portafolio_cache.popitem(last=False)
+                _portafolio_bytes -= len(viejo)
+    return cuerpo
+
+
+@app.route("/api/portfolio", methods=["GET", "POST"])
+def api_portfolio():
+    """
+    Reparto Kelly fraccional del bankroll entre los candidatos de resultados.json.
+    Cada parámetro acepta un valor, una lista ('a,b') o un rango ('inicio:fin:pasos');
+    se evalúa el producto cartesiano de todos en una sola pasada vectorizada.
+    Devuelve agregados por apuesta, el resumen por escenario y los montos de
+    los mejores escenarios; escenario=<índice> añade los montos de ése.
+    Cacheado por (versión de resultados, parámetros, escenario).
+    """
+    import portafolio
+    version = _version_resultados()
+    if version is None:
+        return jsonify({"error": "Sin resultados. Ejecuta el análisis primero."}), 404
+
+    raw = request.get_json(silent=True) if request.method == "POST" else None
+    if raw is None:
+        raw = {k: ",".join(request.args.getlist(k)) for k in request.args}
+    if not isinstance(raw, dict):
+        return jsonify({"error": "Se esperaba un objeto JSON"}), 400
+    raw = dict(raw)
+    try:
+        escenario = raw.pop("escenario", None)
+        escenario = None if escenario in (None, "") else int(escenario)
+        params = portafolio.normalizar_params(raw)
+        cuerpo = _portafolio_json(version, params, escenario)
+    except (ValueError, TypeError) as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    resp = Response(cuerpo, mimetype="application/json")
+    # hashlib y no hash(): el ETag debe coincidir entre workers de gunicorn
+    firma = hashlib.sha1(repr((params, escenario)).encode()).hexdigest()[:12]
+    resp.set_etag(f"{version}-{firma}")
+    resp.headers["Cache-Control"] = "private, max-age=0, must-revalidate"
+    return resp.make_conditional(request)
+
+
+@app.route("/api/slate")
+def api_slate():
+    """Estado estructurado de cada partido + cursor de versión para /api/slate/changes."""
+    version, partidos, _ = ESTADO.slate()
+    return jsonify({"version": version, "partidos": partidos})
+
+
+def _cambios_slate(desde: int) -> dict:
+    version, cambiados, borrados = ESTADO.slate(desde)
+    if desde > version:                  # cursor de otro estado (p. ej. reinicio en memoria)
+        return {"version": version, "reset": True, "partidos": ESTADO.slate()[1]}
+    return {"version": version, "partidos": cambiados, "borrados": borrados}
+
+
+@app.route("/api/slate/changes")
+def api_slate_changes():
+    """
+    Sólo las tarjetas con versión > since (NEA o precio distintos) y los ids
+    de los partidos que salieron del slate. "reset": el cliente debe redibujar.
+    """
+    return jsonify(_cambios_slate(request.args.get("since", 0, type=int)))
+
+
+@app.route("/api/slate/stream")
+def api_slate_stream():
+    """SSE con el mismo delta que /api/slate/changes cada vez que sube la versión."""
+    desde = request.args.get("since", 0, type=int)
+
+    def generate():
+        ultimo, visto = desde, None
+        while True:
+            visto = _VERSION_SLATE.esperar(visto)
+            if visto != ultimo:
+                delta = _cambios_slate(ultimo)
+                ultimo = delta["version"]
+                yield f"data: {json.dumps(delta, ensure_ascii=False)}\n\n"
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/refresh", methods=["POST"])
+def refresh():
+    """Refresca los precios del último slate y evalúa las reglas de alerta."""
+    return jsonify({"precios": refrescar_precios()})
+
+
+@app.route("/alertas")
+def alertas_lista():
+    return jsonify(ESTADO.alertas(request.args.get("desde", 0, type=int)))
+
+
+@app.route("/alertas/stream")
+def alertas_stream():
+    """SSE con cada alerta nueva (canal abierto hasta que el cliente cierra)."""
+    desde = request.args.get("desde", 0, type=int)
+
+    def generate():
+        ultimo, visto = desde, None
+        while True:
+            visto = _VERSION_ALERTA.esperar(visto)
+            for alerta in ESTADO.alertas(ultimo):
+                ultimo = alerta["id"]
+                yield f"data: {json.dumps(alerta, ensure_ascii=False)}\n\n"
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/history/<token_id>")
+def api_history(token_id):
+    """
+    Serie de precios del token. ?paso=<s> agrega en velas OHLC; ?desde / ?hasta
+    (epoch s) recortan el rango.
+    """
+    hist = _obtener_historial()
+    # Otro worker volcó desde nuestra última lectura: fusionar sus puntos
+    if os.path.exists(HISTORIAL_PATH) and os.path.getmtime(HISTORIAL_PATH) != hist.cargado_mtime:
+        hist.cargar(HISTORIAL_PATH)
+
+    serie = hist.consulta(
+        token_id,
+        desde=request.args.get("desde", type=int),
+        hasta=request.args.get("hasta", type=int),
+        paso=request.args.get("paso", type=int),
+    )
+    if serie is None:
+        return jsonify({"error": f"Sin historial para el token {token_id}"}), 404
+    return jsonify(serie)
+
+
+# ── Perfiles (POST /run?profile=1) ───────────────────────────────────────────
+
+def _directorio_perfiles() -> str:
+    import perfilado
+    return perfilado.DIRECTORIO
+
+
+@app.route("/api/perfiles")
+def api_perfiles():
+    """Perfiles guardados, del más reciente al más antiguo."""
+    directorio = _directorio_perfiles()
+    try:
+        nombres = os.listdir(directorio)
+    except FileNotFoundError:
+        nombres = []
+    bases = sorted({n.rsplit(".", 1)[0] for n in nombres if n.endswith((".folded", ".json"))},
+                   reverse=True)
+    return jsonify([{"nombre": b, "folded": f"/api/perfiles/{b}.folded",
+                     "resumen": f"/api/perfiles/{b}.json"} for b in bases])
+
+
+@app.route("/api/perfiles/<path:archivo>")
+def api_perfil(archivo):
+    """Descarga un artefacto: .folded para flamegraph.pl / speedscope, .json con el resumen."""
+    if not archivo.endswith((".folded", ".json")):
+        return jsonify({"error": "Artefacto desconocido"}), 404
+    return send_from_directory(_directorio_perfiles(), archivo,
+                               as_attachment=archivo.endswith(".folded"))
 
 
 @app.route("/status")
 def status():
-    with _lock:
-        return jsonify({
-            "running":   _state["running"],
-            "completed": _state["completed"],
-            "lines":     len(_state["output"]),
-            "error":     _state["error"],
-        })
+    # vuelos: llamadas a Gamma/CLOB/Gemini pedidas vs. reales en este worker
+    # gemini: cliente compartido del worker (sin forzar la carga del módulo)
+    return jsonify({**ESTADO.resumen(), "vuelos": coalescencia.estadisticas(),
+                    "gemini": _nba_ai.estado_backend() if _nba_ai is not None else None})
 
 
 # ── Entry point ───────────────────────────────────────────────────────────────
@@ -0,0 +1,109 @@
+"""
+Benchmark del cliente Gemini compartido contra un endpoint falso local.
+
+Levanta un servidor HTTP/1.1 que imita la API de Gemini (GET de metadatos del
+modelo para el health check, POST con el stream SSE de generateContent) y
+mide _llamar_gemini_una_vez con un BackendGenai nuevo por llamada frente al
+cliente compartido de obtener_backend(). Cuenta las conexiones TCP que abre
+cada variante: con el pool keep-alive compartido no debería abrir ninguna
+nueva tras la llamada de calentamiento.
+
+    python bench_gemini.py [--llamadas 60]
+
+No usa la API real ni gasta tokens: GEMINI_BASE_URL apunta al servidor local.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import importlib.util
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+RESPUESTA = json.dumps({
+    "p_vegas": 55, "n_local": 1, "n_visitante": 2, "estrellas_bajas_local": 0,
+    "estrellas_bajas_visitante": 1, "total_vegas": 220.5, "resumen": "ok",
+})
+TROZO = 40   # caracteres de texto por evento SSE
+
+
+class _GeminiFalso(BaseHTTPRequestHandler):
+    protocol_version        = "HTTP/1.1"   # keep-alive
+    disable_nagle_algorithm = True         # sin los 40 ms de Nagle + ACK diferido
+    conexiones = 0
+
+    def setup(self):
+        type(self).conexiones += 1
+        super().setup()
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, cuerpo: bytes, tipo: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        self._responder(json.dumps({"name": "models/falso"}).encode(), "application/json")
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        cuerpo = b"".join(
+            b"data: " + json.dumps({"candidates": [{"content": {
+                "parts": [{"text": RESPUESTA[i:i + TROZO]}], "role": "model"}}]}).encode()
+            + b"\r\n\r\n"
+            for i in range(0, len(RESPUESTA), TROZO)
+        )
+        self._responder(cuerpo, "text/event-stream")
+
+
+def _cargar_nba_ai(base_url: str):
+    os.environ["GEMINI_BASE_URL"] = base_url
+    os.environ.setdefault("GEMINI_API_KEY", "clave-falsa")
+    os.environ["GEMINI_BACKEND"] = "genai"
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, raiz)
+    spec = importlib.util.spec_from_file_location("nba_ai", os.path.join(raiz, "NBA-AI.py"))
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--llamadas", type=int, default=60, help="llamadas por variante")
+    args = parser.parse_args(argv)
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _GeminiFalso)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    nba  = _cargar_nba_ai(f"http://127.0.0.1:{servidor.server_port}")
+    liga = nba.ligas.LIGAS["NBA"]
+    clave = os.environ["GEMINI_API_KEY"]
+
+    def ronda(compartido: bool) -> tuple[float, int]:
+        _GeminiFalso.conexiones = 0
+        t0 = time.perf_counter()
+        for i in range(args.llamadas):
+            backend = nba.obtener_backend() if compartido else nba.BackendGenai(clave)
+            r = nba._llamar_gemini_una_vez(backend, f"Local {i}", f"Visitante {i}", liga)
+            if not r or r["p_vegas"] != 55:
+                raise SystemExit(f"respuesta inesperada: {r!r}")
+        return (time.perf_counter() - t0) / args.llamadas * 1000, _GeminiFalso.conexiones
+
+    ronda(True)                                  # calentar imports y el cliente compartido
+    nuevo, compartido = ronda(False), ronda(True)
+    print(f"  cliente nuevo por llamada: {nuevo[0]:6.2f} ms/llamada, {nuevo[1]} conexiones")
+    print(f"  cliente compartido       : {compartido[0]:6.2f} ms/llamada, "
+          f"{compartido[1]} conexiones")
+    print(f"  {nba.estado_backend()}")
+    servidor.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
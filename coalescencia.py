@@ -0,0 +1,132 @@
+"""
+Single-flight + micro-caché para llamadas idénticas a servicios externos.
+
+Si varias peticiones piden la misma clave a la vez, sólo la primera llega al
+servicio (Gamma, CLOB, Gemini); el resto espera ese mismo resultado (o la
+misma excepción). Con ttl > 0 el resultado se sirve además desde una caché
+corta durante `ttl` segundos. Los errores nunca se cachean.
+
+Cada VueloUnico lleva contadores: llamadas pedidas, llamadas reales al
+servicio, compartidas en vuelo y aciertos de caché. estadisticas() los
+reúne para /status.
+"""
+
+import time
+import threading
+
+MAX_CACHE = 4096   # entradas antes de purgar las caducadas
+
+
+class _Vuelo:
+    __slots__ = ("evento", "valor", "error")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.valor  = None
+        self.error: BaseException | None = None
+
+
+class VueloUnico:
+
+    def __init__(self, nombre: str, ttl: float = 0.0, cachear_none: bool = False):
+        self.nombre       = nombre
+        self.ttl          = ttl
+        self.cachear_none = cachear_none
+        self._lock   = threading.Lock()
+        self._vuelos: dict = {}
+        self._cache:  dict = {}   # clave → (expira, valor)
+        self.llamadas    = 0
+        self.upstream    = 0
+        self.compartidas = 0
+        self.cache       = 0
+
+    def hacer(self, clave, fn):
+        """Resultado de fn() para `clave`, compartido con peticiones concurrentes."""
+        with self._lock:
+            self.llamadas += 1
+            entrada = self._cache.get(clave)
+            if entrada is not None and entrada[0] > time.monotonic():
+                self.cache += 1
+                return entrada[1]
+            vuelo = self._vuelos.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._vuelos[clave] = _Vuelo()
+                self.upstream += 1
+            else:
+                self.compartidas += 1
+
+        if not lider:
+            vuelo.evento.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            return vuelo.valor
+
+        try:
+            vuelo.valor = fn()
+            return vuelo.valor
+        except BaseException as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._vuelos[clave]
+                if (vuelo.error is None and self.ttl > 0
+                        and (vuelo.valor is not None or self.cachear_none)):
+                    ahora = time.monotonic()
+                    if len(self._cache) >= MAX_CACHE:
+                        self._cache = {k: v for k, v in self._cache.items() if v[0] > ahora}
+                    self._cache[clave] = (ahora + self.ttl, vuelo.valor)
+            vuelo.evento.set()
+
+    def olvidar(self, clave=None) -> None:
+        """Borra la micro-caché (una clave o toda)."""
+        with self._lock:
+            if clave is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(clave, None)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "llamadas":    self.llamadas,
+                "upstream":    self.upstream,
+                "compartidas": self.compartidas,
+                "cache":       self.cache,
+                "ahorradas":   self.llamadas - self.upstream,
+            }
+
+
+_REGISTRO: dict[str, VueloUnico] = {}
+_REGISTRO_LOCK = threading.Lock()
+
+
+def vuelo(nombre: str, ttl: float = 0.0, cachear_none: bool = False) -> VueloUnico:
+    """VueloUnico con nombre, compartido por todo el proceso."""
+    with _REGISTRO_LOCK:
+        v = _REGISTRO.get(nombre)
+        if v is None:
+            v = _REGISTRO[nombre] = VueloUnico(nombre, ttl, cachear_none)
+        return v
+
+
+def estadisticas() -> dict[str, dict]:
+    with _REGISTRO_LOCK:
+        vuelos = list(_REGISTRO.values())
+    return {v.nombre: v.estadisticas() for v in vuelos}
+
+
+def resumen(base: dict[str, dict] | None = None) -> str:
+    """
+    'gamma_eventos 3→1, clob_midpoint 120→80, ...' (llamadas pedidas → reales),
+    descontando una foto anterior de estadisticas() si se pasa en `base`.
+    """
+    partes = []
+    for n, e in estadisticas().items():
+        b = (base or {}).get(n, {})
+        pedidas = e["llamadas"] - b.get("llamadas", 0)
+        reales  = e["upstream"] - b.get("upstream", 0)
+        if pedidas:
+            partes.append(f"{n} {pedidas}→{reales}")
+    return ", ".join(partes)
@@ -0,0 +1,30 @@
+"""
+Carga .env (KEY=valor por línea) en os.environ sin pisar lo ya definido.
+
+Varios módulos leen su configuración al importarse (estado, ligas, historial,
+las alertas de app.py): este módulo se importa antes que todos ellos, tanto
+desde app.py como desde NBA-AI.py. Si no, lo puesto en .env sólo valdría a
+partir del primer /run, cuando app.py carga NBA-AI.
+"""
+
+import os
+
+RUTA = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+
+
+def cargar_env(ruta: str = RUTA) -> None:
+    if not os.path.exists(ruta):
+        return
+    with open(ruta) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            key, _, value = line.partition("=")
+            key   = key.strip()
+            value = value.strip().strip('"').strip("'")
+            if key and key not in os.environ:
+                os.environ[key] = value
+
+
+cargar_env()
@@ -0,0 +1,155 @@
+"""
+Índice de alias de equipos: nombre cualquiera → nombre canónico en O(1).
+
+Polymarket, el título del evento y las casas de apuestas no siempre escriben
+igual al mismo equipo ("LA Clippers", "Clippers", "Los Angeles Clippers",
+"LAC"). Cada liga precalcula un dict clave_normalizada → canónico con ciudad,
+apodo, abreviatura y variantes conocidas; la ciudad sólo entra si no es
+ambigua dentro de la liga (Los Angeles, New York, ...).
+"""
+
+import re
+import unicodedata
+
+
+def clave(nombre: str) -> str:
+    """'L.A. Clippers' → 'la clippers'; 'T-Wolves' → 't wolves'."""
+    s = unicodedata.normalize("NFKD", nombre).encode("ascii", "ignore").decode().lower()
+    s = re.sub(r"[.'’]", "", s)
+    return re.sub(r"[^a-z0-9]+", " ", s).strip()
+
+
+class IndiceEquipos:
+
+    def __init__(self, tabla: str):
+        """
+        tabla: una línea por equipo "ABR | Ciudad | Apodo | alias1, alias2".
+        El canónico es "Ciudad Apodo".
+        """
+        filas = []
+        for linea in tabla.strip().splitlines():
+            abr, ciudad, apodo, *extra = [c.strip() for c in linea.split("|")]
+            alias = [a.strip() for a in extra[0].split(",") if a.strip()] if extra else []
+            filas.append((abr, ciudad, apodo, alias))
+
+        ciudades: dict[str, int] = {}
+        for _, ciudad, _, _ in filas:
+            ciudades[clave(ciudad)] = ciudades.get(clave(ciudad), 0) + 1
+
+        self._alias: dict[str, str] = {}
+        for abr, ciudad, apodo, alias in filas:
+            canonico = f"{ciudad} {apodo}"
+            nombres  = [canonico, apodo, abr, *alias]
+            if ciudades[clave(ciudad)] == 1:
+                nombres.append(ciudad)
+            for n in nombres:
+                self._alias[clave(n)] = canonico
+        self.canonicos = sorted(set(self._alias.values()))
+
+    def __len__(self):
+        return len(self.canonicos)
+
+    def canonico(self, nombre: str) -> str | None:
+        k = clave(nombre)
+        c = self._alias.get(k)
+        if c is None and " " in k:
+            c = self._alias.get(k.rsplit(" ", 1)[1])   # "Los Angeles C Clippers" → "clippers"
+        return c
+
+
+NBA = IndiceEquipos("""
+ATL | Atlanta       | Hawks         |
+BOS | Boston        | Celtics       |
+BKN | Brooklyn      | Nets          | BRK
+CHA | Charlotte     | Hornets       | CHO
+CHI | Chicago       | Bulls         |
+CLE | Cleveland     | Cavaliers     | Cavs
+DAL | Dallas        | Mavericks     | Mavs
+DEN | Denver        | Nuggets       |
+DET | Detroit       | Pistons       |
+GSW | Golden State  | Warriors      | GS, GS Warriors
+HOU | Houston       | Rockets       |
+IND | Indiana       | Pacers        |
+LAC | Los Angeles   | Clippers      | LA Clippers
+LAL | Los Angeles   | Lakers        | LA Lakers
+MEM | Memphis       | Grizzlies     | Grizz
+MIA | Miami         | Heat          |
+MIL | Milwaukee     | Bucks         |
+MIN | Minnesota     | Timberwolves  | Wolves, T-Wolves
+NOP | New Orleans   | Pelicans      | Pels
+NYK | New York      | Knicks        | NY, NY Knicks
+OKC | Oklahoma City | Thunder       | OKC Thunder
+ORL | Orlando       | Magic         |
+PHI | Philadelphia  | 76ers         | Sixers, Philly
+PHX | Phoenix       | Suns          | PHO
+POR | Portland      | Trail Blazers | Blazers
+SAC | Sacramento    | Kings         |
+SAS | San Antonio   | Spurs         | SA
+TOR | Toronto       | Raptors       |
+UTA | Utah          | Jazz          | UTAH
+WAS | Washington    | Wizards       | WSH
+""")
+
+WNBA = IndiceEquipos("""
+ATL | Atlanta       | Dream         |
+CHI | Chicago       | Sky           |
+CON | Connecticut   | Sun           | CONN
+DAL | Dallas        | Wings         |
+GSV | Golden State  | Valkyries     | GS Valkyries
+IND | Indiana       | Fever         |
+LVA | Las Vegas     | Aces          | LV, LV Aces
+LAS | Los Angeles   | Sparks        | LA, LA Sparks
+MIN | Minnesota     | Lynx          |
+NYL | New York      | Liberty       | NY, NY Liberty
+PHO | Phoenix       | Mercury       | PHX
+POR | Portland      | Fire          |
+SEA | Seattle       | Storm         |
+TOR | Toronto       | Tempo         |
+WAS | Washington    | Mystics       | WSH
+""")
+
+NFL = IndiceEquipos("""
+ARI | Arizona       | Cardinals     |
+ATL | Atlanta       | Falcons       |
+BAL | Baltimore     | Ravens        |
+BUF | Buffalo       | Bills         |
+CAR | Carolina      | Panthers      |
+CHI | Chicago       | Bears         |
+CIN | Cincinnati    | Bengals       |
+CLE | Cleveland     | Browns        |
+DAL | Dallas        | Cowboys       |
+DEN | Denver        | Broncos       |
+DET | Detroit       | Lions         |
+GB  | Green Bay     | Packers       | GNB
+HOU | Houston       | Texans        |
+IND | Indianapolis  | Colts         |
+JAX | Jacksonville  | Jaguars       | JAC, Jags
+KC  | Kansas City   | Chiefs        | KAN
+LV  | Las Vegas     | Raiders       | LVR
+LAC | Los Angeles   | Chargers      | LA Chargers
+LAR | Los Angeles   | Rams          | LA Rams
+MIA | Miami         | Dolphins      |
+MIN | Minnesota     | Vikings       |
+NE  | New England   | Patriots      | NWE, Pats
+NO  | New Orleans   | Saints        | NOR
+NYG | New York      | Giants        | NY Giants
+NYJ | New York      | Jets          | NY Jets
+PHI | Philadelphia  | Eagles        |
+PIT | Pittsburgh    | Steelers      |
+SF  | San Francisco | 49ers         | SFO, Niners
+SEA | Seattle       | Seahawks      |
+TB  | Tampa Bay     | Buccaneers    | TAM, Bucs
+TEN | Tennessee     | Titans        |
+WAS | Washington    | Commanders    | WSH
+""")
+
+# NCAA: sin índice completo (~360 equipos); sólo abreviaturas habituales que
+# Polymarket y las casas alternan con el nombre largo. Claves ya normalizadas.
+NCAAB_ALIAS = {
+    "uconn": "connecticut", "unc": "north carolina", "ole miss": "mississippi",
+    "pitt": "pittsburgh", "usc": "southern california", "lsu": "louisiana state",
+    "byu": "brigham young", "smu": "southern methodist", "tcu": "texas christian",
+    "ucf": "central florida", "vcu": "virginia commonwealth", "unlv": "nevada las vegas",
+    "umass": "massachusetts", "utep": "texas el paso", "uab": "alabama birmingham",
+    "st johns": "saint johns", "st marys": "saint marys", "st josephs": "saint josephs",
+}
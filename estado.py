@@ -0,0 +1,509 @@
+"""
+Estado compartido de la ejecución del análisis (running / output / error), alertas
+y slate de partidos versionado.
+
+- EstadoMemoria: dict + lock en el propio proceso (servidor de desarrollo)
+- EstadoSQLite : SQLite en modo WAL, compartido por todos los workers de
+                 gunicorn → cualquier worker puede servir /stream, /status
+                 y /resultados de una ejecución lanzada en otro
+
+STATE_BACKEND=memory|sqlite elige la implementación (STATE_DB = ruta del .db).
+EstadoSQLite presta conexiones de un pool por operación y, con gevent, hace
+cada consulta en el threadpool del hub para no bloquear el bucle de eventos.
+
+Slate: una tarjeta por partido con un contador de versión global. Publicar una
+tarjeta idéntica no cambia nada; una distinta recibe la versión siguiente y un
+partido que desaparece del slate queda como lápida (datos None) para que los
+clientes con un cursor anterior lo borren.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "memory").lower()
+STATE_DB      = os.environ.get(
+    "STATE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "estado.db")
+)
+RUN_LATIDO    = 10         # segundos entre latidos de la ejecución en curso
+RUN_TIMEOUT   = 60         # segundos sin latido: la ejecución "running" se da por muerta
+MAX_ALERTAS   = 1000       # alertas retenidas para /alertas
+POOL_SQLITE   = int(os.environ.get("STATE_POOL", "8"))   # conexiones ociosas retenidas
+ULTIMOS_TTL   = 86400      # segundos: últimos valores / disparos de alertas retenidos
+
+
+class EstadoMemoria:
+    """Estado en memoria del proceso. Sólo válido con un único proceso."""
+
+    def __init__(self):
+        self._lock  = threading.Lock()
+        self._state = {"running": False, "completed": False, "output": [],
+                       "error": None, "version": 0}
+        self._alertas: list[dict] = []
+        self._alerta_id = 0
+        self._ultimos: dict[str, tuple[float, float]] = {}   # clave → (ts, valor)
+        self._disparos: dict[str, float] = {}                # regla|clave → ts
+        self._slate: dict[str, tuple[int, str | None]] = {}   # id → (versión, json | None)
+        self._slate_version = 0
+
+    def iniciar(self) -> bool:
+        """Marca una ejecución como iniciada. False si ya hay otra en curso."""
+        with self._lock:
+            if self._state["running"]:
+                return False
+            self._state.update(running=True, completed=False, output=[], error=None,
+                               version=self._state["version"] + 1)
+            return True
+
+    def latido(self) -> None:
+        """La ejecución en curso sigue viva (en memoria muere con el proceso)."""
+
+    def agregar_linea(self, texto: str) -> None:
+        with self._lock:
+            self._state["output"].append(texto)
+            self._state["version"] += 1
+
+    def finalizar(self, completed: bool, error: str | None = None) -> None:
+        with self._lock:
+            self._state["running"]   = False
+            self._state["completed"] = completed
+            if error is not None:
+                self._state["error"] = error
+            self._state["version"] += 1
+
+    def version(self) -> int:
+        with self._lock:
+            return self._state["version"]
+
+    def lineas(self, desde: int = 0) -> list[str]:
+        with self._lock:
+            return self._state["output"][desde:]
+
+    def agregar_alerta(self, alerta: dict) -> None:
+        with self._lock:
+            self._alerta_id += 1
+            self._alertas.append({**alerta, "id": self._alerta_id})
+            del self._alertas[:-MAX_ALERTAS]
+
+    def alertas(self, desde: int = 0) -> list[dict]:
+        """Alertas con id > desde."""
+        with self._lock:
+            return [a for a in self._alertas if a["id"] > desde]
+
+    def ultima_alerta(self) -> int:
+        with self._lock:
+            return self._alerta_id
+
+    def intercambiar_ultimos(self, valores: dict[str, float],
+                             ts: float) -> dict[str, tuple[float, float]]:
+        """Memoria del motor de alertas: guarda valores, devuelve los (ts, valor) previos."""
+        with self._lock:
+            previos = {k: self._ultimos[k] for k in valores if k in self._ultimos}
+            for k, v in valores.items():
+                self._ultimos[k] = (ts, v)
+            return previos
+
+    def reclamar_alerta(self, clave: str, ts: float, debounce: float) -> bool:
+        """True (y marca el disparo) si `clave` no disparó en los últimos `debounce` s."""
+        with self._lock:
+            ultima = self._disparos.get(clave)
+            if ultima is not None and ts - ultima < debounce:
+                return False
+            self._disparos[clave] = ts
+            return True
+
+    def publicar_slate(self, partidos: list[dict], completo: bool = False) -> int:
+        """
+        Tarjetas {"id", ...}; sólo las que cambian reciben versión nueva. Con
+        completo=True los partidos ausentes pasan a lápida. Devuelve la versión.
+        """
+        with self._lock:
+            ids = set()
+            for p in partidos:
+                ids.add(p["id"])
+                datos = _serializar(p)
+                if self._slate.get(p["id"], (0, None))[1] != datos:
+                    self._slate_version += 1
+                    self._slate[p["id"]] = (self._slate_version, datos)
+            if completo:
+                for id_, (_, datos) in list(self._slate.items()):
+                    if id_ not in ids and datos is not None:
+                        self._slate_version += 1
+                        self._slate[id_] = (self._slate_version, None)
+            return self._slate_version
+
+    def parchear_slate(self, parche) -> int:
+        """
+        Aplica parche(tarjeta) → tarjeta | None a las tarjetas vivas en una sola
+        sección crítica: un publicar_slate(completo=True) concurrente no puede
+        resucitar lápidas ni pisarse con otro parche. Devuelve la versión.
+        """
+        with self._lock:
+            for id_, (_, datos) in list(self._slate.items()):
+                if datos is None:
+                    continue
+                nueva = parche(json.loads(datos))
+                if nueva is None:
+                    continue
+                nuevos = _serializar(nueva)
+                if nuevos != datos:
+                    self._slate_version += 1
+                    self._slate[id_] = (self._slate_version, nuevos)
+            return self._slate_version
+
+    def slate_version(self) -> int:
+        with self._lock:
+            return self._slate_version
+
+    def slate(self, desde: int = 0) -> tuple[int, list[dict], list[str]]:
+        """(versión, tarjetas cambiadas, ids borrados) con versión > desde."""
+        with self._lock:
+            filas = [(id_, v, d) for id_, (v, d) in self._slate.items() if v > desde]
+            return self._slate_version, *_delta(filas, desde)
+
+    def resumen(self) -> dict:
+        with self._lock:
+            return {
+                "running":   self._state["running"],
+                "completed": self._state["completed"],
+                "lines":     len(self._state["output"]),
+                "error":     self._state["error"],
+            }
+
+
+def _hub_gevent():
+    """Hub de gevent del hilo actual si el worker está parcheado, si no None."""
+    monkey = sys.modules.get("gevent.monkey")
+    if monkey is None or not monkey.is_module_patched("threading"):
+        return None
+    from gevent.hub import get_hub_if_exists
+    return get_hub_if_exists()      # None en los hilos del threadpool
+
+
+def _bloqueante(metodo):
+    """
+    Con gevent, la llamada a SQLite corre en el threadpool del hub: sqlite3 no
+    cede el control y un busy_timeout de 10 s congelaría todos los greenlets
+    del worker (cada cliente SSE, cada petición) mientras espera el lock.
+    """
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        hub = _hub_gevent()
+        if hub is None:
+            return metodo(self, *args, **kwargs)
+        return hub.threadpool.apply(metodo, (self, *args), kwargs)
+    return envoltura
+
+
+class EstadoSQLite:
+    """Estado en SQLite (WAL): lectores concurrentes + un escritor, entre procesos."""
+
+    def __init__(self, path: str):
+        self.path    = path
+        # deque y no queue.Queue: con gevent el Lock de Queue está parcheado y
+        # las operaciones corren en hilos reales del threadpool; append/pop
+        # son atómicos con el GIL
+        self._libres: deque[sqlite3.Connection] = deque()
+        with self._con() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript("""
+                CREATE TABLE IF NOT EXISTS run (
+                    id        INTEGER PRIMARY KEY CHECK (id = 1),
+                    running   INTEGER NOT NULL DEFAULT 0,
+                    completed INTEGER NOT NULL DEFAULT 0,
+                    error     TEXT,
+                    iniciado  REAL,
+                    version   INTEGER NOT NULL DEFAULT 0,
+                    latido    REAL
+                );
+                INSERT OR IGNORE INTO run (id) VALUES (1);
+                CREATE TABLE IF NOT EXISTS lineas (
+                    n     INTEGER PRIMARY KEY,
+                    texto TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS alertas (
+                    id    INTEGER PRIMARY KEY AUTOINCREMENT,
+                    datos TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS slate (
+                    id      TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    datos   TEXT
+                );
+                CREATE INDEX IF NOT EXISTS slate_version ON slate (version);
+                CREATE TABLE IF NOT EXISTS ultimos (
+                    clave TEXT PRIMARY KEY,
+                    ts    REAL NOT NULL,
+                    valor REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS disparos (
+                    clave TEXT PRIMARY KEY,
+                    ts    REAL NOT NULL
+                );
+            """)
+            # .db de antes del latido: la columna se añade una vez (varios
+            # workers pueden intentarlo a la vez; al que llega tarde le sobra)
+            if "latido" not in {c[1] for c in con.execute("PRAGMA table_info(run)")}:
+                try:
+                    con.execute("ALTER TABLE run ADD COLUMN latido REAL")
+                except sqlite3.OperationalError:
+                    pass
+
+    @contextmanager
+    def _con(self):
+        """
+        Conexión prestada del pool mientras dura una operación. Con gevent cada
+        cliente SSE es un greenlet: una conexión por threading.local quedaba
+        abierta por cada stream; prestada, un stream sólo ocupa una mientras
+        consulta y al cortarse no deja nada abierto.
+        """
+        try:
+            con = self._libres.pop()
+        except IndexError:
+            con = sqlite3.connect(self.path, timeout=10, isolation_level=None,
+                                  check_same_thread=False)
+            con.execute("PRAGMA busy_timeout=10000")
+            con.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield con
+        finally:
+            if len(self._libres) < POOL_SQLITE:
+                self._libres.append(con)
+            else:
+                con.close()
+
+    def cerrar(self) -> None:
+        """Cierra las conexiones ociosas del pool."""
+        while self._libres:
+            self._libres.pop().close()
+
+    @_bloqueante
+    def iniciar(self) -> bool:
+        with self._con() as con:
+            con.execute("BEGIN IMMEDIATE")     # check-and-set atómico entre procesos
+            try:
+                # Sin latido en RUN_TIMEOUT s el worker que la corría murió: se reemplaza
+                running, latido = con.execute(
+                    "SELECT running, COALESCE(latido, iniciado) FROM run WHERE id = 1").fetchone()
+                if running and latido and time.time() - latido < RUN_TIMEOUT:
+                    con.execute("ROLLBACK")
+                    return False
+                ahora = time.time()
+                con.execute("DELETE FROM lineas")
+                con.execute("UPDATE run SET running = 1, completed = 0, error = NULL, "
+                            "iniciado = ?, latido = ?, version = version + 1 WHERE id = 1",
+                            (ahora, ahora))
+                con.execute("COMMIT")
+                return True
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+
+    @_bloqueante
+    def latido(self) -> None:
+        """La ejecución en curso sigue viva: renueva su lock de /run."""
+        with self._con() as con:
+            con.execute("UPDATE run SET latido = ? WHERE id = 1 AND running = 1", (time.time(),))
+
+    @_bloqueante
+    def agregar_linea(self, texto: str) -> None:
+        with self._con() as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                con.execute("INSERT INTO lineas (texto) VALUES (?)", (texto,))
+                con.execute("UPDATE run SET version = version + 1 WHERE id = 1")
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+
+    @_bloqueante
+    def finalizar(self, completed: bool, error: str | None = None) -> None:
+        with self._con() as con:
+            con.execute(
+                "UPDATE run SET running = 0, completed = ?, error = COALESCE(?, error), "
+                "version = version + 1 WHERE id = 1", (int(completed), error))
+
+    @_bloqueante
+    def version(self) -> int:
+        with self._con() as con:
+            return con.execute("SELECT version FROM run WHERE id = 1").fetchone()[0]
+
+    @_bloqueante
+    def lineas(self, desde: int = 0) -> list[str]:
+        with self._con() as con:
+            rows = con.execute(
+                "SELECT texto FROM lineas ORDER BY n LIMIT -1 OFFSET ?", (desde,)).fetchall()
+        return [r[0] for r in rows]
+
+    @_bloqueante
+    def agregar_alerta(self, alerta: dict) -> None:
+        datos = json.dumps(alerta, ensure_ascii=False)
+        with self._con() as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                cur = con.execute("INSERT INTO alertas (datos) VALUES (?)", (datos,))
+                con.execute("DELETE FROM alertas WHERE id <= ?", (cur.lastrowid - MAX_ALERTAS,))
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+
+    @_bloqueante
+    def alertas(self, desde: int = 0) -> list[dict]:
+        """Alertas con id > desde."""
+        with self._con() as con:
+            rows = con.execute(
+                "SELECT id, datos FROM alertas WHERE id > ? ORDER BY id", (desde,)).fetchall()
+        return [{**json.loads(datos), "id": id_} for id_, datos in rows]
+
+    @_bloqueante
+    def ultima_alerta(self) -> int:
+        with self._con() as con:
+            return con.execute("SELECT COALESCE(MAX(id), 0) FROM alertas").fetchone()[0]
+
+    @_bloqueante
+    def intercambiar_ultimos(self, valores: dict[str, float],
+                             ts: float) -> dict[str, tuple[float, float]]:
+        """
+        Memoria del motor de alertas compartida entre workers: guarda los
+        valores y devuelve los (ts, valor) previos en la misma transacción, así
+        sólo el primer worker que ve un cambio ve también el cruce.
+        """
+        with self._con() as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                previos = {}
+                for clave in valores:
+                    fila = con.execute("SELECT ts, valor FROM ultimos WHERE clave = ?",
+                                       (clave,)).fetchone()
+                    if fila is not None:
+                        previos[clave] = fila
+                con.executemany("INSERT OR REPLACE INTO ultimos (clave, ts, valor) "
+                                "VALUES (?, ?, ?)", [(k, ts, v) for k, v in valores.items()])
+                con.execute("DELETE FROM ultimos WHERE ts < ?", (ts - ULTIMOS_TTL,))
+                con.execute("COMMIT")
+                return previos
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+
+    @_bloqueante
+    def reclamar_alerta(self, clave: str, ts: float, debounce: float) -> bool:
+        """True (y marca el disparo) si `clave` no disparó en los últimos `debounce` s."""
+        with self._con() as con:
+            # Un único UPSERT: atómico sin BEGIN; rowcount 0 = otro worker ya disparó
+            cur = con.execute(
+                "INSERT INTO disparos (clave, ts) VALUES (?, ?) "
+                "ON CONFLICT (clave) DO UPDATE SET ts = excluded.ts "
+                "WHERE excluded.ts - disparos.ts >= ?", (clave, ts, debounce))
+            if cur.rowcount:
+                con.execute("DELETE FROM disparos WHERE ts < ?", (ts - ULTIMOS_TTL,))
+            return cur.rowcount > 0
+
+    @_bloqueante
+    def publicar_slate(self, partidos: list[dict], completo: bool = False) -> int:
+        with self._con() as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                version = con.execute("SELECT COALESCE(MAX(version), 0) FROM slate").fetchone()[0]
+                actuales = dict(con.execute("SELECT id, datos FROM slate").fetchall())
+                ids = set()
+                for p in partidos:
+                    ids.add(p["id"])
+                    datos = _serializar(p)
+                    if actuales.get(p["id"]) != datos:
+                        version += 1
+                        con.execute("INSERT OR REPLACE INTO slate (id, version, datos) "
+                                    "VALUES (?, ?, ?)", (p["id"], version, datos))
+                if completo:
+                    for id_, datos in actuales.items():
+                        if id_ not in ids and datos is not None:
+                            version += 1
+                            con.execute("UPDATE slate SET version = ?, datos = NULL WHERE id = ?",
+                                        (version, id_))
+                con.execute("COMMIT")
+                return version
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+
+    @_bloqueante
+    def parchear_slate(self, parche) -> int:
+        """
+        parche(tarjeta) → tarjeta | None sobre las tarjetas vivas, leídas y
+        reescritas en la misma transacción: entre otro worker que parchea y un
+        publicar_slate(completo=True) no se pierde ni se resucita nada.
+        """
+        with self._con() as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                version = con.execute("SELECT COALESCE(MAX(version), 0) FROM slate").fetchone()[0]
+                for id_, datos in con.execute(
+                        "SELECT id, datos FROM slate WHERE datos IS NOT NULL").fetchall():
+                    nueva = parche(json.loads(datos))
+                    if nueva is None:
+                        continue
+                    nuevos = _serializar(nueva)
+                    if nuevos != datos:
+                        version += 1
+                        con.execute("UPDATE slate SET version = ?, datos = ? WHERE id = ?",
+                                    (version, nuevos, id_))
+                con.execute("COMMIT")
+                return version
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+
+    @_bloqueante
+    def slate_version(self) -> int:
+        with self._con() as con:
+            return con.execute("SELECT COALESCE(MAX(version), 0) FROM slate").fetchone()[0]
+
+    @_bloqueante
+    def slate(self, desde: int = 0) -> tuple[int, list[dict], list[str]]:
+        """(versión, tarjetas cambiadas, ids borrados) con versión > desde."""
+        with self._con() as con:
+            con.execute("BEGIN")               # versión y filas de la misma foto
+            try:
+                version = con.execute("SELECT COALESCE(MAX(version), 0) FROM slate").fetchone()[0]
+                filas = con.execute("SELECT id, version, datos FROM slate WHERE version > ?",
+                                    (desde,)).fetchall()
+            finally:
+                con.execute("COMMIT")
+        return version, *_delta(filas, desde)
+
+    @_bloqueante
+    def resumen(self) -> dict:
+        with self._con() as con:
+            running, completed, error = con.execute(
+                "SELECT running, completed, error FROM run WHERE id = 1").fetchone()
+            n = con.execute("SELECT COUNT(*) FROM lineas").fetchone()[0]
+        return {"running": bool(running), "completed": bool(completed),
+                "lines": n, "error": error}
+
+
+def _serializar(partido: dict) -> str:
+    # sort_keys: la misma tarjeta produce siempre el mismo texto (comparación barata)
+    return json.dumps(partido, ensure_ascii=False, sort_keys=True)
+
+
+def _delta(filas: list[tuple], desde: int) -> tuple[list[dict], list[str]]:
+    cambiados = [{**json.loads(d), "version": v}
+                 for _, v, d in sorted(filas, key=lambda f: f[1]) if d is not None]
+    borrados  = [id_ for id_, _, d in filas if d is None] if desde else []
+    return cambiados, borrados
+
+
+def crear_estado():
+    if STATE_BACKEND == "sqlite":
+        return EstadoSQLite(STATE_DB)
+    if STATE_BACKEND == "memory":
+        return EstadoMemoria()
+    raise ValueError(f"STATE_BACKEND desconocido: {STATE_BACKEND!r} (memory | sqlite)")
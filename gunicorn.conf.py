@@ -0,0 +1,22 @@
+"""
+Modo producción: gunicorn + gevent.
+
+Cada cliente SSE de /stream es un greenlet (no un hilo), así cientos de
+streams inactivos cuestan poco. El estado de la ejecución vive en SQLite
+(WAL) para que todos los workers vean la misma ejecución.
+
+    gunicorn -c gunicorn.conf.py app:app
+"""
+
+import os
+
+os.environ.setdefault("STATE_BACKEND", "sqlite")
+
+bind               = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers            = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class       = "gevent"
+worker_connections = 1000
+timeout            = 120
+graceful_timeout   = 30
+keepalive          = 5
+accesslog          = "-"
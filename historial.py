@@ -0,0 +1,230 @@
+"""
+Historial de precios por token en buffers circulares compactos.
+
+Cada token guarda dos arrays NumPy: precio float32 y timestamp int32 (segundos
+epoch) → 8 bytes por punto. Varios precios dentro del mismo minuto (RESOLUCION)
+se funden en el último. Los arrays crecen por duplicación hasta CAPACIDAD y a
+partir de ahí son un anillo: un token ocupa lo que realmente se refrescó, no
+la capacidad. CAPACIDAD cubre 7 días a 1 min (el mercado de un partido abre
+uno o dos días antes del salto inicial), ~80 KB como máximo por token; una
+temporada NBA de Moneylines (~2500 tokens) con 1-2 días de refrescos por
+token queda en unas decenas de MB. Para que eso valga entre temporadas, un
+token cuyo último punto es más viejo que la ventana (CAPACIDAD × RESOLUCION)
+respecto al punto más reciente conocido se descarta: al ingerir, al cargar y
+por tanto también al guardar.
+
+Se alimenta como oyente de obtener_precios_paralelo y se persiste en un .npz
+compartido por todos los workers: guardar() fusiona lo que ya hay en disco
+bajo un flock antes de escribir, así ningún worker pisa lo de otro.
+"""
+
+import os
+import time
+import fcntl
+import tempfile
+import threading
+
+import numpy as np
+
+CAPACIDAD  = int(os.environ.get("HISTORIAL_CAPACIDAD", str(7 * 24 * 60)))   # puntos por token
+RESOLUCION = 60                                                             # segundos por punto
+INICIAL    = 64                                                             # puntos reservados al crear
+
+
+class SerieAnillo:
+    """Buffer (ts int32, precio float32) que crece hasta `capacidad` y luego es circular."""
+
+    __slots__ = ("ts", "precios", "inicio", "n", "capacidad")
+
+    def __init__(self, capacidad: int):
+        self.capacidad = capacidad
+        self.ts        = np.zeros(min(INICIAL, capacidad), dtype=np.int32)
+        self.precios   = np.zeros(self.ts.size, dtype=np.float32)
+        self.inicio    = 0
+        self.n         = 0
+
+    @classmethod
+    def desde(cls, ts: np.ndarray, precios: np.ndarray, capacidad: int) -> "SerieAnillo":
+        """Serie con los últimos `capacidad` puntos de (ts, precios) ya ordenados."""
+        serie = cls(capacidad)
+        ts, precios = ts[-capacidad:], precios[-capacidad:]
+        if ts.size > serie.ts.size:
+            tam = min(capacidad, max(INICIAL, 1 << (ts.size - 1).bit_length()))
+            serie.ts, serie.precios = np.zeros(tam, np.int32), np.zeros(tam, np.float32)
+        serie.ts[:ts.size], serie.precios[:ts.size] = ts, precios
+        serie.n = ts.size
+        return serie
+
+    def agregar(self, ts: int, precio: float) -> None:
+        cap = self.ts.size
+        if self.n:
+            ultimo = (self.inicio + self.n - 1) % cap
+            if ts // RESOLUCION == self.ts[ultimo] // RESOLUCION:
+                self.ts[ultimo], self.precios[ultimo] = ts, precio
+                return
+        if self.n == cap < self.capacidad:       # crecer; sin dar la vuelta inicio es 0
+            cap = min(2 * cap, self.capacidad)
+            self.ts      = np.resize(self.ts, cap)
+            self.precios = np.resize(self.precios, cap)
+        if self.n < cap:
+            i = (self.inicio + self.n) % cap
+            self.n += 1
+        else:
+            i = self.inicio                      # lleno: pisa el más antiguo
+            self.inicio = (self.inicio + 1) % cap
+        self.ts[i], self.precios[i] = ts, precio
+
+    def ultimo(self) -> int:
+        """Timestamp del punto más reciente (la serie nunca está vacía en Historial)."""
+        return int(self.ts[(self.inicio + self.n - 1) % self.ts.size])
+
+    def datos(self) -> tuple[np.ndarray, np.ndarray]:
+        """(ts, precios) en orden cronológico."""
+        orden = (self.inicio + np.arange(self.n)) % self.ts.size
+        return self.ts[orden], self.precios[orden]
+
+
+def _fusionar(a: tuple[np.ndarray, np.ndarray],
+              b: tuple[np.ndarray, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """Une dos series cronológicas; en un mismo minuto gana el punto más reciente."""
+    ts, precios = np.concatenate([a[0], b[0]]), np.concatenate([a[1], b[1]])
+    orden = np.argsort(ts, kind="stable")
+    ts, precios = ts[orden], precios[orden]
+    cubos = ts // RESOLUCION
+    ultimo = np.r_[cubos[1:] != cubos[:-1], True]
+    return ts[ultimo], precios[ultimo]
+
+
+class Historial:
+
+    def __init__(self, capacidad: int = CAPACIDAD):
+        self.capacidad = capacidad
+        self._series: dict[str, SerieAnillo] = {}
+        self._lock = threading.Lock()
+        self.cargado_mtime: float | None = None
+        self.ultima_ingesta: float | None = None
+        self._reciente = 0            # ts más reciente visto (ingerido o cargado)
+
+    @property
+    def ventana(self) -> int:
+        """Segundos que cubre una serie llena."""
+        return self.capacidad * RESOLUCION
+
+    def _caducar(self) -> None:
+        """Quita los tokens sin puntos dentro de la ventana (con el lock tomado)."""
+        limite = self._reciente - self.ventana
+        for token_id in [t for t, s in self._series.items() if s.ultimo() < limite]:
+            del self._series[token_id]
+
+    def agregar_precios(self, precios: dict[str, float], ts: float | None = None) -> None:
+        """Oyente de obtener_precios_paralelo: un punto por token."""
+        ts = int(ts if ts is not None else time.time())
+        with self._lock:
+            for token_id, precio in precios.items():
+                serie = self._series.get(token_id)
+                if serie is None:
+                    serie = self._series[token_id] = SerieAnillo(self.capacidad)
+                serie.agregar(ts, precio)
+            # A lo sumo una purga por minuto de datos, no por refresco
+            minuto_nuevo   = ts // RESOLUCION > self._reciente // RESOLUCION
+            self._reciente = max(self._reciente, ts)
+            if minuto_nuevo:
+                self._caducar()
+            self.ultima_ingesta = time.time()
+
+    def consulta(self, token_id: str, desde: int | None = None,
+                 hasta: int | None = None, paso: int | None = None) -> dict | None:
+        """
+        Serie del token entre desde/hasta. Con `paso` (s) se agrega en velas
+        OHLC por intervalo; sin él devuelve los puntos crudos.
+        """
+        with self._lock:
+            serie = self._series.get(token_id)
+            if serie is None:
+                return None
+            ts, precios = serie.datos()
+
+        mascara = np.ones(ts.size, dtype=bool)
+        if desde is not None:
+            mascara &= ts >= desde
+        if hasta is not None:
+            mascara &= ts <= hasta
+        ts, precios = ts[mascara], precios[mascara]
+
+        if not paso or ts.size == 0:
+            return {"token_id": token_id, "ts": ts.tolist(),
+                    "precio": np.round(precios.astype(float), 4).tolist()}
+
+        cubos = ts // paso
+        inicios = np.flatnonzero(np.r_[True, cubos[1:] != cubos[:-1]])
+        finales = np.r_[inicios[1:], ts.size] - 1
+        return {
+            "token_id": token_id,
+            "paso":     paso,
+            "ts":       (cubos[inicios] * paso).tolist(),
+            "open":     np.round(precios[inicios].astype(float), 4).tolist(),
+            "high":     np.round(np.maximum.reduceat(precios, inicios).astype(float), 4).tolist(),
+            "low":      np.round(np.minimum.reduceat(precios, inicios).astype(float), 4).tolist(),
+            "close":    np.round(precios[finales].astype(float), 4).tolist(),
+        }
+
+    def memoria_bytes(self) -> int:
+        with self._lock:
+            return sum(s.ts.nbytes + s.precios.nbytes for s in self._series.values())
+
+    # ── Persistencia ──────────────────────────────────────────────────────────
+
+    def guardar(self, path: str) -> None:
+        """
+        Fusiona el .npz de disco (lo que volcaron otros workers) con la memoria
+        y escribe el resultado, sin los tokens caducados. El flock serializa a
+        los workers y el temporal único evita que dos volcados escriban el mismo .tmp.
+        """
+        directorio = os.path.dirname(os.path.abspath(path))
+        with open(path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.cargar(path)
+            with self._lock:
+                tokens = list(self._series)
+                datos  = [self._series[t].datos() for t in tokens]
+            fd, tmp = tempfile.mkstemp(dir=directorio, prefix=os.path.basename(path) + ".",
+                                       suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.savez(
+                        f,
+                        tokens=np.array(tokens, dtype=str),
+                        longitudes=np.array([d[0].size for d in datos], dtype=np.int32),
+                        ts=(np.concatenate([d[0] for d in datos]) if datos
+                            else np.zeros(0, np.int32)),
+                        precios=(np.concatenate([d[1] for d in datos]) if datos
+                                 else np.zeros(0, np.float32)),
+                    )
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            self.cargado_mtime = os.path.getmtime(path)
+
+    def cargar(self, path: str) -> None:
+        """Fusiona el .npz con lo que ya hay en memoria (vacía al arrancar)."""
+        if not os.path.exists(path):
+            return
+        mtime = os.path.getmtime(path)
+        with np.load(path) as z:
+            tokens, longitudes, ts, precios = z["tokens"], z["longitudes"], z["ts"], z["precios"]
+        finales = np.cumsum(longitudes)
+        with self._lock:
+            if ts.size:
+                self._reciente = max(self._reciente, int(ts.max()))
+            limite = self._reciente - self.ventana
+            for token_id, fin, n in zip(tokens.tolist(), finales.tolist(), longitudes.tolist()):
+                if not n or ts[fin - 1] < limite:    # caducado: ni se materializa
+                    continue
+                disco = (ts[fin - n:fin], precios[fin - n:fin])
+                actual = self._series.get(token_id)
+                if actual is not None:
+                    disco = _fusionar(disco, actual.datos())
+                self._series[token_id] = SerieAnillo.desde(*disco, self.capacidad)
+            self._caducar()
+        self.cargado_mtime = mtime
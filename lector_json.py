@@ -0,0 +1,179 @@
+"""
+Lector JSON incremental para respuestas de Gemini en streaming.
+
+Antes se concatenaba el stream con += y se buscaba \\{.*\\} con una regex: una
+llave suelta en el resumen o en el texto de grounding rompía json.loads y se
+perdía la llamada entera. LectorJSON recorre cada chunk una sola vez siguiendo
+cadenas, escapes y anidamiento:
+
+- ignora lo que haya antes del objeto (```json, texto de grounding): el objeto
+  empieza en la primera '{' seguida de '"' o '}', no en cualquier llave;
+- valida cada campo de primer nivel en cuanto se cierra su valor, así una
+  respuesta mal formada se aborta a mitad de stream y no al final;
+- termina al cerrar el objeto, sin esperar al resto del stream.
+
+Sólo guarda los trozos del campo en curso (se unen una vez por campo), nunca
+el texto completo.
+
+Los mismos Campo sirven para pedir salida estructurada a Gemini:
+esquema_gemini() construye el response_schema.
+"""
+
+import json
+import math
+
+PREAMBULO_MAX = 4096     # caracteres tolerados antes del objeto
+RESPUESTA_MAX = 32768    # caracteres máximos del objeto
+
+_CIERRES = {"}": "{", "]": "["}
+
+
+class ErrorRespuesta(ValueError):
+    """Respuesta que no es el JSON esperado; el run se descarta (y se reintenta)."""
+
+
+class Campo:
+
+    def __init__(self, tipo: str, minimo: float | None = None,
+                 maximo: float | None = None, nulo: bool = False, descripcion: str = ""):
+        self.tipo        = tipo          # "number" | "integer" | "string"
+        self.minimo      = minimo
+        self.maximo      = maximo
+        self.nulo        = nulo
+        self.descripcion = descripcion
+
+    def validar(self, nombre: str, valor) -> None:
+        if valor is None:
+            if not self.nulo:
+                raise ErrorRespuesta(f"{nombre}: null no permitido")
+            return
+        if self.tipo == "string":
+            if not isinstance(valor, str):
+                raise ErrorRespuesta(f"{nombre}: se esperaba texto, llegó {valor!r}")
+            return
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+            raise ErrorRespuesta(f"{nombre}: se esperaba número, llegó {valor!r}")
+        if not math.isfinite(valor):        # json.loads acepta NaN / Infinity
+            raise ErrorRespuesta(f"{nombre}: número no finito {valor!r}")
+        if self.tipo == "integer" and not float(valor).is_integer():
+            raise ErrorRespuesta(f"{nombre}: se esperaba entero, llegó {valor!r}")
+        if ((self.minimo is not None and valor < self.minimo)
+                or (self.maximo is not None and valor > self.maximo)):
+            raise ErrorRespuesta(f"{nombre}: {valor} fuera de [{self.minimo}, {self.maximo}]")
+
+
+def esquema_gemini(campos: dict[str, Campo], requeridos: tuple[str, ...] = ()) -> dict:
+    """response_schema (subconjunto OpenAPI) para GenerateContentConfig."""
+    propiedades = {}
+    for nombre, c in campos.items():
+        p = {"type": c.tipo.upper()}
+        if c.minimo is not None:
+            p["minimum"] = c.minimo
+        if c.maximo is not None:
+            p["maximum"] = c.maximo
+        if c.nulo:
+            p["nullable"] = True
+        if c.descripcion:
+            p["description"] = c.descripcion
+        propiedades[nombre] = p
+    return {"type": "OBJECT", "properties": propiedades,
+            "required": list(requeridos), "propertyOrdering": list(campos)}
+
+
+class LectorJSON:
+
+    def __init__(self, campos: dict[str, Campo], requeridos: tuple[str, ...] = ()):
+        self.campos     = campos
+        self.requeridos = requeridos
+        self.datos: dict = {}
+        self.completo   = False
+        self._pila: list[str] = []        # '{' / '[' abiertos
+        self._en_cadena = False
+        self._escape    = False
+        self._miembro: list[str] = []     # trozos del campo de primer nivel en curso
+        self._vistos    = 0               # caracteres consumidos
+        self._candidato = False           # vista una '{' en el preámbulo
+
+    def alimentar(self, chunk: str) -> bool:
+        """Consume un chunk. True cuando el objeto está completo (se puede cortar el stream)."""
+        if self.completo:
+            return True
+        inicio = 0
+        for i, ch in enumerate(chunk):
+            if not self._pila:
+                if self._candidato and not ch.isspace():
+                    self._candidato = False
+                    if ch in '"}':
+                        self._pila.append("{")
+                        inicio = i
+                        self._miembro = []
+                if not self._pila:
+                    if ch == "{":
+                        self._candidato = True
+                        self._miembro = []
+                        inicio = i + 1
+                    elif self._vistos + i >= PREAMBULO_MAX:
+                        raise ErrorRespuesta("no llegó ningún objeto JSON")
+                    continue
+
+            if self._en_cadena:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._en_cadena = False
+                continue
+
+            if ch == '"':
+                self._en_cadena = True
+            elif ch in "{[":
+                self._pila.append(ch)
+            elif ch in "}]":
+                if self._pila[-1] != _CIERRES[ch]:
+                    raise ErrorRespuesta(f"'{ch}' no cierra '{self._pila[-1]}'")
+                if len(self._pila) == 1:
+                    self._miembro.append(chunk[inicio:i])
+                    self._cerrar_miembro(final=True)
+                    self._pila.pop()
+                    self.completo = True
+                    return True
+                self._pila.pop()
+            elif ch == "," and len(self._pila) == 1:
+                self._miembro.append(chunk[inicio:i])
+                self._cerrar_miembro(final=False)
+                inicio = i + 1
+
+        if self._pila:
+            self._miembro.append(chunk[inicio:])
+        self._vistos += len(chunk)
+        if self._vistos > RESPUESTA_MAX:
+            raise ErrorRespuesta(f"respuesta de más de {RESPUESTA_MAX} caracteres")
+        return False
+
+    def _cerrar_miembro(self, final: bool) -> None:
+        texto = "".join(self._miembro).strip()
+        self._miembro = []
+        if not texto:
+            if final and not self.datos:
+                return                     # objeto vacío {}
+            raise ErrorRespuesta("campo vacío (coma sobrante)")
+        try:
+            miembro = json.loads("{" + texto + "}")
+        except json.JSONDecodeError as e:
+            raise ErrorRespuesta(f"campo mal formado: {texto[:60]!r} ({e.msg})") from None
+        for nombre, valor in miembro.items():
+            campo = self.campos.get(nombre)
+            if campo is not None:
+                campo.validar(nombre, valor)
+            self.datos[nombre] = valor
+
+    def resultado(self) -> dict:
+        """El objeto validado; ErrorRespuesta si quedó incompleto o faltan campos."""
+        if not self.completo:
+            raise ErrorRespuesta("respuesta JSON incompleta" if self._pila
+                                 else "no llegó ningún objeto JSON")
+        faltan = [c for c in self.requeridos if c not in self.datos]
+        if faltan:
+            raise ErrorRespuesta(f"faltan campos: {', '.join(faltan)}")
+        return self.datos
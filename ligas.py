@@ -0,0 +1,182 @@
+"""
+Registro de ligas: todo lo que cambia entre NBA, WNBA, NCAA y NFL.
+
+Cada Liga define su serie/tag en Gamma, los patrones de mercados que se
+analizan (Moneyline / Spread / Total O/U), cómo se normaliza el nombre de un
+equipo, el contexto del prompt de Gemini y las σ del modelo normal de
+Spread/Total.
+
+Qué soporta cada liga:
+  NBA    series_id conocido; índice de alias completo (equipos.NBA)
+  WNBA   índice de alias completo (equipos.WNBA); falta su series_id
+  NFL    índice de alias completo (equipos.NFL); falta su series_id
+  NCAAB  sin índice (son ~360 equipos): se quitan rankings ("#5 Duke",
+         "Duke (5)") y se unifica "St." → "State", más un puñado de alias
+         habituales (equipos.NCAAB_ALIAS); falta su series_id
+
+LIGAS=NBA,WNBA,...   ligas a analizar en la misma ejecución (por defecto NBA)
+LIGAS_SERIES='{"WNBA": 12345}'   series_id de Gamma por liga; sólo NBA viene
+                                 configurada, las demás se activan al darle serie
+"""
+
+import os
+import re
+import json
+from typing import Callable
+
+import equipos
+from equipos import IndiceEquipos
+
+TAG_PARTIDOS = 100639   # tag de Gamma para mercados de partido
+
+# Props y mercados parciales que no entran en el modelo
+EXCLUIR_BALONCESTO = [
+    "points o/u", "rebounds o/u", "assists o/u", "steals o/u",
+    "blocks o/u", "turnovers o/u", "3-pointer", "field goal", "free throw",
+    "first quarter", "second quarter", "third quarter", "fourth quarter",
+    "first half", "second half", "halftime", "triple double", "double double",
+    "will there be", "lead at any", "margin of victory", "largest lead",
+]
+EXCLUIR_NFL = [
+    "passing yards", "rushing yards", "receiving yards", "receptions o/u",
+    "touchdown", "interception", "sacks", "field goal", "longest",
+    "first quarter", "second quarter", "third quarter", "fourth quarter",
+    "first half", "second half", "halftime", "will there be", "overtime",
+    "margin of victory", "largest lead",
+]
+
+
+class Liga:
+
+    def __init__(self, codigo: str, nombre: str, series_id: int | None, *,
+                 deporte: str, estrellas: str, excluir: list[str],
+                 sigma_margen: float, sigma_total: float, tag_id: int = TAG_PARTIDOS,
+                 indice: IndiceEquipos | None = None,
+                 normalizador: Callable[[str], str] | None = None,
+                 alias: dict[str, str] | None = None):
+        self.codigo       = codigo
+        self.nombre       = nombre
+        self.series_id    = series_id
+        self.tag_id       = tag_id
+        self.deporte      = deporte
+        self.estrellas    = estrellas      # quién cuenta como "estrella ausente" en el prompt
+        self.excluir      = excluir
+        self.sigma_margen = sigma_margen
+        self.sigma_total  = sigma_total
+        self.indice       = indice         # None → sólo comparación normalizada
+        self.normalizador = normalizador or _normalizar_espacios
+        self.alias        = alias or {}    # clave → clave, para ligas sin índice
+
+    def __repr__(self):
+        return f"Liga({self.codigo}, series_id={self.series_id})"
+
+    def clasificar_mercado(self, pregunta: str) -> str | None:
+        p, pl = pregunta.strip(), pregunta.lower()
+        if any(ex in pl for ex in self.excluir):             return None
+        if p.startswith("Spread:"):                          return "📐 Spread"
+        if ": O/U" in p:                                     return "🎯 Total O/U"
+        if ("vs." in pl or " vs " in pl) and ":" not in p:  return "💰 Moneyline"
+        return None
+
+    def normalizar_equipo(self, nombre: str) -> str:
+        return self.normalizador(nombre)
+
+    def canonico(self, nombre: str) -> str | None:
+        """Nombre canónico del equipo o None si no está en el índice de la liga."""
+        return self.indice.canonico(self.normalizar_equipo(nombre)) if self.indice else None
+
+    def clave_equipo(self, nombre: str) -> str:
+        """Clave estable para comparar equipos y para las cachés."""
+        canonico = self.canonico(nombre)
+        if canonico:
+            return canonico
+        k = equipos.clave(self.normalizar_equipo(nombre))
+        return self.alias.get(k, k)
+
+    def extraer_equipos(self, titulo: str) -> tuple[str, str]:
+        """'Visitante vs. Local' → (visitante, local)."""
+        for sep in [" vs. ", " vs "]:
+            if sep in titulo:
+                partes = titulo.split(sep, 1)
+                return self.normalizar_equipo(partes[0]), self.normalizar_equipo(partes[1])
+        return titulo, titulo
+
+
+def _normalizar_espacios(nombre: str) -> str:
+    return re.sub(r"\s+", " ", nombre).strip()
+
+
+_RANKING_NCAA = re.compile(r"^(?:#\s*\d+|no\.\s*\d+)\s+|\s*\(\d+\)$", re.IGNORECASE)
+
+
+def _normalizar_ncaa(nombre: str) -> str:
+    """'#5 Michigan St.' / 'Michigan St. (5)' → 'Michigan State'."""
+    nombre = _RANKING_NCAA.sub("", _normalizar_espacios(nombre))
+    return re.sub(r"\bSt\.?$", "State", nombre)
+
+
+_ESTRELLAS_BALONCESTO = "jugadores All-Star o con >18 PPG de promedio"
+
+# σ = desviación típica del resultado frente a la línea de cierre (margen y
+# total). En la NFL el total se desvía tanto como el margen, ~13-14 puntos.
+LIGAS: dict[str, Liga] = {
+    "NBA": Liga("NBA", "NBA", 10345, deporte="baloncesto", estrellas=_ESTRELLAS_BALONCESTO,
+                excluir=EXCLUIR_BALONCESTO, sigma_margen=13.5, sigma_total=19.0,
+                indice=equipos.NBA),
+    "WNBA": Liga("WNBA", "WNBA", None, deporte="baloncesto", estrellas=_ESTRELLAS_BALONCESTO,
+                 excluir=EXCLUIR_BALONCESTO, sigma_margen=11.0, sigma_total=15.0,
+                 indice=equipos.WNBA),
+    "NCAAB": Liga("NCAAB", "NCAA baloncesto", None, deporte="baloncesto",
+                  estrellas="titulares con >15 PPG de promedio",
+                  excluir=EXCLUIR_BALONCESTO, sigma_margen=11.0, sigma_total=17.0,
+                  normalizador=_normalizar_ncaa, alias=equipos.NCAAB_ALIAS),
+    "NFL": Liga("NFL", "NFL", None, deporte="fútbol americano",
+                estrellas="titulares clave (QB titular o jugadores Pro Bowl)",
+                excluir=EXCLUIR_NFL, sigma_margen=13.5, sigma_total=13.5,
+                indice=equipos.NFL),
+}
+
+def _aplicar_series(texto: str) -> None:
+    """
+    LIGAS_SERIES ('{"WNBA": 10366, ...}') → series_id de cada liga. Corre al
+    importar: un valor mal escrito avisa y se omite en vez de tumbar la app y la CLI.
+    """
+    try:
+        series = json.loads(texto)
+    except ValueError as exc:
+        print(f"  ⚠️  LIGAS_SERIES no es JSON válido ({exc}), se ignora")
+        return
+    if not isinstance(series, dict):
+        print(f'  ⚠️  LIGAS_SERIES debe ser un objeto {{"LIGA": series_id}}, se ignora')
+        return
+    for codigo, serie in series.items():
+        liga = LIGAS.get(codigo.upper())
+        if liga is None:
+            print(f"  ⚠️  LIGAS_SERIES: liga desconocida {codigo!r} ({', '.join(LIGAS)}), se omite")
+            continue
+        if isinstance(serie, str) and serie.strip().isdigit():
+            serie = int(serie)
+        if isinstance(serie, bool) or not isinstance(serie, int) or serie <= 0:
+            print(f"  ⚠️  LIGAS_SERIES: series_id de {codigo} inválido ({serie!r}), se omite")
+            continue
+        liga.series_id = serie
+
+
+_aplicar_series(os.environ.get("LIGAS_SERIES", "{}"))
+
+
+def ligas_activas() -> list[Liga]:
+    """Ligas pedidas en LIGAS que tienen series_id configurado."""
+    activas = []
+    for codigo in os.environ.get("LIGAS", "NBA").upper().split(","):
+        codigo = codigo.strip()
+        if not codigo:
+            continue
+        liga = LIGAS.get(codigo)
+        if liga is None:
+            raise ValueError(f"Liga desconocida: {codigo!r} ({', '.join(LIGAS)})")
+        if liga.series_id is None:
+            print(f"  ⚠️  {codigo}: sin series_id (configúralo en LIGAS_SERIES), se omite")
+            continue
+        activas.append(liga)
+    return activas
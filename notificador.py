@@ -0,0 +1,69 @@
+"""
+Un solo sondeo de versión por proceso, compartido por todos los streams SSE.
+
+Cada cliente de /stream (o del slate, o de alertas) esperaba preguntando él
+mismo la versión al estado cada pocos cientos de ms; con EstadoSQLite eso es
+una consulta en el threadpool del hub por cliente ocioso. Un Notificador lee
+la versión con UN hilo sondeador y despierta a los que esperan (Condition)
+sólo cuando cambia: el coste ya no crece con el número de clientes.
+
+El sondeador arranca con el primer cliente que espera y se detiene cuando no
+queda ninguno, así que un worker sin streams abiertos no consulta nada.
+"""
+
+import sys
+import time
+import threading
+
+
+class Notificador:
+
+    def __init__(self, leer, intervalo: float = 0.15):
+        """`leer()` devuelve la versión actual (se llama sólo desde el sondeador)."""
+        self._leer      = leer
+        self.intervalo  = intervalo
+        self._cond      = threading.Condition()
+        self._version   = None     # None: aún sin leer desde que arrancó el sondeador
+        self._esperando = 0
+        self._sondeando = False
+        self.lecturas   = 0
+
+    def esperar(self, visto=None, timeout: float | None = None):
+        """
+        Versión actual en cuanto sea distinta de `visto`. Si se agota `timeout`
+        devuelve la que haya (None si el sondeador aún no ha leído ninguna).
+        """
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._esperando += 1
+            try:
+                if not self._sondeando:
+                    self._sondeando = True
+                    threading.Thread(target=self._sondear, daemon=True).start()
+                while self._version is None or self._version == visto:
+                    resto = None if limite is None else limite - time.monotonic()
+                    if resto is not None and resto <= 0:
+                        break
+                    self._cond.wait(resto)
+                return self._version
+            finally:
+                self._esperando -= 1
+
+    def _sondear(self):
+        while True:
+            try:
+                version = self._leer()
+            except Exception as exc:
+                print(f"  ⚠️  Notificador: {exc}", file=sys.stderr)
+                version = self._version
+            with self._cond:
+                self.lecturas += 1
+                if version != self._version:
+                    self._version = version
+                    self._cond.notify_all()
+                if not self._esperando:
+                    # Sin clientes se para; el siguiente parte de una lectura fresca
+                    self._sondeando = False
+                    self._version   = None
+                    return
+            time.sleep(self.intervalo)
@@ -0,0 +1,349 @@
+"""
+Perfilado opt-in de una ejecución completa: muestreador de pilas de todos los hilos.
+
+cProfile sólo ve el hilo que lo activa, y el análisis pasa casi todo el tiempo
+en los pools (CLOB, Gemini, rachas). Perfilador muestrea cada INTERVALO s las
+pilas de todos los hilos con sys._current_frames() (estilo pyinstrument, tiempo
+de pared) y, cada CPU_CADA s, el tiempo de CPU de cada hilo desde
+/proc/self/task/<tid>/stat.
+
+Artefactos (guardar()):
+  <nombre>.folded  pilas colapsadas "hilo;archivo:función;... n", para
+                   flamegraph.pl, speedscope o inferno
+  <nombre>.json    por hilo (pared, CPU, muestras), por categoría (JSON, TLS,
+                   red, Gemini, salida, ...) y las funciones con más tiempo propio
+
+La categoría sale del frame más profundo de cada muestra: sirve para saber si
+el tiempo se va en parsear JSON, en el handshake/lectura TLS, esperando el
+stream de Gemini o imprimiendo.
+
+Con el worker gevent de producción threading está parcheado: los "hilos" de
+los pools son greenlets de un único hilo del SO, sys._current_frames() sólo ve
+el que corre y todos comparten native_id. Ahí el muestreador corre en un hilo
+real del SO (uno parcheado sería otro greenlet y sólo muestrearía cuando el
+resto cede), reparte el frame del hilo del hub al greenlet en curso y lee
+gr_frame de los demás. Los greenlets se buscan con gc una sola vez al empezar;
+desde ahí greenlet.settrace anota cada uno al entrar a correr (recorrer el heap
+cada CPU_CADA s retendría el GIL en el mismo worker que se mide). La CPU por
+greenlet no existe: cpu_s es null.
+"""
+
+import gc
+import os
+import re
+import sys
+import json
+import time
+import threading
+from collections import Counter
+
+INTERVALO  = float(os.environ.get("PERFIL_INTERVALO", "0.005"))   # s entre muestras
+CPU_CADA   = 0.1                                                  # s entre lecturas de CPU
+DIRECTORIO = os.environ.get(
+    "PERFILES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "perfiles")
+)
+
+# (fragmento de la ruta del archivo, categoría); gana la primera que coincide
+CATEGORIAS = [
+    ("lector_json", "json"), ("/json/", "json"),
+    ("ssl.py", "tls"),
+    ("socket.py", "red"), ("selectors.py", "red"), ("/http/client.py", "red"),
+    ("/urllib3/", "red"), ("/requests/", "red"), ("/httpcore/", "red"), ("/h11/", "red"),
+    ("/google/genai/", "gemini"), ("/httpx/", "gemini"),
+    ("/numpy/", "numpy"), ("simulacion.py", "numpy"),
+    ("sqlite3", "estado"), ("estado.py", "estado"),
+    ("threading.py", "espera"), ("/concurrent/futures/", "espera"), ("queue.py", "espera"),
+]
+_FUNCIONES_SALIDA = {"print", "write", "flush", "agregar_linea"}
+
+_POOL_SUFIJO = re.compile(r"_\d+$")   # "ThreadPoolExecutor-3_7" → "ThreadPoolExecutor-3"
+
+
+def _ticks_cpu() -> float:
+    try:
+        return float(os.sysconf("SC_CLK_TCK"))
+    except (ValueError, OSError, AttributeError):
+        return 100.0
+
+
+def _cpu_hilo(tid: int, hz: float) -> float | None:
+    """utime+stime (s) del hilo del kernel `tid`; None si ya no existe o no hay /proc."""
+    try:
+        with open(f"/proc/self/task/{tid}/stat", "rb") as f:
+            campos = f.read().rsplit(b")", 1)[1].split()
+        return (int(campos[11]) + int(campos[12])) / hz
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _gevent_monkey():
+    """gevent.monkey si threading está parcheado (worker gevent), si no None."""
+    monkey = sys.modules.get("gevent.monkey")
+    if monkey is None or not monkey.is_module_patched("threading"):
+        return None
+    return monkey
+
+
+def _etiqueta(code) -> str:
+    archivo = os.path.basename(code.co_filename)
+    if archivo.endswith(".py"):
+        archivo = archivo[:-3]
+    return f"{archivo}:{code.co_name}"
+
+
+def _categoria(code) -> str:
+    if code.co_name in _FUNCIONES_SALIDA:
+        return "salida"
+    ruta = code.co_filename.replace(os.sep, "/")
+    for fragmento, categoria in CATEGORIAS:
+        if fragmento in ruta:
+            return categoria
+    return "python"
+
+
+class Perfilador:
+    """with Perfilador() as p: ... ; luego p.guardar(directorio) / p.resumen()."""
+
+    def __init__(self, intervalo: float = INTERVALO):
+        self.intervalo = intervalo
+        self._pilas: Counter = Counter()             # (clave, (code, ...)) → muestras
+        self._hilos: dict[int, dict] = {}            # clave → {nombre, muestras, cpu, ...}
+        self._tids:  dict[int, int] = {}             # ident → clave (los ident se reutilizan)
+        self._parar  = threading.Event()
+        self._hilo: threading.Thread | None = None
+        self._gevent = None                          # hub, si se muestrean greenlets
+        self.inicio  = self.fin = None
+        self.muestras = 0
+
+    def __enter__(self):
+        self.inicio = time.time()
+        self._t0    = time.perf_counter()
+        monkey = _gevent_monkey()
+        if monkey is None:
+            self._hilo = threading.Thread(target=self._muestrear, name="perfilador", daemon=True)
+            self._hilo.start()
+            return self
+        from gevent.hub import get_hub
+        self._gevent    = get_hub()
+        self._ident     = monkey.get_original("_thread", "get_ident")
+        self._principal = self._ident()
+        self._dormir    = monkey.get_original("time", "sleep")
+        self._detenido  = monkey.get_original("_thread", "allocate_lock")()
+        self._detenido.acquire()
+        self._vivos: list = []
+        self._seguir_greenlets()
+        monkey.get_original("_thread", "start_new_thread")(self._muestrear_greenlets, ())
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        if self._gevent is None:
+            self._hilo.join()
+        else:
+            self._detenido.acquire()     # lock real: el muestreo termina en un intervalo
+            import greenlet
+            greenlet.settrace(self._traza_previa)
+        self.fin      = time.time()
+        self.duracion = time.perf_counter() - self._t0
+        return False
+
+    # ── Muestreo ──────────────────────────────────────────────────────────────
+
+    def _alta(self, clave, nombre: str, tid: int | None) -> dict:
+        h = self._hilos.get(clave)
+        if h is None:
+            h = self._hilos[clave] = {
+                "nombre": nombre, "tid": tid, "muestras": 0,
+                "primera": time.perf_counter(), "ultima": time.perf_counter(),
+                "cpu_inicio": _cpu_hilo(tid, self._hz) if tid else None, "cpu": None,
+            }
+        if tid:
+            cpu = _cpu_hilo(tid, self._hz)
+            if cpu is not None:
+                h["cpu"] = cpu
+        return h
+
+    def _anotar(self, clave, frame, ahora: float) -> None:
+        pila = []
+        while frame is not None:
+            pila.append(frame.f_code)
+            frame = frame.f_back
+        self._pilas[(clave, tuple(reversed(pila)))] += 1
+        h = self._hilos[clave]
+        h["muestras"] += 1
+        h["ultima"] = ahora
+
+    def _nombres(self) -> None:
+        propio = threading.get_ident()
+        tids   = {}
+        for t in threading.enumerate():
+            if t.ident is None or t.ident == propio or t.native_id is None:
+                continue
+            tids[t.ident] = t.native_id
+            self._alta(t.native_id, t.name, t.native_id)
+        self._tids = tids
+
+    def _muestrear(self) -> None:
+        propio = threading.get_ident()
+        self._hz = _ticks_cpu()
+        proxima_cpu = 0.0
+        while not self._parar.wait(self.intervalo):
+            ahora = time.perf_counter()
+            if ahora >= proxima_cpu:
+                self._nombres()
+                proxima_cpu = ahora + CPU_CADA
+            for ident, frame in sys._current_frames().items():
+                if ident == propio:
+                    continue
+                tid = self._tids.get(ident)
+                if tid is None:              # hilo nuevo entre dos lecturas de nombres
+                    self._nombres()
+                    tid = self._tids.get(ident)
+                    if tid is None:
+                        continue
+                self._anotar(tid, frame, ahora)
+            self.muestras += 1
+        self._nombres()
+
+    # ── Muestreo con gevent ──────────────────────────────────────────────────
+
+    def _seguir_greenlets(self) -> None:
+        """
+        Los greenlets que ya existen (un único recorrido de gc) y, desde aquí,
+        los que entran a correr. settrace es por hilo del SO: se llama desde el
+        del hub, que es donde corre __enter__ con gevent.
+        """
+        import greenlet
+        self._greenlets = {id(g): g for g in gc.get_objects()
+                           if isinstance(g, greenlet.greenlet)}
+        self._traza_previa = greenlet.settrace(self._traza)
+
+    def _traza(self, evento, args) -> None:
+        if evento in ("switch", "throw"):
+            destino = args[1]
+            self._greenlets[id(destino)] = destino
+        if self._traza_previa is not None:
+            self._traza_previa(evento, args)
+
+    def _nombres_greenlets(self) -> None:
+        """Greenlets del hub del análisis (los seguidos) y sus nombres de Thread."""
+        hub     = self._gevent
+        nombres = {t.ident: t.name for t in threading.enumerate()}
+        vivos   = []
+        for clave, g in list(self._greenlets.items()):
+            if g.dead or not (g.parent is hub or g is hub or g is hub.parent):
+                # pop y no reasignar: la traza escribe a la vez desde el hilo del hub
+                self._greenlets.pop(clave, None)
+                continue
+            vivos.append(g)
+            nombre = ("hub" if g is hub else "principal" if g is hub.parent
+                      else nombres.get(id(g)) or getattr(g, "name", None)
+                      or f"greenlet-{id(g):x}")
+            self._alta(id(g), nombre, None)
+        self._vivos = vivos
+
+    def _en_curso(self):
+        # El greenlet que corre es el único activo sin gr_frame (su frame es el
+        # del hilo en sys._current_frames)
+        for g in self._vivos:
+            if g and g.gr_frame is None:
+                return id(g)
+        return id(self._gevent)
+
+    def _muestrear_greenlets(self) -> None:
+        try:
+            propio   = self._ident()
+            self._hz = _ticks_cpu()
+            proxima  = 0.0
+            while not self._parar.is_set():
+                self._dormir(self.intervalo)
+                ahora = time.perf_counter()
+                if ahora >= proxima:
+                    self._nombres_greenlets()
+                    proxima = ahora + CPU_CADA
+                for ident, frame in sys._current_frames().items():
+                    if ident == propio:
+                        continue
+                    if ident == self._principal:
+                        self._anotar(self._en_curso(), frame, ahora)
+                    else:                   # threadpool del hub (SQLite, DNS)
+                        self._alta(ident, f"threadpool-{ident:x}", None)
+                        self._anotar(ident, frame, ahora)
+                for g in self._vivos:
+                    frame = g.gr_frame
+                    if frame is not None:
+                        self._anotar(id(g), frame, ahora)
+                self.muestras += 1
+            self._nombres_greenlets()
+        finally:
+            self._detenido.release()
+
+    # ── Resultados ────────────────────────────────────────────────────────────
+
+    def _raiz(self, clave) -> str:
+        # Los workers de un mismo pool se funden en una sola raíz del flamegraph
+        return _POOL_SUFIJO.sub("", self._hilos[clave]["nombre"])
+
+    def colapsado(self) -> str:
+        """Pilas en formato collapsed (una línea por pila distinta)."""
+        lineas: Counter = Counter()
+        for (clave, pila), n in self._pilas.items():
+            marcos = [self._raiz(clave)] + [_etiqueta(c) for c in pila]
+            lineas[";".join(m.replace(";", ",") for m in marcos)] += n
+        return "".join(f"{pila} {n}\n" for pila, n in sorted(lineas.items()))
+
+    def resumen(self, top: int = 20) -> dict:
+        categorias: Counter = Counter()
+        propias: Counter = Counter()
+        for (_, pila), n in self._pilas.items():
+            if pila:
+                categorias[_categoria(pila[-1])] += n
+                propias[_etiqueta(pila[-1])] += n
+        total = sum(categorias.values()) or 1
+
+        hilos = []
+        for h in self._hilos.values():
+            if not h["muestras"]:
+                continue
+            cpu = (h["cpu"] - h["cpu_inicio"]
+                   if h["cpu"] is not None and h["cpu_inicio"] is not None else None)
+            hilos.append({
+                "hilo":     h["nombre"],
+                "tid":      h["tid"],
+                "muestras": h["muestras"],
+                "pared_s":  round(h["ultima"] - h["primera"], 3),
+                "cpu_s":    round(cpu, 3) if cpu is not None else None,
+            })
+        hilos.sort(key=lambda h: h["muestras"], reverse=True)
+
+        return {
+            "inicio":       time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.inicio)),
+            "duracion_s":   round(self.duracion, 3),
+            "intervalo_s":  self.intervalo,
+            "muestras":     self.muestras,
+            "categorias":   {c: {"muestras": n, "pct": round(100 * n / total, 1)}
+                             for c, n in categorias.most_common()},
+            "funciones":    [{"funcion": f, "muestras": n, "pct": round(100 * n / total, 1)}
+                             for f, n in propias.most_common(top)],
+            "hilos":        hilos,
+        }
+
+    def guardar(self, directorio: str, nombre: str | None = None) -> str:
+        """Escribe <nombre>.folded y <nombre>.json; devuelve el nombre base."""
+        nombre = nombre or "perfil-" + time.strftime("%Y%m%d-%H%M%S", time.localtime(self.inicio))
+        os.makedirs(directorio, exist_ok=True)
+        with open(os.path.join(directorio, nombre + ".folded"), "w", encoding="utf-8") as f:
+            f.write(self.colapsado())
+        with open(os.path.join(directorio, nombre + ".json"), "w", encoding="utf-8") as f:
+            json.dump(self.resumen(), f, ensure_ascii=False, indent=2)
+        return nombre
+
+    def imprimir(self, top: int = 5) -> None:
+        r = self.resumen(top)
+        cpus = [h["cpu_s"] for h in r["hilos"] if h["cpu_s"] is not None]
+        cpu  = f"{sum(cpus):.1f} s de CPU" if cpus else "CPU n/d"
+        print(f"  🔬 Perfil: {r['duracion_s']:.1f} s de pared, {cpu} en "
+              f"{len(r['hilos'])} hilo(s), {r['muestras']} muestras")
+        print("     " + "  ".join(f"{c} {v['pct']:.0f}%" for c, v in r["categorias"].items()))
+        for f in r["funciones"]:
+            print(f"     {f['pct']:5.1f}%  {f['funcion']}")
@@ -0,0 +1,170 @@
+"""
+Calculadora de portafolio server-side (Kelly fraccional) sobre los candidatos
+de resultados.json (real, poly, edge, gap).
+
+Todo el cálculo está vectorizado con NumPy sobre una matriz escenarios × apuestas,
+así una sola petición evalúa miles de combinaciones de bankroll y parámetros.
+
+Por escenario:
+  kelly      = max(0, (p - q) / (1 - q))        p = real/100, q = poly/100
+  f          = fraccion · kelly, capeado a cap_apuesta
+  correlación: f *= 1 / (1 + rho·(k - 1))       k = partidos con apuesta > 0
+  cap_partido: la suma de f de apuestas del mismo partido ≤ cap_partido
+  exposición : la suma total de f ≤ 1 - reserva
+
+La respuesta no trae la matriz escenarios × apuestas entera (con 100k
+escenarios serían decenas de MB por petición y por entrada de caché): por
+apuesta, media y cuantiles del monto; los montos sólo de los TOP_ESCENARIOS
+con más crecimiento y, si se pide, de un escenario concreto.
+"""
+
+import math
+
+import numpy as np
+
+# Mismos valores por defecto que la calculadora del dashboard
+PARAMS_DEFECTO = {
+    "bankroll":    [1000.0],
+    "fraccion":    [0.25],   # fracción de Kelly
+    "cap_apuesta": [0.34],   # máximo por apuesta (fracción del bankroll)
+    "cap_partido": [0.34],   # máximo por partido (apuestas correlacionadas)
+    "reserva":     [0.33],   # fracción del bankroll que nunca se apuesta
+    "rho":         [0.10],   # correlación supuesta entre partidos del slate
+}
+MAX_ESCENARIOS = 100_000
+TOP_ESCENARIOS = 10                 # escenarios con montos completos en la respuesta
+CUANTILES      = (0.05, 0.5, 0.95)  # del monto de cada apuesta sobre los escenarios
+
+
+def _valores(raw) -> list[float]:
+    """Acepta número, lista, 'a,b,c' o rango 'inicio:fin:pasos'."""
+    if isinstance(raw, (int, float)):
+        return [float(raw)]
+    if isinstance(raw, (list, tuple)):
+        return [float(v) for v in raw]
+    raw = str(raw).strip()
+    if raw.count(":") == 2:
+        inicio, fin, pasos = raw.split(":")
+        pasos = int(pasos)
+        # Antes de linspace: '0:1:100000000' reservaría ~800 MB sólo para el rango
+        if not 1 <= pasos <= MAX_ESCENARIOS:
+            raise ValueError(f"pasos debe estar entre 1 y {MAX_ESCENARIOS}, llegó {pasos}")
+        return np.linspace(float(inicio), float(fin), pasos).tolist()
+    return [float(v) for v in raw.split(",") if v.strip()]
+
+
+def normalizar_params(raw: dict) -> tuple:
+    """Convierte los parámetros de la petición en una tupla hashable (clave de caché)."""
+    desconocidos = set(raw) - set(PARAMS_DEFECTO)
+    if desconocidos:
+        raise ValueError(f"Parámetros desconocidos: {sorted(desconocidos)}")
+
+    params, n = [], 1
+    for nombre, defecto in PARAMS_DEFECTO.items():
+        vals = _valores(raw[nombre]) if nombre in raw else defecto
+        if not vals:
+            raise ValueError(f"'{nombre}' sin valores")
+        if not all(math.isfinite(v) for v in vals):
+            raise ValueError(f"'{nombre}' debe ser finito (sin nan/inf)")
+        if nombre == "bankroll" and min(vals) <= 0:
+            raise ValueError("bankroll debe ser > 0")
+        if nombre != "bankroll" and not all(0 <= v <= 1 for v in vals):
+            raise ValueError(f"'{nombre}' debe estar entre 0 y 1")
+        n *= len(vals)
+        params.append((nombre, tuple(vals)))
+
+    if n > MAX_ESCENARIOS:
+        raise ValueError(f"{n} escenarios supera el máximo de {MAX_ESCENARIOS}")
+    return tuple(params)
+
+
+def calcular(candidatos: list[dict], params: tuple, escenario: int | None = None,
+             top: int = TOP_ESCENARIOS) -> dict:
+    """
+    Evalúa el producto cartesiano de todos los parámetros en bloque.
+    `escenario`: índice (orden de resumen) cuyos montos se devuelven enteros.
+    """
+    nombres = [n for n, _ in params]
+    grid    = np.meshgrid(*[np.asarray(v, dtype=float) for _, v in params], indexing="ij")
+    esc     = {n: g.ravel() for n, g in zip(nombres, grid)}
+    S       = esc["bankroll"].size
+    if escenario is not None and not 0 <= escenario < S:
+        raise ValueError(f"escenario debe estar entre 0 y {S - 1}, llegó {escenario}")
+
+    if not candidatos:
+        return {"escenarios": S, "parametros": {n: list(v) for n, v in params},
+                "apuestas": [], "resumen": {}, "top": []}
+
+    p = np.array([c["real"] for c in candidatos], dtype=float) / 100
+    q = np.clip(np.array([c["poly"] for c in candidatos], dtype=float) / 100, 0.01, 0.99)
+    partidos, grupo = np.unique([c["partido"] for c in candidatos], return_inverse=True)
+    G = np.eye(len(partidos))[grupo]                                    # (N, M) one-hot
+
+    kelly = np.clip((p - q) / (1 - q), 0, None)                         # (N,)
+    f = np.minimum(esc["fraccion"][:, None] * kelly, esc["cap_apuesta"][:, None])   # (S, N)
+
+    # Correlación entre partidos: encoger según cuántos partidos reciben apuesta
+    k = ((f @ G) > 0).sum(axis=1)
+    f *= (1 / (1 + esc["rho"] * np.maximum(k - 1, 0)))[:, None]
+
+    # Cap por partido (apuestas del mismo partido están correlacionadas)
+    por_partido = f @ G                                                 # (S, M)
+    factor = np.where(por_partido > esc["cap_partido"][:, None],
+                      esc["cap_partido"][:, None] / np.where(por_partido > 0, por_partido, 1), 1)
+    f *= factor[:, grupo]
+
+    # Exposición total ≤ 1 - reserva
+    total  = f.sum(axis=1)
+    limite = 1 - esc["reserva"]
+    f *= np.where(total > limite, limite / np.where(total > 0, total, 1), 1)[:, None]
+
+    montos = f * esc["bankroll"][:, None]
+    b      = 1 / q - 1                                                  # ganancia neta por $1
+    ev     = (montos * (p * b - (1 - p))).sum(axis=1)
+    crecimiento = (p * np.log1p(f * b) + (1 - p) * np.log1p(-np.minimum(f, 0.999))).sum(axis=1)
+
+    # Columnar (una lista por campo) para no iterar escenarios en Python. Los
+    # parámetros de cada escenario no se repiten: van en "parametros" y el
+    # índice i es el del producto en ese orden (el último varía más rápido)
+    resumen = {
+        "total_apostado": np.round(montos.sum(axis=1), 2).tolist(),
+        "en_reserva":     np.round(esc["bankroll"] - montos.sum(axis=1), 2).tolist(),
+        "ev":             np.round(ev, 2).tolist(),
+        "crecimiento":    np.round(crecimiento, 6).tolist(),
+    }
+    media  = montos.mean(axis=0)
+    cuants = np.quantile(montos, CUANTILES, axis=0)                     # (C, N)
+    apuestas = []
+    for j, c in enumerate(candidatos):
+        a = {"equipo": c["equipo"], "partido": c["partido"],
+             "kelly": round(float(kelly[j]), 4), "monto_medio": round(float(media[j]), 2)}
+        for cu, fila in zip(CUANTILES, cuants):
+            a[f"monto_p{round(cu * 100):02d}"] = round(float(fila[j]), 2)
+        apuestas.append(a)
+
+    # argpartition: los k mejores sin ordenar los S escenarios
+    k = min(top, S)
+    mejores = np.argpartition(-crecimiento, k - 1)[:k] if k else np.array([], dtype=int)
+    mejores = mejores[np.argsort(-crecimiento[mejores], kind="stable")]
+
+    def _escenario(i: int) -> dict:
+        return {"indice": int(i), **{n: float(esc[n][i]) for n in nombres},
+                "crecimiento": round(float(crecimiento[i]), 6),
+                "montos": np.round(montos[i], 2).tolist()}
+
+    resultado = {
+        "escenarios": S,
+        "parametros": {n: list(v) for n, v in params},
+        "apuestas":   apuestas,
+        "resumen":    resumen,
+        "top":        [_escenario(i) for i in mejores],
+    }
+    if escenario is not None:
+        resultado["escenario"] = _escenario(escenario)
+    if S == 1:
+        resultado["apuestas"] = [
+            {**a, "monto": round(float(montos[0, j]), 2),
+             "pct_portafolio": round(float(f[0, j] * 100), 2)}
+            for j, a in enumerate(resultado["apuestas"])
+        ]
+    return resultado
@@ -0,0 +1,84 @@
+"""
+Cola de reintentos con backoff para llamadas a servicios externos (CLOB, Gemini).
+
+Las tareas se ejecutan en un pool; una tarea que falla (excepción, o resultado
+que `es_fallo` considera inválido) vuelve a la cola con backoff exponencial y
+jitter mientras las demás siguen corriendo: el hilo coordinador sólo espera
+al primer futuro que termine o al próximo reintento programado, nunca a una
+tarea concreta.
+"""
+
+import time
+import heapq
+import random
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class ColaReintentos:
+
+    def __init__(self, max_workers: int, intentos: int = 3, base: float = 1.0,
+                 tope: float = 30.0, es_fallo=None):
+        self.max_workers = max_workers
+        self.intentos    = intentos          # intentos totales por tarea
+        self.base        = base              # espera (s) antes del 2º intento
+        self.tope        = tope
+        self.es_fallo    = es_fallo or (lambda valor: False)
+
+    def espera(self, intento: int) -> float:
+        """Backoff tras el intento n (1, 2, ...): base·2^(n-1), con tope y jitter."""
+        return min(self.tope, self.base * 2 ** (intento - 1)) * random.uniform(0.5, 1.0)
+
+    def ejecutar(self, tareas: dict, al_terminar=None, al_reintentar=None) -> dict:
+        """
+        tareas: {clave: fn sin argumentos}. Devuelve {clave: {"valor", "ok",
+        "intentos", "error"}}; el valor de una tarea agotada es el del último
+        intento (None si lanzó excepción).
+
+        al_terminar(clave, resultado) se llama en cuanto una tarea termina
+        definitivamente; al_reintentar(clave, intento, espera, error) al
+        reprogramarla.
+        """
+        resultados: dict = {}
+        intentos   = {clave: 0 for clave in tareas}
+        cola: list = [(0.0, n, clave) for n, clave in enumerate(tareas)]   # (listo_en, seq, clave)
+        seq        = len(cola)
+        en_vuelo: dict = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as pool:
+            while cola or en_vuelo:
+                ahora = time.monotonic()
+                while cola and cola[0][0] <= ahora:
+                    _, _, clave = heapq.heappop(cola)
+                    intentos[clave] += 1
+                    en_vuelo[pool.submit(tareas[clave])] = clave
+
+                timeout = max(0.0, cola[0][0] - ahora) if cola else None
+                if not en_vuelo:
+                    time.sleep(timeout)
+                    continue
+                hechos, _ = wait(en_vuelo, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for f in hechos:
+                    clave = en_vuelo.pop(f)
+                    try:
+                        valor, error = f.result(), None
+                        if self.es_fallo(valor):
+                            error = "resultado inválido"
+                    except Exception as e:
+                        valor, error = None, e
+
+                    n = intentos[clave]
+                    if error is not None and n < self.intentos:
+                        espera = self.espera(n)
+                        heapq.heappush(cola, (time.monotonic() + espera, seq, clave))
+                        seq += 1
+                        if al_reintentar:
+                            al_reintentar(clave, n, espera, error)
+                        continue
+
+                    resultados[clave] = {"valor": valor, "ok": error is None,
+                                         "intentos": n,
+                                         "error": None if error is None else str(error)}
+                    if al_terminar:
+                        al_terminar(clave, resultados[clave])
+        return resultados
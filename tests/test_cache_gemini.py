@@ -0,0 +1,77 @@
+import time
+import threading
+
+from ligas import LIGAS
+
+NBA = LIGAS["NBA"]
+
+
+def test_cache_de_partido_se_llena_dentro_del_vuelo(nba_ai, monkeypatch):
+    llamadas, en_vuelo = [], []
+
+    def muestrear(backend, local, visitante, liga, fecha):
+        llamadas.append(local)
+        time.sleep(0.05)
+        return {"p_vegas": 50}
+
+    set_original = nba_ai._CACHE_PARTIDOS.set
+
+    def set_(clave, valor):
+        en_vuelo.append(clave in nba_ai._VUELO_PARTIDO._vuelos)
+        set_original(clave, valor)
+
+    monkeypatch.setattr(nba_ai, "_muestrear_partido", muestrear)
+    monkeypatch.setattr(nba_ai._CACHE_PARTIDOS, "set", set_)
+
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(
+        nba_ai._analizar_campos_partido(None, "Hawks", "Nets", NBA))) for _ in range(8)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert llamadas == ["Hawks"]
+    assert en_vuelo == [True]           # nadie puede quedar entre el vuelo y la caché
+    assert all(r[0] == {"p_vegas": 50} for r in resultados)
+    assert nba_ai._analizar_campos_partido(None, "Hawks", "Nets", NBA)[1] is True
+
+
+def test_racha_se_cachea_dentro_del_vuelo(nba_ai, monkeypatch):
+    llamadas, en_vuelo = [], []
+
+    def consultar(backend, equipo, liga, fecha=None):
+        llamadas.append(equipo)
+        time.sleep(0.05)
+        return 61.0
+
+    set_original = nba_ai._CACHE_EQUIPOS.set
+
+    def set_(clave, valor):
+        en_vuelo.append(clave in nba_ai._VUELO_RACHA._vuelos)
+        set_original(clave, valor)
+
+    monkeypatch.setattr(nba_ai, "_consultar_racha_equipo", consultar)
+    monkeypatch.setattr(nba_ai._CACHE_EQUIPOS, "set", set_)
+
+    hilos = [threading.Thread(target=nba_ai.obtener_racha_equipo, args=(None, "Bulls", NBA))
+             for _ in range(8)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert llamadas == ["Bulls"]
+    assert en_vuelo == [True]
+    assert nba_ai.obtener_racha_equipo(None, "Bulls", NBA) == 61.0
+
+
+def test_precarga_sin_backend_no_aborta_el_slate(nba_ai, monkeypatch, capsys):
+    def caido():
+        raise RuntimeError("401 API key inválida")
+
+    monkeypatch.setattr(nba_ai, "obtener_backend", caido)
+    nba_ai.precargar_rachas([(NBA, "Equipo Inexistente")])
+    salida = capsys.readouterr().out
+    assert "Backend Gemini no disponible (401 API key inválida)" in salida
+    assert "racha por defecto (50) para 1 equipo(s)" in salida
@@ -0,0 +1,53 @@
+import argparse
+import threading
+import time
+from datetime import date
+
+import pytest
+
+from conftest import cargar_script
+from ligas import LIGAS
+
+
+def test_racha_cacheada_por_fecha_pedida(nba_ai, monkeypatch):
+    consultas = []
+
+    def consultar(backend, equipo, liga, fecha=None):
+        consultas.append(fecha)
+        return 40.0 if fecha == date(2025, 3, 1) else 80.0
+
+    monkeypatch.setattr(nba_ai, "_consultar_racha_equipo", consultar)
+    nba = LIGAS["NBA"]
+    assert nba_ai.obtener_racha_equipo(None, "Pistons", nba, date(2025, 3, 1)) == 40.0
+    assert nba_ai.obtener_racha_equipo(None, "Pistons", nba, date(2025, 3, 2)) == 80.0
+    assert nba_ai.obtener_racha_equipo(None, "Pistons", nba, date(2025, 3, 1)) == 40.0
+    assert consultas == [date(2025, 3, 1), date(2025, 3, 2)]
+
+
+@pytest.mark.parametrize("workers, fechas, por_fecha", [(4, 3, 1), (8, 3, 2), (4, 1, 4), (2, 5, 1)])
+def test_workers_es_el_total(nba_ai, monkeypatch, workers, fechas, por_fecha):
+    vistos, activos, maximo = [], [0], [0]
+    lock = threading.Lock()
+
+    def main(fecha, emitir=None, workers=None, usar_gemini=True):
+        with lock:
+            vistos.append(workers)
+            activos[0] += 1
+            maximo[0] = max(maximo[0], activos[0])
+        time.sleep(0.02)
+        with lock:
+            activos[0] -= 1
+        return []
+
+    monkeypatch.setattr(nba_ai, "main", main)
+    args = argparse.Namespace(format="json", quiet=True, workers=workers)
+    dias = [date(2025, 3, d) for d in range(1, fechas + 1)]
+    nba_ai._ejecutar_cli(args, dias, {"usar_gemini": False, "workers": workers})
+    assert set(vistos) == {por_fecha}
+    assert maximo[0] * por_fecha <= workers
+
+
+def test_poly_sin_no_gemini():
+    poly = cargar_script("nba_poly", "NBA-POLY.py")
+    with pytest.raises(SystemExit):
+        poly.cli(["--no-gemini"])
@@ -0,0 +1,38 @@
+import pytest
+
+from ligas import LIGAS
+
+
+def _item(titulo, outcomes, liga="NBA"):
+    return {"liga": LIGAS[liga], "evento": {"title": titulo},
+            "mercados": {"💰 Moneyline": {"outcomes": outcomes}}}
+
+
+@pytest.mark.parametrize("outcomes, metodo, local, visitante", [
+    (["Celtics", "Lakers"], "exacto", "Lakers", "Celtics"),
+    (["Lakers", "Boston"], "alias", "Lakers", "Boston"),
+    (["Lakers", "Team X"], "descarte", "Lakers", "Team X"),
+    (["Team X", "Team Y"], "orden", "Team Y", "Team X"),
+])
+def test_metodos(nba_ai, outcomes, metodo, local, visitante):
+    res = nba_ai.emparejar_equipos(_item("Celtics vs. Lakers", outcomes))
+    assert (res["metodo"], res["outcome_local"], res["outcome_visitante"]) == \
+        (metodo, local, visitante)
+
+
+@pytest.mark.parametrize("outcomes", [
+    ["Lakers", "Lakers"],           # antes: StopIteration abortaba construir_estructura
+    ["Lakers", "LA Lakers"],
+    ["Team X", "Team X"],
+    ["Lakers"],
+])
+def test_outcomes_del_mismo_equipo_es_fallo(nba_ai, outcomes):
+    res = nba_ai.emparejar_equipos(_item("Celtics vs. Lakers", outcomes))
+    assert res["metodo"] == "fallo"
+    assert res["aviso"]
+    assert res["outcome_local"] is None and res["outcome_visitante"] is None
+
+
+def test_sin_moneyline(nba_ai):
+    item = {"liga": LIGAS["NBA"], "evento": {"title": "Celtics vs. Lakers"}, "mercados": {}}
+    assert nba_ai.emparejar_equipos(item)["aviso"] == "sin mercado Moneyline"
@@ -0,0 +1,34 @@
+import os
+import sys
+import subprocess
+
+from conftest import RAIZ
+from entorno import cargar_env
+
+
+def test_no_pisa_lo_definido(tmp_path, monkeypatch):
+    env = tmp_path / ".env"
+    env.write_text('# comentario\nA_PRUEBA="uno"\nB_PRUEBA = dos\nsin igual\n')
+    monkeypatch.setenv("B_PRUEBA", "ya estaba")
+    monkeypatch.delenv("A_PRUEBA", raising=False)
+    cargar_env(str(env))
+    assert os.environ["A_PRUEBA"] == "uno"
+    assert os.environ["B_PRUEBA"] == "ya estaba"
+    monkeypatch.delenv("A_PRUEBA")
+
+
+def test_app_lee_el_env_al_arrancar(tmp_path):
+    # Copia del árbol con un .env propio: STATE_BACKEND sólo está en el .env
+    for nombre in os.listdir(RAIZ):
+        if nombre.endswith(".py"):
+            (tmp_path / nombre).symlink_to(os.path.join(RAIZ, nombre))
+    (tmp_path / "templates").symlink_to(os.path.join(RAIZ, "templates"))
+    (tmp_path / ".env").write_text(f"STATE_BACKEND=sqlite\nSTATE_DB={tmp_path / 'e.db'}\n"
+                                   "REFRESH_SEGUNDOS=7\n")
+    entorno = {k: v for k, v in os.environ.items()
+               if k not in ("STATE_BACKEND", "STATE_DB", "REFRESH_SEGUNDOS")}
+    salida = subprocess.run(
+        [sys.executable, "-c",
+         "import app; print(type(app.ESTADO).__name__, app.REFRESH_SEGUNDOS)"],
+        cwd=tmp_path, env=entorno, capture_output=True, text=True, check=True).stdout
+    assert salida.split() == ["EstadoSQLite", "7"]
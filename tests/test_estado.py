@@ -0,0 +1,153 @@
+import sys
+import types
+import threading
+
+import pytest
+
+import estado
+from estado import EstadoMemoria, EstadoSQLite
+
+
+@pytest.fixture(params=["memoria", "sqlite"])
+def est(request, tmp_path):
+    if request.param == "memoria":
+        yield EstadoMemoria()
+        return
+    e = EstadoSQLite(str(tmp_path / "estado.db"))
+    yield e
+    e.cerrar()
+
+
+def test_slate_delta_y_lapidas(est):
+    v1 = est.publicar_slate([{"id": "a", "x": 1}, {"id": "b", "x": 1}], completo=True)
+    assert est.publicar_slate([{"id": "a", "x": 1}]) == v1          # idéntica: sin cambio
+    v2 = est.publicar_slate([{"id": "a", "x": 2}], completo=True)    # b pasa a lápida
+    version, cambiados, borrados = est.slate(v1)
+    assert version == v2
+    assert [p["id"] for p in cambiados] == ["a"]
+    assert borrados == ["b"]
+
+
+def test_parche_no_resucita_lapidas(est):
+    est.publicar_slate([{"id": "a", "x": 1}, {"id": "b", "x": 1}], completo=True)
+    v1 = est.publicar_slate([{"id": "a", "x": 1}], completo=True)   # b pasa a lápida
+    v2 = est.parchear_slate(lambda t: {**t, "x": t["x"] + 1})
+    version, cambiados, borrados = est.slate(v1)
+    assert version == v2 == v1 + 1
+    assert cambiados == [{"id": "a", "x": 2, "version": v2}]
+    assert borrados == []
+    assert est.parchear_slate(lambda t: None) == v2                 # sin cambios: sin versión
+    assert est.parchear_slate(lambda t: t) == v2
+
+
+def test_parches_de_dos_workers_no_se_pisan(tmp_path):
+    ruta = str(tmp_path / "estado.db")
+    workers = [EstadoSQLite(ruta), EstadoSQLite(ruta)]
+    workers[0].publicar_slate([{"id": "a", "p1": 0, "p2": 0}], completo=True)
+
+    def parchear(est, campo):
+        for _ in range(20):
+            est.parchear_slate(lambda t: {**t, campo: t[campo] + 1})
+
+    hilos = [threading.Thread(target=parchear, args=(w, c)) for w, c in zip(workers, ("p1", "p2"))]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    _, (tarjeta,), _ = workers[1].slate()
+    assert (tarjeta["p1"], tarjeta["p2"], tarjeta["version"]) == (20, 20, 41)
+
+
+def _sin_transaccion(est: EstadoSQLite) -> bool:
+    return all(not con.in_transaction for con in est._libres)
+
+
+def test_linea_fallida_hace_rollback(tmp_path):
+    est = EstadoSQLite(str(tmp_path / "estado.db"))
+    with pytest.raises(Exception):
+        est.agregar_linea(object())          # no se puede enlazar en el INSERT
+    assert _sin_transaccion(est)
+    est.agregar_linea("ok")
+    assert est.lineas() == ["ok"]
+
+
+def test_alerta_fallida_hace_rollback(tmp_path):
+    est = EstadoSQLite(str(tmp_path / "estado.db"))
+    with est._con() as con:
+        con.execute("DROP TABLE alertas")
+    with pytest.raises(Exception):
+        est.agregar_alerta({"regla": "nea"})
+    assert _sin_transaccion(est)
+    est.agregar_linea("ok")                  # el lock de escritura quedó libre
+    assert est.lineas() == ["ok"]
+
+
+def test_pool_no_crece_con_los_clientes(tmp_path, monkeypatch):
+    monkeypatch.setattr(estado, "POOL_SQLITE", 2)
+    est = EstadoSQLite(str(tmp_path / "estado.db"))
+    hilos = [threading.Thread(target=est.lineas) for _ in range(20)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert len(est._libres) <= 2
+    est.cerrar()
+    assert not est._libres
+
+
+def test_con_gevent_consulta_en_el_threadpool(tmp_path, monkeypatch):
+    llamadas = []
+
+    class Pool:
+        def apply(self, fn, args, kwargs):
+            llamadas.append(fn.__name__)
+            return fn(*args, **kwargs)
+
+    hub   = types.SimpleNamespace(threadpool=Pool())
+    monkey = types.SimpleNamespace(is_module_patched=lambda m: m == "threading")
+    monkeypatch.setitem(sys.modules, "gevent.monkey", monkey)
+    monkeypatch.setitem(sys.modules, "gevent.hub",
+                        types.SimpleNamespace(get_hub_if_exists=lambda: hub))
+
+    est = EstadoSQLite(str(tmp_path / "estado.db"))
+    est.agregar_linea("hola")
+    assert est.lineas() == ["hola"]
+    assert llamadas == ["agregar_linea", "lineas"]
+
+
+def test_run_sin_latido_se_reemplaza(tmp_path, monkeypatch):
+    reloj = [1000.0]
+    monkeypatch.setattr(estado.time, "time", lambda: reloj[0])
+    e = EstadoSQLite(str(tmp_path / "estado.db"))
+    assert e.iniciar()
+    reloj[0] += estado.RUN_TIMEOUT - 1
+    e.latido()                                   # el worker sigue vivo
+    reloj[0] += estado.RUN_TIMEOUT - 1
+    assert not e.iniciar()
+    reloj[0] += estado.RUN_TIMEOUT + 1           # murió sin finalizar: deja de latir
+    assert e.iniciar()
+    e.cerrar()
+
+
+def test_migra_db_sin_columna_latido(tmp_path):
+    import sqlite3
+    ruta = str(tmp_path / "estado.db")
+    con = sqlite3.connect(ruta)
+    con.execute("CREATE TABLE run (id INTEGER PRIMARY KEY CHECK (id = 1), "
+                "running INTEGER NOT NULL DEFAULT 0, completed INTEGER NOT NULL DEFAULT 0, "
+                "error TEXT, iniciado REAL, version INTEGER NOT NULL DEFAULT 0)")
+    con.execute("INSERT INTO run (id, running, iniciado) VALUES (1, 1, 0)")
+    con.commit()
+    con.close()
+    e = EstadoSQLite(ruta)
+    assert e.iniciar()                           # iniciado = 0: caducado hace tiempo
+    e.latido()
+    assert not e.iniciar()
+    e.cerrar()
+
+
+def test_ultima_alerta(est):
+    assert est.ultima_alerta() == 0
+    est.agregar_alerta({"regla": "r"})
+    est.agregar_alerta({"regla": "r"})
+    assert est.ultima_alerta() == est.alertas()[-1]["id"] == 2
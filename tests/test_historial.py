@@ -0,0 +1,98 @@
+import numpy as np
+
+import historial
+from historial import Historial, SerieAnillo, RESOLUCION
+
+
+def test_serie_crece_y_luego_gira():
+    s = SerieAnillo(200)
+    for i in range(150):
+        s.agregar(i * RESOLUCION, i / 1000)
+    assert (s.n, s.ts.size) == (150, 200)        # 64 → 128 → tope de 200
+    for i in range(150, 300):
+        s.agregar(i * RESOLUCION, i / 1000)
+    ts, precios = s.datos()
+    assert s.ts.size == 200
+    assert ts.tolist() == [i * RESOLUCION for i in range(100, 300)]
+    assert np.allclose(precios, np.arange(100, 300) / 1000)
+
+
+def test_mismo_minuto_se_funde():
+    s = SerieAnillo(10)
+    s.agregar(120, 0.5)
+    s.agregar(150, 0.6)
+    assert s.datos()[0].tolist() == [150]
+    assert np.allclose(s.datos()[1], [0.6])
+
+
+def test_memoria_proporcional_a_los_puntos():
+    h = Historial()
+    for token in range(100):
+        h.agregar_precios({str(token): 0.5}, ts=0)
+    assert h.memoria_bytes() == 100 * historial.INICIAL * 8
+
+
+def test_dos_workers_no_se_pisan(tmp_path):
+    path = str(tmp_path / "historial.npz")
+    a, b = Historial(), Historial()
+    a.agregar_precios({"x": 0.40, "comun": 0.10}, ts=0)
+    b.agregar_precios({"y": 0.60, "comun": 0.20}, ts=RESOLUCION)
+    a.guardar(path)
+    b.guardar(path)                     # b fusiona lo de a antes de escribir
+    c = Historial()
+    c.cargar(path)
+    assert c.consulta("x")["precio"] == [0.4]
+    assert c.consulta("y")["precio"] == [0.6]
+    assert c.consulta("comun")["ts"] == [0, RESOLUCION]
+    assert b.consulta("x")["precio"] == [0.4]     # y b ya ve lo de a en memoria
+    assert not [p for p in tmp_path.iterdir() if p.suffix == ".tmp"]
+
+
+def test_cargar_respeta_capacidad(tmp_path):
+    path = str(tmp_path / "historial.npz")
+    a = Historial(capacidad=1000)
+    for i in range(500):
+        a.agregar_precios({"t": i / 1000}, ts=i * RESOLUCION)
+    a.guardar(path)
+    b = Historial(capacidad=100)
+    b.cargar(path)
+    assert b.consulta("t")["ts"] == [i * RESOLUCION for i in range(400, 500)]
+
+
+def test_velas():
+    h = Historial()
+    for i, p in enumerate([0.5, 0.7, 0.4, 0.6]):
+        h.agregar_precios({"t": p}, ts=i * RESOLUCION)
+    v = h.consulta("t", paso=4 * RESOLUCION)
+    assert (v["open"], v["high"], v["low"], v["close"]) == ([0.5], [0.7], [0.4], [0.6])
+
+
+def test_tokens_caducados_se_descartan_al_ingerir():
+    h = Historial(capacidad=10)                  # ventana de 10 minutos
+    h.agregar_precios({"viejo": 0.5, "vivo": 0.5}, ts=0)
+    h.agregar_precios({"vivo": 0.6}, ts=10 * RESOLUCION)
+    assert h.consulta("viejo") is not None       # justo en el borde de la ventana
+    h.agregar_precios({"vivo": 0.7}, ts=11 * RESOLUCION)
+    assert h.consulta("viejo") is None
+    assert h.consulta("vivo")["precio"] == [0.5, 0.6, 0.7]
+
+
+def test_guardar_no_arrastra_tokens_caducados(tmp_path):
+    path = str(tmp_path / "historial.npz")
+    antigua = Historial(capacidad=10)
+    antigua.agregar_precios({"temporada_pasada": 0.5}, ts=0)
+    antigua.guardar(path)
+
+    actual = Historial(capacidad=10)
+    actual.agregar_precios({"hoy": 0.4}, ts=1000 * RESOLUCION)
+    actual.guardar(path)                         # fusiona el disco sin lo caducado
+    assert actual.consulta("temporada_pasada") is None
+
+    with np.load(path) as z:
+        assert z["tokens"].tolist() == ["hoy"]
+
+    # Un worker que aún tiene el token viejo en memoria tampoco lo reescribe
+    antigua.agregar_precios({"temporada_pasada": 0.5}, ts=RESOLUCION)
+    antigua.cargar(path)
+    assert antigua.consulta("temporada_pasada") is None
+    assert antigua.consulta("hoy")["precio"] == [0.4]
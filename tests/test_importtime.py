@@ -0,0 +1,51 @@
+"""
+Presupuesto de arranque: `import app` en un proceso limpio tiene que quedar
+bajo IMPORT_BUDGET_MS y no cargar google-genai ni requests (los carga
+NBA-AI.py en el primer análisis).
+"""
+
+import sys
+import subprocess
+
+from conftest import RAIZ
+
+IMPORT_BUDGET_MS   = 500                         # import app (Flask incluido) en frío
+IMPORTS_PROHIBIDOS = ("google.genai", "requests")
+
+
+def _importtime() -> tuple[float, list[tuple[int, str]], set[str]]:
+    """(ms acumulados de app, hijos directos (µs, nombre), módulos cargados)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=RAIZ, capture_output=True, text=True,
+    )
+    assert proc.returncode == 0, proc.stderr
+
+    hijos, pendientes, modulos = [], [], set()
+    total_ms = 0.0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, acumulado, nombre = line.split("|")
+        profundidad = (len(nombre) - len(nombre.lstrip()) - 1) // 2
+        nombre = nombre.strip()
+        modulos.add(nombre)
+        if profundidad == 1:
+            pendientes.append((int(acumulado), nombre))
+        elif profundidad == 0:           # importtime lista los hijos antes que el padre
+            if nombre == "app":
+                total_ms, hijos = int(acumulado) / 1000, pendientes
+            pendientes = []
+    return total_ms, hijos, modulos
+
+
+def test_import_app_bajo_presupuesto():
+    total_ms, hijos, _ = _importtime()
+    detalle = ", ".join(f"{n} {us / 1000:.0f} ms" for us, n in sorted(hijos, reverse=True)[:8])
+    assert total_ms <= IMPORT_BUDGET_MS, f"import app: {total_ms:.0f} ms ({detalle})"
+
+
+def test_import_app_sin_modulos_pesados():
+    _, _, modulos = _importtime()
+    cargados = [m for m in IMPORTS_PROHIBIDOS if m in modulos]
+    assert not cargados, f"se importan al arrancar: {', '.join(cargados)}"
@@ -0,0 +1,112 @@
+import pytest
+
+import lector_json
+from lector_json import Campo, ErrorRespuesta, LectorJSON, esquema_gemini
+
+CAMPOS = {
+    "p_vegas": Campo("number", 0, 100),
+    "estrellas": Campo("integer", 0, 5),
+    "total": Campo("number", nulo=True),
+    "resumen": Campo("string"),
+}
+REQUERIDOS = ("p_vegas",)
+
+
+def leer(*chunks: str) -> dict:
+    lector = LectorJSON(CAMPOS, REQUERIDOS)
+    for chunk in chunks:
+        if lector.alimentar(chunk):
+            break
+    return lector.resultado()
+
+
+def leer_por_caracter(texto: str) -> dict:
+    return leer(*texto)
+
+
+OBJETO = '{"p_vegas": 61.5, "estrellas": 2, "total": null, "resumen": "ok"}'
+
+
+def test_objeto_simple():
+    assert leer(OBJETO) == {"p_vegas": 61.5, "estrellas": 2, "total": None, "resumen": "ok"}
+
+
+def test_fence_markdown():
+    assert leer("```json\n" + OBJETO + "\n```")["p_vegas"] == 61.5
+
+
+def test_llaves_sueltas_en_preambulo_y_en_cadenas():
+    texto = 'Según {fuentes} y { notas }: {"p_vegas": 55, "resumen": "usa {llaves} y ] corchetes"}'
+    assert leer(texto) == {"p_vegas": 55, "resumen": "usa {llaves} y ] corchetes"}
+
+
+def test_escapes_en_cadenas():
+    datos = leer_por_caracter(r'{"p_vegas": 50, "resumen": "dijo \"hola\" \\ y é }"}')
+    assert datos["resumen"] == 'dijo "hola" \\ y é }'
+
+
+def test_anidados_no_cortan_el_campo():
+    datos = leer('{"p_vegas": 50, "extra": {"a": [1, {"b": "}"}]}, "estrellas": 1}')
+    assert datos["extra"] == {"a": [1, {"b": "}"}]} and datos["estrellas"] == 1
+
+
+@pytest.mark.parametrize("corte", range(1, len(OBJETO)))
+def test_cualquier_frontera_de_chunk(corte):
+    assert leer(OBJETO[:corte], OBJETO[corte:]) == leer(OBJETO)
+
+
+def test_caracter_a_caracter():
+    assert leer_por_caracter("texto previo\n" + OBJETO + " y basura después") == leer(OBJETO)
+
+
+def test_termina_al_cerrar_el_objeto():
+    lector = LectorJSON(CAMPOS, REQUERIDOS)
+    assert lector.alimentar(OBJETO[:-1]) is False
+    assert lector.alimentar("} resto del stream {") is True
+    assert lector.alimentar("más") is True
+
+
+def test_aborta_a_mitad_de_stream():
+    lector = LectorJSON(CAMPOS, REQUERIDOS)
+    with pytest.raises(ErrorRespuesta, match="p_vegas"):
+        lector.alimentar('{"p_vegas": 150, "resumen": "sin cerrar')   # sin esperar al final
+
+
+@pytest.mark.parametrize("valor", ["NaN", "Infinity", "-Infinity"])
+def test_rechaza_no_finitos(valor):
+    with pytest.raises(ErrorRespuesta, match="finito"):
+        leer('{"p_vegas": %s}' % valor)
+    with pytest.raises(ErrorRespuesta, match="finito"):
+        leer('{"p_vegas": 50, "total": %s}' % valor)      # ni en campos sin rango
+
+
+@pytest.mark.parametrize("texto, motivo", [
+    ('{"p_vegas": "alto"}', "número"),
+    ('{"p_vegas": true}', "número"),
+    ('{"p_vegas": 50, "estrellas": 1.5}', "entero"),
+    ('{"p_vegas": null}', "null"),
+    ('{"p_vegas": 50,, "estrellas": 1}', "mal formado|vacío"),
+    ('{"p_vegas": 50]', "no cierra"),
+    ('{"estrellas": 1}', "faltan campos: p_vegas"),
+    ('{"p_vegas": 50', "incompleta"),
+    ("sin objeto", "ningún objeto"),
+])
+def test_errores(texto, motivo):
+    with pytest.raises(ErrorRespuesta, match=motivo):
+        leer(texto)
+
+
+def test_limites(monkeypatch):
+    with pytest.raises(ErrorRespuesta, match="ningún objeto"):
+        leer("x" * (lector_json.PREAMBULO_MAX + 1) + OBJETO)
+    monkeypatch.setattr(lector_json, "RESPUESTA_MAX", 100)
+    with pytest.raises(ErrorRespuesta, match="más de 100"):
+        leer('{"p_vegas": 50, "resumen": "' + "x" * 200, '"}')
+
+
+def test_esquema_gemini():
+    esquema = esquema_gemini(CAMPOS, REQUERIDOS)
+    assert esquema["required"] == ["p_vegas"]
+    assert esquema["propertyOrdering"] == list(CAMPOS)
+    assert esquema["properties"]["p_vegas"] == {"type": "NUMBER", "minimum": 0, "maximum": 100}
+    assert esquema["properties"]["total"]["nullable"] is True
@@ -0,0 +1,80 @@
+import subprocess
+import sys
+
+import pytest
+
+from conftest import RAIZ
+from ligas import LIGAS
+
+
+@pytest.mark.parametrize("a, b", [
+    ("#5 Michigan St.", "Michigan State"),
+    ("Michigan St (12)", "Michigan State"),
+    ("No. 3 UConn", "Connecticut"),
+    ("St. John's", "Saint Johns"),
+])
+def test_ncaab_rankings_y_alias(a, b):
+    ncaab = LIGAS["NCAAB"]
+    assert ncaab.clave_equipo(a) == ncaab.clave_equipo(b)
+
+
+def test_ncaab_no_confunde_equipos():
+    ncaab = LIGAS["NCAAB"]
+    assert ncaab.clave_equipo("Michigan St.") != ncaab.clave_equipo("Michigan")
+
+
+@pytest.mark.parametrize("codigo, alias, canonico", [
+    ("NBA", "LA Clippers", "Los Angeles Clippers"),
+    ("WNBA", "LV Aces", "Las Vegas Aces"),
+    ("NFL", "Niners", "San Francisco 49ers"),
+])
+def test_indice_por_liga(codigo, alias, canonico):
+    assert LIGAS[codigo].clave_equipo(f"  {alias} ") == canonico
+
+
+def test_extraer_equipos_normaliza():
+    assert LIGAS["NCAAB"].extraer_equipos("#4 Duke vs. North Carolina (10)") == \
+        ("Duke", "North Carolina")
+
+
+def test_ligas_series_desconocida_no_rompe_el_import():
+    proc = subprocess.run(
+        [sys.executable, "-c", "import ligas; print(ligas.LIGAS['WNBA'].series_id)"],
+        cwd=RAIZ, capture_output=True, text=True,
+        env={"LIGAS_SERIES": '{"XFL": 1, "wnba": 7}', "PATH": ""},
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert "XFL" in proc.stdout and proc.stdout.strip().endswith("7")
+
+
+@pytest.mark.parametrize("texto, aviso", [
+    ('{"WNBA": 10', "no es JSON válido"),
+    ('[10366]', "debe ser un objeto"),
+    ('{"WNBA": "abc"}', "series_id de WNBA inválido"),
+    ('{"WNBA": null}', "series_id de WNBA inválido"),
+    ('{"WNBA": 1.5}', "series_id de WNBA inválido"),
+    ('{"WNBA": true}', "series_id de WNBA inválido"),
+])
+def test_ligas_series_mal_formada_avisa_y_se_omite(monkeypatch, capsys, texto, aviso):
+    import ligas
+    monkeypatch.setattr(ligas.LIGAS["WNBA"], "series_id", None)
+    ligas._aplicar_series(texto)
+    assert ligas.LIGAS["WNBA"].series_id is None
+    assert aviso in capsys.readouterr().out
+
+
+def test_ligas_series_acepta_ids_como_texto(monkeypatch):
+    import ligas
+    monkeypatch.setattr(ligas.LIGAS["WNBA"], "series_id", None)
+    ligas._aplicar_series('{"wnba": "10366"}')
+    assert ligas.LIGAS["WNBA"].series_id == 10366
+
+
+def test_ligas_series_invalida_no_rompe_el_import():
+    proc = subprocess.run(
+        [sys.executable, "-c", "import ligas; print(ligas.LIGAS['NBA'].series_id)"],
+        cwd=RAIZ, capture_output=True, text=True,
+        env={"LIGAS_SERIES": '{"NBA": "x"', "PATH": ""},
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert "no es JSON válido" in proc.stdout and proc.stdout.strip().endswith("10345")
@@ -0,0 +1,104 @@
+import pytest
+
+from ligas import LIGAS
+
+
+@pytest.mark.parametrize("pregunta, esperado", [
+    ("Spread: Pistons (-5.5)", ("Pistons", -5.5)),
+    ("Spread: Pistons (+3)", ("Pistons", 3.0)),
+    ("Spread:Pistons ( 7 )", ("Pistons", 7.0)),
+    ("Spread: Miami (FL) (-2.5)", ("Miami (FL)", -2.5)),
+    ("Pistons -5.5", None),
+    ("Spread: Pistons", None),
+    ("Spread: Pistons (pk)", None),
+])
+def test_parsear_spread(nba_ai, pregunta, esperado):
+    assert nba_ai.parsear_spread(pregunta) == esperado
+
+
+@pytest.mark.parametrize("pregunta, esperado", [
+    ("Thunder vs. Pistons: O/U 218.5", 218.5),
+    ("Chiefs vs. Bills: O/U 47", 47.0),
+    ("Thunder vs. Pistons: total points", None),
+])
+def test_parsear_total(nba_ai, pregunta, esperado):
+    assert nba_ai.parsear_total(pregunta) == esperado
+
+
+def test_spread_signos(nba_ai):
+    cubre = nba_ai.prob_cubre_spread
+    assert cubre(0.5, -5.5) < 0.5 < cubre(0.5, 5.5)          # dar puntos cuesta, recibirlos ayuda
+    assert cubre(0.5, 0) == pytest.approx(0.5)
+    assert cubre(0.7, -3) < 0.7 < cubre(0.7, 3)
+    assert cubre(0.8, -5.5) > cubre(0.6, -5.5)                # mejor equipo, más probable cubrir
+
+
+@pytest.mark.parametrize("linea", [-3.0, -3.5, 7.0])
+def test_spread_caras_complementarias_sin_push(nba_ai, linea):
+    # el favorito con -x y el rival con +x: una de las dos cubre siempre
+    p = 0.65
+    assert nba_ai.prob_cubre_spread(p, linea) + nba_ai.prob_cubre_spread(1 - p, -linea) \
+        == pytest.approx(1)
+
+
+def test_spread_probabilidades_extremas_acotadas(nba_ai):
+    assert 0 < nba_ai.prob_cubre_spread(0.0, -5.5) < nba_ai.prob_cubre_spread(1.0, -5.5) < 1
+
+
+def test_over(nba_ai):
+    assert nba_ai.prob_over(220, 220) == pytest.approx(0.5)
+    assert nba_ai.prob_over(220, 210.5) > 0.5 > nba_ai.prob_over(220, 229.5)
+    assert nba_ai.prob_over(220, 215, sigma=10) > nba_ai.prob_over(220, 215, sigma=20)
+
+
+def _item(liga="NBA", spread="Spread: Hawks (-5.5)", total="Hawks vs. Nets: O/U 220.5"):
+    mercados = {}
+    if spread:
+        mercados["📐 Spread"] = {"pregunta": spread, "outcomes": ["Hawks", "Nets"],
+                                "token_ids": ["sh", "sn"]}
+    if total:
+        mercados["🎯 Total O/U"] = {"pregunta": total, "outcomes": ["Over", "Under"],
+                                   "token_ids": ["to", "tu"]}
+    return {"liga": LIGAS[liga], "evento": {"title": "Hawks vs. Nets"}, "mercados": mercados}
+
+
+EQUIPOS = [{"outcome": "Hawks", "valor_real": 70.0}, {"outcome": "Nets", "valor_real": 30.0}]
+PRECIOS = {"sh": 0.45, "sn": 0.55, "to": 0.52, "tu": 0.48}
+
+
+def test_puntuar_mercados(nba_ai):
+    calc = {c["outcome"]: c for c in nba_ai.puntuar_mercados(
+        _item(), {"total_vegas": 224.0}, PRECIOS, EQUIPOS)}
+    assert set(calc) == {"Hawks -5.5", "Nets +5.5", "Over 220.5", "Under 220.5"}
+    assert calc["Hawks -5.5"]["valor_real"] + calc["Nets +5.5"]["valor_real"] == pytest.approx(100)
+    assert calc["Over 220.5"]["valor_real"] + calc["Under 220.5"]["valor_real"] == pytest.approx(100)
+    assert calc["Over 220.5"]["valor_real"] > 50                  # total_vegas sobre la línea
+    for c in calc.values():
+        assert c["nea"] == pytest.approx(c["p_poly_pct"] - c["valor_real"])
+        assert c["es_local"] is None
+    assert calc["Hawks -5.5"]["p_poly_pct"] == pytest.approx(45)
+
+
+def test_puntuar_mercados_usa_las_sigmas_de_la_liga(nba_ai):
+    nba = nba_ai.puntuar_mercados(_item("NBA", spread=None), {"total_vegas": 224.0}, PRECIOS, EQUIPOS)
+    nfl = nba_ai.puntuar_mercados(_item("NFL", spread=None), {"total_vegas": 224.0}, PRECIOS, EQUIPOS)
+    assert nba[0]["valor_real"] != nfl[0]["valor_real"]
+
+
+@pytest.mark.parametrize("item, analisis, precios, equipos", [
+    (_item(spread="Spread: Hawks", total="sin línea"), {"total_vegas": 224.0}, PRECIOS, EQUIPOS),
+    (_item(spread="Spread: Celtics (-2.5)", total=None), {}, PRECIOS, EQUIPOS),   # equipo ajeno
+    (_item(total=None), {}, PRECIOS, EQUIPOS[:1]),                                # sin los dos
+    (_item(spread=None), {"total_vegas": None}, PRECIOS, EQUIPOS),                # sin total_vegas
+    (_item(), {"total_vegas": 224.0}, {}, EQUIPOS),                               # sin precios
+])
+def test_puntuar_mercados_sin_datos(nba_ai, item, analisis, precios, equipos):
+    assert nba_ai.puntuar_mercados(item, analisis, precios, equipos) == []
+
+
+def test_total_es_discrepancia_de_linea_no_scalping(nba_ai):
+    # el caso real: Over al 72.6% por total_vegas contra 52¢ en Polymarket
+    emoji, _ = nba_ai.clasificar_nea(52.0, 72.6, mercado="🎯 Total O/U")
+    assert emoji == "📏 LÍNEA"
+    assert nba_ai.clasificar_nea(52.0, 72.6, mercado="Spread")[0] == "🎰 SCALPING"
+    assert nba_ai.clasificar_nea(52.0, 54.0, mercado="Total O/U")[0] == "➖ PRECIO JUSTO"
@@ -0,0 +1,69 @@
+import time
+import threading
+
+from notificador import Notificador
+
+
+def test_un_sondeo_sirve_a_todos_los_clientes():
+    version = [1]
+    lecturas = []
+
+    def leer():
+        lecturas.append(threading.get_ident())
+        return version[0]
+
+    n = Notificador(leer, intervalo=0.01)
+    recibidas = []
+
+    def cliente():
+        visto = n.esperar(None, timeout=5)
+        recibidas.append(n.esperar(visto, timeout=5))
+
+    hilos = [threading.Thread(target=cliente) for _ in range(50)]
+    for h in hilos:
+        h.start()
+    time.sleep(0.1)
+    version[0] = 2
+    for h in hilos:
+        h.join(5)
+
+    assert recibidas == [2] * 50
+    assert len(set(lecturas)) == 1               # un único hilo sondeador
+    assert len(lecturas) < 50                    # no una lectura por cliente y vuelta
+
+
+def test_sin_clientes_deja_de_sondear():
+    lecturas = [0]
+
+    def leer():
+        lecturas[0] += 1
+        return 7
+
+    n = Notificador(leer, intervalo=0.01)
+    assert n.esperar(None, timeout=1) == 7
+    time.sleep(0.1)
+    parado = lecturas[0]
+    time.sleep(0.1)
+    assert lecturas[0] == parado
+    assert n.esperar(None, timeout=1) == 7       # el siguiente cliente lo rearranca
+
+
+def test_timeout_devuelve_la_version_sin_cambio():
+    n = Notificador(lambda: 3, intervalo=0.01)
+    t0 = time.monotonic()
+    assert n.esperar(3, timeout=0.05) == 3
+    assert time.monotonic() - t0 < 1
+
+
+def test_error_de_lectura_no_para_el_sondeo(capsys):
+    respuestas = iter([RuntimeError("db"), 4])
+
+    def leer():
+        r = next(respuestas, 4)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+    n = Notificador(leer, intervalo=0.01)
+    assert n.esperar(None, timeout=1) == 4
+    assert "Notificador: db" in capsys.readouterr().err
@@ -0,0 +1,130 @@
+import sys
+import time
+import types
+import _thread
+
+import pytest
+
+import perfilado
+from perfilado import Perfilador
+
+
+def _trabajo_pool():
+    yield
+
+
+def test_muestrea_los_hilos(tmp_path):
+    with Perfilador(intervalo=0.002) as perfil:
+        time.sleep(0.05)
+    r = perfil.resumen()
+    assert r["muestras"] > 0
+    assert "MainThread" in {h["hilo"] for h in r["hilos"]}
+    assert perfil.guardar(str(tmp_path), "p") == "p"
+    assert (tmp_path / "p.folded").read_text()
+
+
+class _Greenlet:
+    def __init__(self, parent=None, frame=None, activo=True, name=None):
+        self.parent   = parent
+        self.gr_frame = frame
+        self.activo   = activo
+        self.dead     = False
+        if name:
+            self.name = name
+
+    def __bool__(self):
+        return self.activo
+
+
+@pytest.fixture
+def gevent_falso(monkeypatch):
+    arrancados = []
+
+    def start_new_thread(fn, args):
+        arrancados.append(fn.__name__)
+        return _thread.start_new_thread(fn, args)
+
+    originales = {("_thread", "get_ident"): _thread.get_ident,
+                  ("_thread", "allocate_lock"): _thread.allocate_lock,
+                  ("_thread", "start_new_thread"): start_new_thread,
+                  ("time", "sleep"): time.sleep}
+    principal = _Greenlet()                                # el que corre: sin gr_frame
+    hub       = _Greenlet(parent=principal, frame=None, activo=False)
+    pausado   = _trabajo_pool()
+    next(pausado)
+    worker    = _Greenlet(parent=hub, frame=pausado.gi_frame, name="ThreadPoolExecutor-0_1")
+
+    monkey = types.SimpleNamespace(is_module_patched=lambda m: m == "threading",
+                                   get_original=lambda mod, nombre: originales[(mod, nombre)])
+    monkeypatch.setitem(sys.modules, "gevent.monkey", monkey)
+    monkeypatch.setitem(sys.modules, "gevent.hub", types.SimpleNamespace(get_hub=lambda: hub))
+    monkeypatch.setitem(sys.modules, "greenlet",
+                        types.SimpleNamespace(greenlet=_Greenlet, settrace=lambda traza: None))
+    yield arrancados, (principal, hub, worker, pausado)
+
+
+def test_con_gevent_muestrea_greenlets_desde_un_hilo_real(gevent_falso):
+    arrancados, _ = gevent_falso
+    with Perfilador(intervalo=0.002) as perfil:
+        time.sleep(0.05)
+    assert arrancados == ["_muestrear_greenlets"]
+    hilos = {h["hilo"]: h for h in perfil.resumen()["hilos"]}
+    assert hilos["ThreadPoolExecutor-0_1"]["muestras"] > 0
+    assert hilos["principal"]["muestras"] > 0            # frame del hilo del hub
+    assert hilos["ThreadPoolExecutor-0_1"]["cpu_s"] is None
+    colapsado = perfil.colapsado()
+    assert "ThreadPoolExecutor-0;test_perfilado:_trabajo_pool" in colapsado
+    assert "principal;" in colapsado and "test_con_gevent_muestrea" in colapsado
+
+
+def test_con_greenlets_reales_sigue_los_nuevos_sin_recorrer_el_heap(monkeypatch):
+    greenlet = pytest.importorskip("greenlet")
+    principal = greenlet.getcurrent()
+    hub       = greenlet.greenlet(lambda *a: None)     # hijo de principal, nunca corre
+    originales = {("_thread", "get_ident"): _thread.get_ident,
+                  ("_thread", "allocate_lock"): _thread.allocate_lock,
+                  ("_thread", "start_new_thread"): _thread.start_new_thread,
+                  ("time", "sleep"): time.sleep}
+    monkey = types.SimpleNamespace(is_module_patched=lambda m: m == "threading",
+                                   get_original=lambda mod, nombre: originales[(mod, nombre)])
+    monkeypatch.setitem(sys.modules, "gevent.monkey", monkey)
+    monkeypatch.setitem(sys.modules, "gevent.hub", types.SimpleNamespace(get_hub=lambda: hub))
+
+    def trabajo_greenlet():
+        while True:
+            principal.switch()
+
+    recorridos = []
+    get_objects = perfilado.gc.get_objects
+    monkeypatch.setattr(perfilado.gc, "get_objects",
+                        lambda: recorridos.append(1) or get_objects())
+    with Perfilador(intervalo=0.002) as perfil:
+        worker = greenlet.greenlet(trabajo_greenlet, parent=hub)   # nace ya perfilando
+        worker.switch()
+        time.sleep(0.05)
+    assert greenlet.gettrace() is None                  # traza restaurada
+    assert len(recorridos) == 1                         # gc sólo al empezar
+
+    hilos = {h["hilo"]: h for h in perfil.resumen()["hilos"]}
+    assert hilos[f"greenlet-{id(worker):x}"]["muestras"] > 0
+    assert hilos["principal"]["muestras"] > 0
+    assert "test_perfilado:trabajo_greenlet" in perfil.colapsado()
+    worker.throw()                                      # muere y vuelve aquí vía hub
+
+
+def test_perfil_que_no_se_guarda_no_tumba_el_analisis(monkeypatch):
+    import app
+
+    def guardar(self, directorio, nombre=None):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(perfilado.Perfilador, "guardar", guardar)
+    monkeypatch.setattr(app, "_modulo_analisis",
+                        lambda: types.SimpleNamespace(main=lambda: []))
+    monkeypatch.setattr(app, "_sincronizar_contexto_alertas", lambda motor: None)
+    monkeypatch.setattr(app, "ESTADO", app.crear_estado())
+    app.ESTADO.iniciar()
+    app._run_analysis(perfilar=True)
+    resumen = app.ESTADO.resumen()
+    assert resumen["completed"] and resumen["error"] is None
+    assert any("Perfil no guardado: disco lleno" in l for l in app.ESTADO.lineas())
@@ -0,0 +1,98 @@
+import pytest
+
+import portafolio
+from portafolio import MAX_ESCENARIOS, calcular, normalizar_params
+
+
+def test_rango_y_lista():
+    params = dict(normalizar_params({"bankroll": "100:300:3", "fraccion": "0.1,0.5"}))
+    assert params["bankroll"] == (100.0, 200.0, 300.0)
+    assert params["fraccion"] == (0.1, 0.5)
+    assert params["rho"] == tuple(portafolio.PARAMS_DEFECTO["rho"])
+
+
+@pytest.mark.parametrize("pasos", ["0", "-3", str(MAX_ESCENARIOS + 1), "100000000"])
+def test_pasos_fuera_de_rango_antes_de_reservar(pasos, monkeypatch):
+    def prohibido(*a, **k):
+        raise AssertionError("linspace no debe llamarse")
+    monkeypatch.setattr(portafolio.np, "linspace", prohibido)
+    with pytest.raises(ValueError, match="pasos"):
+        normalizar_params({"bankroll": f"0:1:{pasos}"})
+
+
+@pytest.mark.parametrize("raw", [
+    {"bankroll": "nan"}, {"bankroll": "inf"}, {"bankroll": [1000, float("inf")]},
+    {"fraccion": "nan"}, {"rho": "0:nan:3"},
+])
+def test_rechaza_no_finitos(raw):
+    with pytest.raises(ValueError, match="finito"):
+        normalizar_params(raw)
+
+
+def test_producto_sobre_el_maximo():
+    with pytest.raises(ValueError, match="escenarios"):
+        normalizar_params({"bankroll": f"1:2:{MAX_ESCENARIOS}", "fraccion": "0.1,0.2"})
+
+
+def test_calcular_respeta_reserva():
+    candidatos = [{"equipo": "A", "partido": "A @ B", "real": 70, "poly": 50},
+                  {"equipo": "C", "partido": "C @ D", "real": 65, "poly": 40}]
+    r = calcular(candidatos, normalizar_params({"bankroll": 1000, "fraccion": 1}))
+    assert r["escenarios"] == 1
+    assert r["resumen"]["en_reserva"][0] >= 1000 * 0.33 - 0.01
+
+
+CANDIDATOS = [{"equipo": "A", "partido": "A @ B", "real": 70, "poly": 50},
+              {"equipo": "C", "partido": "C @ D", "real": 65, "poly": 40},
+              {"equipo": "E", "partido": "E @ F", "real": 55, "poly": 45}]
+
+
+def test_respuesta_agregada_sin_matriz_de_montos():
+    params = normalizar_params({"bankroll": "100:10000:200", "fraccion": "0.05:1:50"})
+    r = calcular(CANDIDATOS, params)
+    assert r["escenarios"] == 10_000
+    assert "montos" not in r
+    assert len(r["top"]) == portafolio.TOP_ESCENARIOS
+    crec = [t["crecimiento"] for t in r["top"]]
+    assert crec == sorted(crec, reverse=True)
+    assert crec[0] == pytest.approx(max(r["resumen"]["crecimiento"]), abs=1e-6)
+    for a in r["apuestas"]:
+        assert a["monto_p05"] <= a["monto_p50"] <= a["monto_p95"]
+        assert a["monto_p05"] <= a["monto_medio"] <= a["monto_p95"]
+
+
+def test_montos_de_un_escenario():
+    params = normalizar_params({"bankroll": "100,1000", "fraccion": "0.25,0.5"})
+    r = calcular(CANDIDATOS, params, escenario=3)
+    total = r["resumen"]["total_apostado"][3]
+    assert r["escenario"]["indice"] == 3
+    assert sum(r["escenario"]["montos"]) == pytest.approx(total, abs=0.05)
+    with pytest.raises(ValueError, match="escenario"):
+        calcular(CANDIDATOS, params, escenario=4)
+
+
+def test_cache_de_la_api_acotada_en_bytes(tmp_path, monkeypatch):
+    import json
+    import app
+
+    ruta = tmp_path / "resultados.json"
+    ruta.write_text(json.dumps({"candidatos": CANDIDATOS}))
+    monkeypatch.setattr(app, "RESULTADOS_PATH", str(ruta))
+    monkeypatch.setattr(app, "_portafolio_cache", app.OrderedDict())
+    monkeypatch.setattr(app, "_portafolio_bytes", 0)
+    monkeypatch.setattr(app, "PORTAFOLIO_CACHE_MB", 0.01)         # ~10 KB
+    cliente = app.app.test_client()
+    for bankroll in range(100, 130):
+        r = cliente.get(f"/api/portfolio?bankroll={bankroll}&fraccion=0.1,0.2")
+        assert r.status_code == 200
+    assert 0 < app._portafolio_bytes <= 0.01 * 1024 * 1024
+    assert app._portafolio_bytes == sum(map(len, app._portafolio_cache.values()))
+    assert cliente.get("/api/portfolio?escenario=9").status_code == 400
+    assert cliente.get("/api/portfolio?escenario=0").get_json()["escenario"]["indice"] == 0
+
+
+def test_indice_de_escenario_sigue_el_orden_de_parametros():
+    params = normalizar_params({"bankroll": "100,1000", "fraccion": "0.25,0.5"})
+    r = calcular(CANDIDATOS, params, escenario=1)
+    assert r["parametros"]["bankroll"] == [100.0, 1000.0]
+    assert (r["escenario"]["bankroll"], r["escenario"]["fraccion"]) == (100.0, 0.5)
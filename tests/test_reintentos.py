@@ -0,0 +1,87 @@
+import time
+import threading
+
+import pytest
+
+import reintentos
+from reintentos import ColaReintentos
+
+
+@pytest.fixture
+def sin_jitter(monkeypatch):
+    monkeypatch.setattr(reintentos.random, "uniform", lambda a, b: b)
+
+
+def test_espera_exponencial_con_tope(sin_jitter):
+    cola = ColaReintentos(1, base=0.5, tope=3.0)
+    assert [cola.espera(n) for n in range(1, 6)] == [0.5, 1.0, 2.0, 3.0, 3.0]
+
+
+def test_jitter_entre_la_mitad_y_la_espera_completa():
+    cola = ColaReintentos(1, base=2.0, tope=30.0)
+    esperas = [cola.espera(3) for _ in range(200)]
+    assert all(4.0 <= e <= 8.0 for e in esperas)
+    assert max(esperas) - min(esperas) > 1.0
+
+
+def _fallar(n: int, valor="ok", error=RuntimeError("caído")):
+    """Tarea que falla las primeras `n` veces; registra el instante de cada intento."""
+    llamadas = []
+
+    def tarea():
+        llamadas.append(time.monotonic())
+        if len(llamadas) <= n:
+            if error is None:
+                return None
+            raise error
+        return valor
+    return tarea, llamadas
+
+
+def test_reintenta_hasta_exito_con_backoff(sin_jitter):
+    tarea, llamadas = _fallar(2)
+    reintentos_vistos = []
+    cola = ColaReintentos(2, intentos=3, base=0.05)
+    res = cola.ejecutar({"a": tarea},
+                        al_reintentar=lambda c, n, e, err: reintentos_vistos.append((c, n, e)))
+    assert res["a"] == {"valor": "ok", "ok": True, "intentos": 3, "error": None}
+    assert reintentos_vistos == [("a", 1, 0.05), ("a", 2, 0.1)]
+    huecos = [b - a for a, b in zip(llamadas, llamadas[1:])]
+    assert huecos[0] >= 0.05 and huecos[1] >= 0.1
+
+
+def test_excepcion_agotada_sale_como_ok_false(sin_jitter):
+    tarea, llamadas = _fallar(10, error=ValueError("json roto"))
+    terminados = []
+    res = ColaReintentos(1, intentos=3, base=0.01).ejecutar(
+        {"a": tarea}, al_terminar=lambda c, r: terminados.append(c))
+    assert res["a"] == {"valor": None, "ok": False, "intentos": 3, "error": "json roto"}
+    assert len(llamadas) == 3
+    assert terminados == ["a"]
+
+
+def test_es_fallo_reintenta_y_conserva_el_ultimo_valor(sin_jitter):
+    tarea, llamadas = _fallar(10, error=None)
+    cola = ColaReintentos(1, intentos=2, base=0.01, es_fallo=lambda v: v is None)
+    res = cola.ejecutar({"a": tarea})
+    assert res["a"] == {"valor": None, "ok": False, "intentos": 2,
+                        "error": "resultado inválido"}
+    assert len(llamadas) == 2
+
+
+def test_un_intento_no_reintenta():
+    tarea, llamadas = _fallar(1)
+    res = ColaReintentos(1, intentos=1).ejecutar({"a": tarea})
+    assert not res["a"]["ok"] and len(llamadas) == 1
+
+
+def test_el_backoff_no_frena_a_las_demas(sin_jitter):
+    lenta, _ = _fallar(1)
+    hechas = []
+    tareas = {"lenta": lenta, **{i: (lambda i=i: hechas.append(i) or i) for i in range(5)}}
+    t0 = time.monotonic()
+    res = ColaReintentos(2, intentos=2, base=0.3).ejecutar(
+        tareas, al_terminar=lambda c, r: hechas.append(("fin", c, time.monotonic() - t0)))
+    assert all(r["ok"] for r in res.values())
+    fin = {c: t for _, c, t in (h for h in hechas if isinstance(h, tuple))}
+    assert max(fin[i] for i in range(5)) < 0.2 <= fin["lenta"]
@@ -0,0 +1,135 @@
+import time
+
+import numpy as np
+import pytest
+
+import simulacion
+from simulacion import CAMPOS, bandas_por_partido, simular_slate
+from ligas import LIGAS
+
+BASE = {"p_vegas": 62.0, "n_local": 30.0, "n_visitante": -10.0,
+        "estrellas_bajas_local": 0, "estrellas_bajas_visitante": 1,
+        "r_local": 60.0, "r_visitante": 45.0}
+
+
+def _partido(runs: dict | None = None, **cambios) -> dict:
+    a = {**BASE, **cambios}
+    if runs:
+        a["muestras"] = runs
+        for c, v in runs.items():
+            a[c] = sum(v) / len(v)
+    return a
+
+
+def _valor_real(a: dict) -> tuple[float, float]:
+    """Fórmula de imprimir_analisis con las entradas promediadas."""
+    raw_l = simulacion._valor_raw(a["p_vegas"], a["n_local"], a["r_local"], 5.0,
+                                  a["estrellas_bajas_local"])
+    raw_v = simulacion._valor_raw(100 - a["p_vegas"], a["n_visitante"], a["r_visitante"], -5.0,
+                                  a["estrellas_bajas_visitante"])
+    return float(raw_l / (raw_l + raw_v) * 100), float(raw_v / (raw_l + raw_v) * 100)
+
+
+def test_un_run_da_bandas_degeneradas_en_el_valor_puntual():
+    a = _partido()
+    b = bandas_por_partido(simular_slate([a]))[0]
+    vr_l, vr_v = _valor_real(a)
+    assert set(np.round(list(b["vr_local"].values()), 9)) == {round(vr_l, 9)}
+    assert set(np.round(list(b["vr_visitante"].values()), 9)) == {round(vr_v, 9)}
+    assert b["gap"][0.5] == pytest.approx(abs(vr_l - vr_v))
+
+
+def test_runs_identicos_sin_anchura():
+    runs = {c: [BASE[c]] * 5 for c in CAMPOS}
+    b = bandas_por_partido(simular_slate([_partido(runs)]))[0]
+    assert b["vr_local"][0.05] == pytest.approx(b["vr_local"][0.95])
+
+
+def test_valor_puntual_coincide_con_imprimir_analisis(nba_ai, capsys):
+    a = _partido(resumen="", estado="fresh")
+    item = {"liga": LIGAS["NBA"], "evento": {"title": "Nets vs. Hawks"},
+            "mercados": {"💰 Moneyline": {"outcomes": ["Hawks", "Nets"], "token_ids": ["h", "n"]}}}
+    _, _, equipos = nba_ai.imprimir_analisis(item, a, {"h": 0.5, "n": 0.5})
+    vr = {e["outcome"]: e["valor_real"] for e in equipos}
+    b = bandas_por_partido(simular_slate([a]))[0]
+    assert b["vr_local"][0.5] == pytest.approx(vr["Hawks"])
+    assert b["vr_visitante"][0.5] == pytest.approx(vr["Nets"])
+
+
+def test_bandas_ordenadas_y_cobertura_en_runs_sinteticos():
+    # Cada partido: 5 runs ruidosos alrededor de unas entradas "verdaderas".
+    # La banda 5-95 % del bootstrap tiene que contener el valor verdadero en
+    # la mayoría de partidos (con 5 runs el percentil bootstrap se queda algo
+    # por debajo del 90 % nominal).
+    rng = np.random.default_rng(7)
+    verdaderos, partidos = [], []
+    for _ in range(300):
+        centro = {"p_vegas": rng.uniform(30, 70), "n_local": rng.uniform(-50, 50),
+                  "n_visitante": rng.uniform(-50, 50),
+                  "estrellas_bajas_local": 0.0, "estrellas_bajas_visitante": 0.0}
+        runs = {c: list(centro[c] + rng.normal(0, 8 if c[0] in "pn" else 0, 5)) for c in CAMPOS}
+        verdaderos.append(_valor_real({**BASE, **centro})[0])
+        partidos.append(_partido(runs))
+    sim = simular_slate(partidos)
+    vr = sim["vr_local"]
+    assert np.all(np.diff(vr, axis=1) >= -1e-9)
+    dentro = np.mean([(vr[g, 0] <= v <= vr[g, -1]) for g, v in enumerate(verdaderos)])
+    assert 0.7 <= dentro <= 0.97, dentro
+    np.testing.assert_allclose(sim["vr_local"][:, 2] + sim["vr_visitante"][:, 2], 100, atol=1.5)
+
+
+def test_presupuesto_de_latencia():
+    # Requisito: milisegundos por slate para caber en el refresco en vivo
+    rng = np.random.default_rng(1)
+    slate = [_partido({c: list(BASE[c] + rng.normal(0, 5, 5)) for c in CAMPOS})
+             for _ in range(15)]
+    simular_slate(slate)
+    mejor = min(_cronometrar(lambda: simular_slate(slate, n_sim=2000)) for _ in range(3))
+    assert mejor < 0.1, f"{mejor * 1000:.1f} ms"
+
+
+def _cronometrar(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+# ── CONFIANZA_EDGE ────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("poly, real, conf, esperado", [
+    (45.0, 70.0, None, "🎰 SCALPING"),   # sin confianza exigida
+    (45.0, 70.0, 68.0, "🎰 SCALPING"),   # 45 - 68 = -23 ≤ -20: se sostiene
+    (45.0, 70.0, 60.0, "🔥 COMPRAR"),    # 45 - 60 = -15: no se sostiene
+    (20.0, 45.0, 38.0, "🔥 COMPRAR"),    # el cuantil cae bajo SCALP_REAL
+])
+def test_confianza_bloquea_scalping(nba_ai, poly, real, conf, esperado):
+    assert nba_ai.clasificar_nea(poly, real, conf)[0] == esperado
+
+
+def _item_quien_gana():
+    return {"liga": LIGAS["NBA"], "evento": {"title": "Nets vs. Hawks"},
+            "mercados": {"💰 Moneyline": {"outcomes": ["Hawks", "Nets"], "token_ids": ["h", "n"]}}}
+
+
+@pytest.mark.parametrize("gap_conf, hay_favorito", [(25.0, True), (5.0, False)])
+def test_confianza_bloquea_quien_gana(nba_ai, monkeypatch, capsys, gap_conf, hay_favorito):
+    monkeypatch.setattr(nba_ai, "CONFIANZA_EDGE", 0.8)
+    a = _partido(p_vegas=80.0, resumen="", estado="fresh")
+    bandas = bandas_por_partido(simular_slate([a], cuantiles=(0.05, 0.2, 0.5, 0.95)))[0]
+    bandas["gap"][0.2] = gap_conf                     # el cuantil 1 - 0.8 es el que decide
+    _, qg, _ = nba_ai.imprimir_analisis(_item_quien_gana(), a, {"h": 0.6, "n": 0.4}, bandas)
+    assert (qg is not None) == hay_favorito
+    if not hay_favorito:
+        assert "no se sostiene" in capsys.readouterr().out
+
+
+def test_confianza_bloquea_scalping_en_imprimir_analisis(nba_ai, monkeypatch, capsys):
+    monkeypatch.setattr(nba_ai, "CONFIANZA_EDGE", 0.8)
+    a = _partido(p_vegas=80.0, resumen="", estado="fresh")
+    bandas = bandas_por_partido(simular_slate([a], cuantiles=(0.05, 0.2, 0.5, 0.95)))[0]
+    precios = {"h": 0.40, "n": 0.60}
+    ops, _, _ = nba_ai.imprimir_analisis(_item_quien_gana(), a, precios, bandas)
+    assert [o["categoria"] for o in ops if o["outcome"] == "Hawks"] == ["🎰 SCALPING"]
+    bandas["vr_local"][0.2] = 55.0                    # 40 - 55 = -15: el descuento no aguanta
+    ops, _, _ = nba_ai.imprimir_analisis(_item_quien_gana(), a, precios, bandas)
+    assert [o["categoria"] for o in ops if o["outcome"] == "Hawks"] == ["🔥 COMPRAR"]
@@ -0,0 +1,51 @@
+import pytest
+
+
+def _registro(quien_gana=True):
+    return {
+        "id": "2026-10-19|NBA|Hawks vs. Nets", "nea_umbral": 5.0,
+        "mercados": [
+            {"mercado": "Moneyline", "outcome": "Hawks", "token_id": "h", "es_local": True,
+             "poly": 70.0, "real": 72.0, "nea": -2.0, "real_ic": None, "real_conf": None},
+            {"mercado": "Moneyline", "outcome": "Nets", "token_id": "n", "es_local": False,
+             "poly": 30.0, "real": 28.0, "nea": 2.0, "real_ic": None, "real_conf": None},
+            {"mercado": "Spread", "outcome": "Hawks -5.5", "token_id": "s", "es_local": None,
+             "poly": 40.0, "real": 50.0, "nea": -10.0, "real_ic": None, "real_conf": None},
+        ],
+        "oportunidades": [{"mercado": "Spread", "outcome": "Hawks -5.5",
+                           "categoria": "COMPRAR", "nea": -10.0}],
+        "quien_gana": {"favorito": "Hawks", "favorito_real": 72.0, "favorito_poly": 70.0,
+                       "favorito_nea": -2.0, "underdog": "Nets", "gap": 44.0,
+                       "real_ic": None} if quien_gana else None,
+    }
+
+
+def test_sin_precios_del_partido_no_hay_parche(nba_ai):
+    assert nba_ai.repreciar_registro(_registro(), {"otro": 0.5}) is None
+    assert nba_ai.repreciar_registro(_registro(), {"h": 0.70}) is None   # mismo precio
+
+
+def test_reprecia_mercados_oportunidades_y_favorito(nba_ai):
+    nuevo = nba_ai.repreciar_registro(_registro(), {"h": 0.50, "s": 0.48})
+    hawks, _, spread = nuevo["mercados"]
+    assert (hawks["poly"], hawks["nea"]) == (50.0, -22.0)
+    assert (spread["poly"], spread["nea"]) == (48.0, -2.0)
+    # el spread sale (|NEA| < umbral) y el favorito entra como SCALPING
+    assert nuevo["oportunidades"] == [{"mercado": "Moneyline", "outcome": "Hawks",
+                                       "categoria": "SCALPING", "nea": -22.0}]
+    assert (nuevo["quien_gana"]["favorito_poly"], nuevo["quien_gana"]["favorito_nea"]) \
+        == (50.0, -22.0)
+    assert nuevo["id"] == _registro()["id"]
+
+
+@pytest.mark.parametrize("real, conf, categoria", [
+    (72.0, None, "SCALPING"),
+    (35.0, None, "COMPRAR"),     # real < SCALP_REAL
+    (72.0, 60.0, "COMPRAR"),     # el descuento no se sostiene en el cuantil conservador
+])
+def test_categoria_usa_las_condiciones_de_scalping(nba_ai, real, conf, categoria):
+    registro = _registro(quien_gana=False)
+    registro["mercados"][0].update(real=real, real_conf=conf)
+    nuevo = nba_ai.repreciar_registro(registro, {"h": (real - 25) / 100})
+    assert nuevo["oportunidades"][0]["categoria"] == categoria
+    assert nuevo["quien_gana"] is None